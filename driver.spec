@@ -2,6 +2,7 @@
 
 block_cipher = None
 
+import json
 import os
 
 CS_L1_NETCORE = "../cloudshell-L1-networking-core"
@@ -16,17 +17,25 @@ def add_data_files(related_path, root_path="."):
                           "DATA"))
     return templates
 
+def get_driver_imports(configuration_path="configuration/configuration.json"):
+    """Modules loaded by name at runtime: driver module and session of the configured connection_type only
+
+    Sessions of other connection types (ssh needs paramiko) are not bundled, so the onefile executable has less
+    to unpack on every start. Compile again after changing connection_type or driver_module.
+    """
+    with open(configuration_path) as configuration_file:
+        configuration = json.load(configuration_file)
+
+    common_variable = configuration["common_variable"]
+    return [configuration["cli_variable"][common_variable["connection_type"]][0],
+            common_variable["driver_module"][0],
+            "glimmerglass.glimmerglass_driver_handler"]
+
 a = Analysis(['main.py'],
              pathex=[".", CS_L1_NETCORE, "../cloudshell-core"],
              binaries=None,
              datas=[],
-             hiddenimports=[
-                "common.cli.tcp_session",
-                "common.cli.telnet_session",
-                "common.cli.console_session",
-                "common.cli.ssh_session",
-                "glimmerglass.glimmerglass_driver_handler"
-             ],
+             hiddenimports=get_driver_imports(),
              hookspath=None,
              runtime_hooks=None,
              excludes=None,
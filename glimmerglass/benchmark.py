@@ -0,0 +1,199 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Autoload benchmark of GlimmerglassDriverHandler over synthetic chassis
+
+    python -m glimmerglass.benchmark --sizes 48,192 --save base.json
+    python -m glimmerglass.benchmark --sizes 48,192 --compare base.json
+    python -m glimmerglass.benchmark --sizes 1024 --densities 1.0 --profile
+
+Every case runs the real handler code against responses of glimmerglass.chassis_generator (rendered once per case,
+so only retrieval by the handler, parsing and resource description building are timed). Chassis are generated
+from a fixed seed, so results of equal cases are comparable between runs.
+"""
+
+import argparse
+import cProfile
+import gc
+import json
+import os
+import pstats
+import sys
+import timeit
+
+from common.configuration_parser import ConfigurationParser
+from glimmerglass import tl1_parser
+from glimmerglass.chassis_generator import ChassisGenerator, GeneratedSession, generate_custom_port_pairing
+from glimmerglass.driver_settings import build_port_pairing
+from glimmerglass.glimmerglass_driver_handler import GlimmerglassDriverHandler
+from glimmerglass.resource_xml_writer import ResourceXMLWriter
+
+ADDRESS = '192.168.1.1'
+
+
+class CachedSession(GeneratedSession):
+    """GeneratedSession which renders every retrieval command only once, ctag of cached responses is not changed"""
+
+    def __init__(self, chassis_generator):
+        GeneratedSession.__init__(self, chassis_generator)
+        self._responses = dict()
+
+    def send_command(self, data_str=None, re_string=None, timeout=None, **kwargs):
+        verb, _, rest = data_str.partition(':')
+        if not verb.lower().startswith('rtrv'):
+            return GeneratedSession.send_command(self, data_str, re_string, timeout)
+
+        key = (verb.lower(), rest.split(':')[1])
+        if key not in self._responses:
+            self._responses[key] = GeneratedSession.send_command(self, data_str, re_string, timeout)
+
+        return self._responses[key]
+
+
+class BenchmarkDriverHandler(GlimmerglassDriverHandler):
+    def __init__(self, session, port_mode, custom_port_pairing, xml_writer):
+        GlimmerglassDriverHandler.__init__(self)
+
+        self._session = session
+        self._streaming = False
+        self._pipelining = False
+        self._service_mode = "tl1"
+        self._port_logical_mode = port_mode
+        self._topology_cache_ttl = 0
+        self._session_pool = None
+        self._custom_port_pairing = build_port_pairing(custom_port_pairing)
+        self._xml_writer = ResourceXMLWriter() if xml_writer else None
+
+
+class BenchmarkCase(object):
+    def __init__(self, size, density, pairing_ratio, port_mode, xml_writer):
+        self.size = size
+        self.density = density
+        self.pairing_ratio = pairing_ratio
+        self.port_mode = port_mode
+        self.xml_writer = xml_writer
+
+        self._session = CachedSession(ChassisGenerator(size, density, bad_ratio=0.02, seed=size))
+        self._custom_port_pairing = generate_custom_port_pairing(size, pairing_ratio, seed=size)
+
+    @property
+    def name(self):
+        return 'size={0} density={1} pairing={2} mode={3} writer={4}'.format(
+            self.size, self.density, self.pairing_ratio, self.port_mode, 'template' if self.xml_writer else 'tree')
+
+    def create_handler(self):
+        return BenchmarkDriverHandler(self._session, self.port_mode, self._custom_port_pairing, self.xml_writer)
+
+    def parse(self):
+        tl1_parser.parse_port_list(self._session.send_command("RTRV-CFG-FIBER::all:1;"))
+        tl1_parser.parse_connections(self._session.send_command("rtrv-crs-fiber::all:1;"))
+
+    def autoload_cold(self):
+        self.create_handler().get_resource_description(ADDRESS)
+
+    def get_warm_handler(self):
+        handler = self.create_handler()
+        handler.get_resource_description(ADDRESS)
+        return handler
+
+
+def _measure(function, repeat, number):
+    """Return (min, median) of 'repeat' runs of 'number' calls, in ms per call"""
+    time_list = sorted(timer / number * 1000.0 for timer in timeit.repeat(function, repeat=repeat, number=number))
+    return time_list[0], time_list[len(time_list) // 2]
+
+
+def run_case(case, repeat, number):
+    warm_handler = case.get_warm_handler()
+    result = dict()
+    for phase, function in (('parse', case.parse),
+                            ('autoload_cold', case.autoload_cold),
+                            ('autoload_warm', lambda: warm_handler.get_resource_description(ADDRESS))):
+        gc.collect()
+        result[phase] = _measure(function, repeat, number)
+
+    return result
+
+
+def profile_case(case, limit):
+    profiler = cProfile.Profile()
+    profiler.runcall(case.autoload_cold)
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(limit)
+
+
+def compare(results, baseline, threshold):
+    """Print change of median against baseline, return number of phases slower by more than 'threshold'"""
+    regression_count = 0
+    for name, phases in sorted(results.iteritems()):
+        for phase, (best, median) in sorted(phases.iteritems()):
+            if name not in baseline or phase not in baseline[name]:
+                continue
+
+            base_median = baseline[name][phase][1]
+            change = (median - base_median) / base_median if base_median else 0.0
+            flag = ''
+            if change > threshold:
+                flag = ' REGRESSION'
+                regression_count += 1
+            print '{0:<70} {1:<14} {2:9.3f} -> {3:9.3f} ms {4:+7.1%}{5}'.format(name, phase, base_median, median,
+                                                                                  change, flag)
+
+    return regression_count
+
+
+def _split(value, value_type):
+    return [value_type(item) for item in value.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Autoload benchmark over synthetic Glimmerglass chassis')
+    parser.add_argument('--sizes', default='48,192,384,1024', help='IN (and OUT) port counts')
+    parser.add_argument('--densities', default='0.1,0.5,1.0', help='ratios of connected IN ports')
+    parser.add_argument('--pairings', default='0,0.25', help='ratios of ports with custom pairing')
+    parser.add_argument('--modes', default='logical,physical', help='port_mode settings')
+    parser.add_argument('--writers', default='tree,template', help='resource description builders')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=3)
+    parser.add_argument('--profile', action='store_true', help='print cProfile statistics instead of timings')
+    parser.add_argument('--profile-limit', type=int, default=25)
+    parser.add_argument('--save', help='write results to a json file')
+    parser.add_argument('--compare', help='compare results with a json file written by --save')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown of the median')
+    args = parser.parse_args(argv)
+
+    ConfigurationParser.set_root_folder(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ConfigurationParser.init()
+
+    case_list = [BenchmarkCase(size, density, pairing_ratio, port_mode, writer == 'template')
+                 for size in _split(args.sizes, int)
+                 for density in _split(args.densities, float)
+                 for pairing_ratio in _split(args.pairings, float)
+                 for port_mode in _split(args.modes, str)
+                 for writer in _split(args.writers, str)]
+
+    results = dict()
+    for case in case_list:
+        if args.profile:
+            print case.name
+            profile_case(case, args.profile_limit)
+            continue
+
+        results[case.name] = run_case(case, args.repeat, args.number)
+        print '{0:<70} {1}'.format(case.name, '  '.join('{0} {1:9.3f} ms'.format(phase, median)
+                                                        for phase, (best, median)
+                                                        in sorted(results[case.name].iteritems())))
+
+    if args.save:
+        with open(args.save, 'w') as result_file:
+            json.dump(results, result_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            if compare(results, json.load(baseline_file), args.threshold):
+                return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
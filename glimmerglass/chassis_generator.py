@@ -0,0 +1,204 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import random
+import re
+import time
+
+from glimmerglass import tl1_parser
+from glimmerglass.port_table import IN_PORT_BASE, OUT_PORT_BASE
+
+PORT_RECORD_TEMPLATE = 'GGN:PORTID={0},PORTGROUP=OpenGroup,PORTNAME={1},SIGBAND=1550,SIGTHRESH=1550,' \
+                       'PORTHEALTH={2},PORTCAT=nor,PORTCOMMENT=,STMINSEV=DI,STMAXSEV=DI'
+CONNECTION_RECORD_TEMPLATE = 'GGN:IPORTID={0},IPORTGROUP=OpenGroup,IPORTNAME=IN{1},IPORTCOMMENT=,INPWR=-12.05,' \
+                             'OPORTID={2},OPORTGROUP={3},OPORTNAME={4},OPORTCOMMENT=,OUTPWR={5},SIGBAND=1550,' \
+                             'PWRLOSS={6},CONNID=0,CONNNAME={7},CONNSTATE={8},CONNCAUSE=none,CONNLOCK=0,' \
+                             'CONNLOCKUSER={9}'
+COMMAND_PATTERN = re.compile(r'^\s*([^:;]*):([^:;]*):([^:;]*):(\d*)(?::([^;]*))?;?\s*$')
+
+
+def generate_custom_port_pairing(size, ratio, seed=0):
+    """Return custom_port_pairing (IN logical id: OUT logical id) which shuffles OUT ports of 'ratio' of ports"""
+    generator = random.Random(seed)
+    port_list = generator.sample(xrange(1, size + 1), int(size * ratio))
+    out_port_list = list(port_list)
+    generator.shuffle(out_port_list)
+
+    return dict((str(in_port), str(out_port)) for in_port, out_port in zip(port_list, out_port_list))
+
+
+class ChassisGenerator(object):
+    """Synthetic Glimmerglass chassis with 'size' IN and 'size' OUT ports
+
+    Ports and cross-connects are generated from 'seed', so equal arguments give equal responses. 'density' is the
+    ratio of connected IN ports, 'bad_ratio' the ratio of ports with PORTHEALTH=bad. handle_command answers the
+    TL1 commands used by the driver in the format of a real switch (records split into '>' continued blocks) and
+    keeps cross-connects changed by ent-crs-fiber/dlt-crs-fiber. Changes of cross-connects and port health are
+    reported as autonomous messages (REPT DBCHG) to the callables of 'event_listeners'.
+    """
+
+    def __init__(self, size, density=0.5, bad_ratio=0.0, seed=0, serial_number='BD0472', block_size=20):
+        self.size = size
+        self.serial_number = serial_number
+        self.block_size = block_size
+
+        generator = random.Random(seed)
+        self.bad_ports = set(port_id for port_id in self.iter_port_ids() if generator.random() < bad_ratio)
+
+        in_port_list = generator.sample(xrange(1, size + 1), int(size * density))
+        out_port_list = generator.sample(xrange(1, size + 1), len(in_port_list))
+        self.connections = dict((IN_PORT_BASE + in_port, OUT_PORT_BASE + out_port)
+                                for in_port, out_port in zip(in_port_list, out_port_list))
+
+        self.event_listeners = list()
+        self._atag = 0
+
+    def iter_port_ids(self):
+        for base in (IN_PORT_BASE, OUT_PORT_BASE):
+            for port in xrange(1, self.size + 1):
+                yield base + port
+
+    def is_port(self, port_id):
+        return 0 < port_id % 10000 <= self.size and port_id // 10000 in (1, 2)
+
+    def _render(self, ctag, record_list, status='COMPLD'):
+        """Render TL1 response, records are split into blocks continued with '>'"""
+        header = '\r\n   {0} {1}\r\nM  {2} {3}\r\n'.format(self.serial_number,
+                                                          time.strftime('%y-%m-%d %H:%M:%S'), ctag, status)
+        block_list = list()
+        for block_start in xrange(0, max(len(record_list), 1), self.block_size):
+            block_list.append(header + ''.join('   "{0}"\r\n'.format(record)
+                                               for record in record_list[block_start:block_start + self.block_size]))
+
+        return '>\r\n<'.join(block_list) + ';\r\n'
+
+    def render_deny(self, ctag, error_code='IIAC'):
+        return self._render(ctag, list(), 'DENY\r\n   {0}'.format(error_code))
+
+    def render_system_info(self, ctag):
+        return self._render(ctag, ['GGN:SerialNumber={0}'.format(self.serial_number),
+                                   'GGN:SystemType=MEMS',
+                                   'GGN:ChassisType=GG-{0}'.format(self.size * 2),
+                                   'GGN:SoftwareActiveVersion=7.1.2',
+                                   'GGN:LicensedPortMatrix={0}x{0}'.format(self.size)])
+
+    def render_event(self, record_list):
+        """Render autonomous message reporting changed records"""
+        self._atag += 1
+        return '\r\n\n   {0} {1}\r\nA  {2} REPT DBCHG\r\n{3};\r\n'.format(
+            self.serial_number, time.strftime('%y-%m-%d %H:%M:%S'), self._atag,
+            ''.join('   "{0}"\r\n'.format(record) for record in record_list))
+
+    def _report(self, record_list):
+        if not self.event_listeners or not record_list:
+            return
+
+        message = self.render_event(record_list)
+        for event_listener in list(self.event_listeners):
+            event_listener(message)
+
+    def _get_port_record(self, port_id):
+        port_name = '{0}{1}'.format('IN' if port_id < OUT_PORT_BASE else 'OUT', port_id % 10000)
+        return PORT_RECORD_TEMPLATE.format(port_id, port_name, 'bad' if port_id in self.bad_ports else 'good')
+
+    def _get_connection_record(self, port_id):
+        dst_port_id = self.connections.get(port_id)
+        if dst_port_id is None:
+            return CONNECTION_RECORD_TEMPLATE.format(port_id, port_id % 10000, 0, '', '', 'NA', 'NA', '', 'single', '')
+
+        return CONNECTION_RECORD_TEMPLATE.format(port_id, port_id % 10000, dst_port_id, 'OpenGroup',
+                                                 'OUT{0}'.format(dst_port_id % 10000), '-13.63', '1.57',
+                                                 'IN{0}'.format(port_id % 10000), 'steady', 'admin')
+
+    def render_port_list(self, ctag, port_id_list=None):
+        return self._render(ctag, [self._get_port_record(port_id) for port_id in port_id_list or self.iter_port_ids()
+                                   if self.is_port(port_id)])
+
+    def render_connections(self, ctag, port_id_list=None):
+        return self._render(ctag, [self._get_connection_record(port_id) for port_id
+                                   in port_id_list or xrange(IN_PORT_BASE + 1, IN_PORT_BASE + self.size + 1)
+                                   if self.is_port(port_id) and port_id < OUT_PORT_BASE])
+
+    def set_port_health(self, port_id, health):
+        if health == 'bad':
+            self.bad_ports.add(port_id)
+        else:
+            self.bad_ports.discard(port_id)
+
+        self._report([self._get_port_record(port_id)])
+
+    def connect(self, src_port_list, dst_port_list):
+        """Connect IN ports to OUT ports, returns False (and changes nothing) if a port is unknown or an OUT port
+        is fed by another IN port (it has to be disconnected first, like on the switch)"""
+        if len(src_port_list) != len(dst_port_list) or len(set(dst_port_list)) != len(dst_port_list) \
+                or not all(self.is_port(port_id) for port_id in src_port_list + dst_port_list):
+            return False
+
+        feeding_ports = dict((dst_port, src_port) for src_port, dst_port in self.connections.iteritems())
+        if any(feeding_ports.get(dst_port, src_port) != src_port
+               for src_port, dst_port in zip(src_port_list, dst_port_list)):
+            return False
+
+        for src_port, dst_port in zip(src_port_list, dst_port_list):
+            self.connections[src_port] = dst_port
+
+        self._report([self._get_connection_record(port_id) for port_id in sorted(set(src_port_list))])
+        return True
+
+    def disconnect(self, src_port_list):
+        if not all(self.is_port(port_id) for port_id in src_port_list):
+            return False
+
+        for src_port in src_port_list:
+            self.connections.pop(src_port, None)
+
+        self._report([self._get_connection_record(port_id) for port_id in src_port_list])
+        return True
+
+    def handle_command(self, command):
+        """Return TL1 response for one command, None if the command is not a TL1 command"""
+        match = COMMAND_PATTERN.match(command)
+        if match is None:
+            return None
+
+        verb, tid, aid, ctag, parameters = match.groups()
+        verb = verb.lower()
+        ctag = ctag or '0'
+
+        try:
+            if verb in ('act-user', 'rtrv-hdr', 'alw-msg-all'):
+                return self._render(ctag, list())
+            if verb == 'rtrv-system-info':
+                return self.render_system_info(ctag)
+            if verb == 'rtrv-cfg-fiber':
+                return self.render_port_list(ctag, tl1_parser.expand_aid_list(aid))
+            if verb == 'rtrv-crs-fiber':
+                return self.render_connections(ctag, tl1_parser.expand_aid_list(aid))
+            if verb == 'ent-crs-fiber':
+                src_aid, _, dst_aid = aid.partition(',')
+                completed = self.connect(tl1_parser.expand_aid_list(src_aid) or list(),
+                                         tl1_parser.expand_aid_list(dst_aid) or list())
+                return self._render(ctag, list()) if completed else self.render_deny(ctag)
+            if verb == 'dlt-crs-fiber':
+                completed = self.disconnect(tl1_parser.expand_aid_list(aid) or list())
+                return self._render(ctag, list()) if completed else self.render_deny(ctag)
+        except ValueError:
+            return self.render_deny(ctag, 'IIFM')
+
+        return self.render_deny(ctag, 'ICNV')
+
+
+class GeneratedSession(object):
+    """Session which answers commands from a ChassisGenerator in process, without network"""
+
+    def __init__(self, chassis_generator):
+        self._chassis_generator = chassis_generator
+
+    def connect(self, host, username, password, port=None):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def send_command(self, data_str=None, re_string=None, timeout=None, **kwargs):
+        return self._chassis_generator.handle_command(data_str)
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import Queue
+import random
+import threading
+
+from glimmerglass import tl1_parser
+
+
+class CommandLogWriter(object):
+    """Background thread which writes the log records of all handlers in order through one bounded queue
+
+    A record is dropped if the queue is full, the number of dropped records is logged with the next written one.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, queue_size):
+        self._queue = Queue.Queue(queue_size)
+        self._dropped_count = 0
+        self._lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._write_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @classmethod
+    def get(cls, queue_size):
+        """Return the writer shared by all handlers, it is started on first use"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(queue_size)
+
+            return cls._instance
+
+    def put(self, command_logger, message):
+        try:
+            self._queue.put_nowait((command_logger, message))
+        except Queue.Full:
+            with self._lock:
+                self._dropped_count += 1
+
+    def _write_loop(self):
+        while True:
+            command_logger, message = self._queue.get()
+            with self._lock:
+                dropped_count, self._dropped_count = self._dropped_count, 0
+
+            try:
+                if dropped_count:
+                    command_logger.info('{0} log records were dropped, log queue is full'.format(dropped_count))
+                command_logger.info(message)
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+
+
+class CommandLogger(object):
+    """command_logger of a request as used by the driver handler
+
+    Messages longer than 'max_length' (0 - no limit) are cut to their beginning followed by a summary (record count,
+    size, ctag and status of a TL1 response), 'sample_rate' of them are logged in full. With 'writer' the records
+    are written by the background CommandLogWriter, otherwise right away.
+    """
+
+    def __init__(self, command_logger, max_length=0, sample_rate=0.0, writer=None):
+        self._command_logger = command_logger
+        self._max_length = max_length
+        self._sample_rate = sample_rate
+        self._writer = writer
+
+    def _summarize(self, message):
+        if not self._max_length or len(message) <= self._max_length:
+            return message
+        if self._sample_rate and random.random() < self._sample_rate:
+            return message
+
+        ctag, status = tl1_parser.get_response_status(message)
+        summary = '... [{0} bytes'.format(len(message))
+        record_count = message.count('"') // 2
+        if record_count:
+            summary += ', {0} records'.format(record_count)
+        if status is not None:
+            summary += ', ctag {0} {1}'.format(ctag, status)
+
+        return message[:self._max_length] + summary + ']'
+
+    def info(self, message):
+        message = self._summarize(message)
+        if self._writer is not None:
+            self._writer.put(self._command_logger, message)
+        else:
+            self._command_logger.info(message)
@@ -0,0 +1,143 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from glimmerglass.driver_settings import DriverSettings
+
+# bucket upper bounds grow by 2 ** (1 / BUCKETS_PER_OCTAVE), starting from 1 us
+BUCKETS_PER_OCTAVE = 4
+BUCKET_COUNT = BUCKETS_PER_OCTAVE * 30
+
+
+class LatencyHistogram(object):
+    """Log-scale histogram of durations, percentiles are accurate within one bucket (~19%)"""
+
+    __slots__ = ('buckets', 'count', 'total', 'minimum', 'maximum', 'byte_count')
+
+    def __init__(self):
+        self.buckets = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = 0.0
+        self.byte_count = 0
+
+    def add(self, seconds, byte_count=0):
+        microseconds = seconds * 1000000.0
+        if microseconds <= 1.0:
+            index = 0
+        else:
+            index = min(int(math.ceil(math.log(microseconds, 2) * BUCKETS_PER_OCTAVE)), BUCKET_COUNT - 1)
+
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.byte_count += byte_count
+        if self.minimum is None or seconds < self.minimum:
+            self.minimum = seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, percent):
+        """Return upper bound (seconds) of the bucket holding 'percent' of the durations"""
+        if self.count == 0:
+            return 0.0
+
+        rank = math.ceil(self.count * percent / 100.0)
+        passed = 0
+        for index, bucket_count in enumerate(self.buckets):
+            passed += bucket_count
+            if passed >= rank:
+                return min(2 ** (float(index) / BUCKETS_PER_OCTAVE) / 1000000.0, self.maximum)
+
+        return self.maximum
+
+
+class CommandStats(object):
+    """Thread safe collection of histograms per (command type, phase)
+
+    Phases used by the driver: 'round_trip' (TL1 command till its terminator), 'parse', 'xml' and 'total' of
+    a driver request. Byte counts are stored with the round trips.
+    """
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self):
+        self._histograms = dict()
+        self._lock = threading.Lock()
+
+    def add(self, command_type, phase, seconds, byte_count=0):
+        with self._lock:
+            histogram = self._histograms.get((command_type, phase))
+            if histogram is None:
+                histogram = self._histograms[(command_type, phase)] = LatencyHistogram()
+            histogram.add(seconds, byte_count)
+
+    @contextmanager
+    def measure(self, command_type, phase):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.add(command_type, phase, time.time() - start_time)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = dict()
+
+    def get_summary(self):
+        """Return list of dicts with count, bytes and min/percentiles/max in ms, sorted by command type and phase"""
+        with self._lock:
+            item_list = sorted(self._histograms.iteritems())
+
+            summary = list()
+            for (command_type, phase), histogram in item_list:
+                summary_item = {'command': command_type, 'phase': phase, 'count': histogram.count,
+                                'bytes': histogram.byte_count, 'total': histogram.total * 1000.0,
+                                'min': (histogram.minimum or 0.0) * 1000.0, 'max': histogram.maximum * 1000.0}
+                for percent in self.PERCENTILES:
+                    summary_item['p{0}'.format(percent)] = histogram.percentile(percent) * 1000.0
+                summary.append(summary_item)
+
+        return summary
+
+
+class RequestProfiler(object):
+    """Dumps cProfile data of one driver request
+
+    'profile_request' in driver_variable is the name of the request to profile (e.g. 'get_resource_description'),
+    only the first such request is profiled. Data is written to 'profile_path' (default: current folder) as
+    '<request>_<time>.prof' and could be read with pstats.
+    """
+
+    def __init__(self):
+        settings = DriverSettings.get()
+        self._request_name = settings.profile_request
+        self._profile_path = settings.profile_path
+        self._lock = threading.Lock()
+
+    def _take(self, request_name):
+        with self._lock:
+            if not self._request_name or self._request_name != request_name:
+                return False
+
+            self._request_name = None
+            return True
+
+    def run(self, request_name, function, *args, **kwargs):
+        if not self._take(request_name):
+            return function(*args, **kwargs)
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            profiler.dump_stats(os.path.join(self._profile_path, '{0}_{1}.prof'.format(
+                request_name, time.strftime('%Y%m%d_%H%M%S'))))
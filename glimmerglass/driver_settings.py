@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+
+from common.configuration_parser import ConfigurationParser
+
+_NUMBER_TYPES = (int, long, float)
+
+# name, default, allowed types (None - any value is used as a flag)
+SETTING_LIST = (
+    ("service_mode", "tl1", (basestring,)),
+    ("port_mode", "logical", (basestring,)),
+    ("topology_cache_ttl", 0, _NUMBER_TYPES),
+    ("topology_store", "", (basestring,)),
+    ("topology_store_max_age", 86400, _NUMBER_TYPES),
+    ("incremental_autoload", False, None),
+    ("incremental_autoload_max_age", 0, _NUMBER_TYPES),
+    ("shard_sessions", 0, (int, long)),
+    ("shard_port_count", 128, (int, long)),
+    ("batch_max_size", 64, (int, long)),
+    ("pipelining", False, None),
+    ("verify_mappings", False, None),
+    ("mapping_prevalidation", False, None),
+    ("resource_xml_writer", False, None),
+    ("session_timeout", 60, _NUMBER_TYPES),
+    ("keepalive_interval", 0, _NUMBER_TYPES),
+    ("keepalive_command", "RTRV-HDR:::{0};", (basestring,)),
+    ("login_retries", 1, (int, long)),
+    ("login_backoff", 1, _NUMBER_TYPES),
+    ("login_backoff_max", 60, _NUMBER_TYPES),
+    ("max_sessions", 16, (int, long)),
+    ("worker_count", 4, (int, long)),
+    ("event_tracking", False, None),
+    ("event_command", "ALW-MSG-ALL:::{0};", (basestring,)),
+    ("log_buffered", False, None),
+    ("log_queue_size", 10000, (int, long)),
+    ("log_max_length", 0, (int, long)),
+    ("log_full_sample_rate", 0.0, _NUMBER_TYPES),
+    ("profile_request", "", (basestring,)),
+    ("profile_path", ".", (basestring,)),
+)
+# counts, sizes and timeouts which could not be 0
+POSITIVE_SETTINGS = ("batch_max_size", "shard_port_count", "max_sessions", "worker_count", "session_timeout")
+
+
+def build_port_pairing(custom_port_pairing):
+    """Validate 'custom_port_pairing' (IN logical id: OUT logical id), return it with ids as strings"""
+    port_pairing = dict()
+    paired_out_ports = set()
+    if not custom_port_pairing:
+        return port_pairing
+
+    if not isinstance(custom_port_pairing, dict):
+        raise Exception(DriverSettings.__name__, "'custom_port_pairing' should be a dictionary!")
+
+    for in_port, out_port in custom_port_pairing.iteritems():
+        in_port = str(in_port)
+        out_port = str(out_port)
+        if not in_port.isdigit() or not out_port.isdigit():
+            raise Exception(DriverSettings.__name__, "Wrong custom port pairing '{0}': '{1}'!".format(in_port,
+                                                                                                  out_port))
+        if out_port in paired_out_ports:
+            raise Exception(DriverSettings.__name__, "OUT port '{0}' is paired with several IN ports!".format(
+                out_port))
+
+        port_pairing[in_port] = out_port
+        paired_out_ports.add(out_port)
+
+    return port_pairing
+
+
+class DriverSettings(object):
+    """driver_variable values of the configuration, validated once and shared by all handlers
+
+    Every setting of SETTING_LIST is an attribute, a missing or empty ('') value gives the default, while an explicit
+    0 or false is kept (e.g. login_retries 0 turns retries off). load() is called by main.py
+    right after ConfigurationParser.init(), so a wrong value stops the driver at startup instead of failing its
+    requests; get() returns the loaded settings (and loads them on first use).
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        for name, default, value_types in SETTING_LIST:
+            value = ConfigurationParser.get("driver_variable", name)
+            if value_types is not None and value not in (None, '') and not (
+                    isinstance(value, value_types) and not isinstance(value, bool)):
+                raise Exception(self.__class__.__name__, "Wrong value of '{0}': {1!r}!".format(name, value))
+            if value_types is not None and isinstance(value, _NUMBER_TYPES) and value < 0:
+                raise Exception(self.__class__.__name__, "'{0}' should not be negative!".format(name))
+
+            if value_types is not None and value == 0 and name in POSITIVE_SETTINGS:
+                raise Exception(self.__class__.__name__, "'{0}' should be greater than 0!".format(name))
+
+            setattr(self, name, default if value in (None, '') else value)
+
+        self.service_mode = self.service_mode.lower()
+        self.port_mode = self.port_mode.lower()
+        if self.service_mode not in ("tl1", "scpi"):
+            raise Exception(self.__class__.__name__, "Unknown service_mode '{0}'!".format(self.service_mode))
+        if self.port_mode not in ("logical", "physical"):
+            raise Exception(self.__class__.__name__, "Unknown port_mode '{0}'!".format(self.port_mode))
+
+        self.custom_port_pairing = build_port_pairing(ConfigurationParser.get("driver_variable",
+                                                                              "custom_port_pairing"))
+
+    @classmethod
+    def load(cls):
+        """(Re)read and validate the settings"""
+        settings = cls()
+        with cls._lock:
+            cls._instance = settings
+
+        return settings
+
+    @classmethod
+    def get(cls):
+        settings = cls._instance
+        if settings is None:
+            settings = cls.load()
+
+        return settings
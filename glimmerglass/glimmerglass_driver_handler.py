@@ -1,47 +1,207 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import itertools
 import re
+import threading
+import time
+from contextlib import contextmanager
 
-from common.configuration_parser import ConfigurationParser
 from common.driver_handler_base import DriverHandlerBase
 from common.resource_info import ResourceInfo
+from glimmerglass import tl1_parser
+from glimmerglass.command_logging import CommandLogger, CommandLogWriter
+from glimmerglass.command_stats import CommandStats, RequestProfiler
+from glimmerglass.driver_settings import DriverSettings
+from glimmerglass.port_table import IN_PORT_BASE, OUT_PORT_BASE, PortTable
+from glimmerglass.session_pool import SessionPool
+from glimmerglass.single_flight import SingleFlight
+from glimmerglass.topology import TopologySnapshot
+
+# options of the request handled by the current thread, see forced_mappings()
+_request_options = threading.local()
+
+
+@contextmanager
+def forced_mappings():
+    """Map requests of the current thread skip 'mapping_prevalidation', like force=True of map_uni/map_bidi
+
+    Used by GlimmerglassRequestHandler for requests with <Force>true</Force>, the common RequestHandler calls
+    map_uni/map_bidi without it.
+    """
+    _request_options.force = True
+    try:
+        yield
+    finally:
+        _request_options.force = False
 
 
 class GlimmerglassDriverHandler(DriverHandlerBase):
-    def __init__(self):
+    MODEL_INFO_KEYS = ("SerialNumber", "SystemType", "Vendor", "ChassisType", "SoftwareActiveVersion")
+
+    def __init__(self, command_stats=None, request_profiler=None):
         DriverHandlerBase.__init__(self)
 
+        self._command_stats = command_stats or CommandStats()
+        self._request_profiler = request_profiler or RequestProfiler()
+
         self._ctag = 1
         self._switch_name = ''
         self._switch_size = 0
         self._mapping_info = dict()
 
         self._resource_info = None
+        self._resource_key = None
+        self._port_resources = dict()
+        self._port_table = None
+
+        self._topology = None
+        self._topology_generation = 0
+        self._autoload_flight = SingleFlight()
+        self._xml_writer = None
+        # guards ctag and topology when retrievals and mappings run at the same time (concurrent session)
+        self._state_lock = threading.RLock()
+
+        self._login_info = None
+        self._session_alive = False
+        self._last_activity = 0
+        self._login_lock = threading.RLock()
+        # held while a command waits for its response, unless the session is concurrent
+        self._session_lock = threading.RLock()
+        self._keepalive_thread = None
+        self._closed = threading.Event()
 
-        self._service_mode = ConfigurationParser.get("driver_variable", "service_mode")
-        self._port_logical_mode = ConfigurationParser.get("driver_variable", "port_mode")
-        self._custom_port_pairing = ConfigurationParser.get("driver_variable", "custom_port_pairing")
+        settings = DriverSettings.get()
+        self._service_mode = settings.service_mode
+        self._port_logical_mode = settings.port_mode
+        self._custom_port_pairing = settings.custom_port_pairing
+        self._topology_cache_ttl = settings.topology_cache_ttl
+        self._topology_store = None
+        self._store_generation = None
+        self._topology_store_max_age = settings.topology_store_max_age
+        if settings.topology_store:
+            # sqlite is imported only when the store is enabled
+            from glimmerglass.topology_store import TopologyStore
+            self._topology_store = TopologyStore(settings.topology_store)
+        self._incremental_autoload = settings.incremental_autoload
+        self._incremental_autoload_max_age = settings.incremental_autoload_max_age
+        self._batch_max_size = settings.batch_max_size
+        self._shard_port_count = settings.shard_port_count
+        self._session_pool = None
+        if settings.shard_sessions > 0:
+            self._session_pool = SessionPool(self._session.__class__, self._authenticate_pool_session,
+                                             settings.shard_sessions)
+        self._streaming = hasattr(self._session, 'send_commands')
+        self._pipelining = bool(settings.pipelining) and self._streaming
+        self._concurrent = getattr(self._session, 'concurrent', False)
+        # a concurrent session receives responses in order too, retrievals get a connection of their own so that
+        # mapping commands are not received after a long RTRV-CFG-FIBER response
+        self._retrieval_pool = None
+        if self._concurrent:
+            self._retrieval_pool = SessionPool(self._session.__class__, self._authenticate_pool_session, 1)
+        if settings.resource_xml_writer:
+            # imported only when enabled
+            from glimmerglass.resource_xml_writer import ResourceXMLWriter
+            self._xml_writer = ResourceXMLWriter()
+        self._keepalive_interval = settings.keepalive_interval
+        self._keepalive_command = settings.keepalive_command
+        self._login_retries = settings.login_retries
+        self._login_backoff = settings.login_backoff
+        self._login_backoff_max = settings.login_backoff_max
+        self._verify_mappings = settings.verify_mappings
+        self._mapping_prevalidation = settings.mapping_prevalidation
+        self._log_max_length = settings.log_max_length
+        self._log_full_sample_rate = settings.log_full_sample_rate
+        self._log_writer = None
+        if settings.log_buffered:
+            self._log_writer = CommandLogWriter.get(settings.log_queue_size)
+
+        # autonomous messages are received all the time only by a concurrent session
+        self._event_tracking = settings.event_tracking and self._concurrent \
+            and hasattr(self._session, 'set_autonomous_handler')
+        self._event_command = settings.event_command
+        self._events_active = False
+        self._events_start_time = 0
+        if self._event_tracking:
+            self._session.set_autonomous_handler(self._handle_autonomous_message)
 
     def _incr_ctag(self):
-        self._ctag += 1
-        return self._ctag
+        with self._state_lock:
+            self._ctag += 1
+            return self._ctag
+
+    def _get_command_logger(self, command_logger):
+        """Wrap command_logger of a request, see CommandLogger"""
+        if command_logger is None:
+            return None
+
+        return CommandLogger(command_logger, self._log_max_length, self._log_full_sample_rate, self._log_writer)
+
+    def is_concurrent(self):
+        """Whether retrievals could run at the same time as mapping commands"""
+        return self._concurrent
 
     def login(self, address, username, password, command_logger=None):
-        self._session.connect(address, username, password, port=None)
+        """Open authenticated session, an alive session with the same credentials is kept"""
+        command_logger = self._get_command_logger(command_logger)
+        with self._login_lock:
+            if self._session_alive and self._login_info == (address, username, password):
+                if command_logger is not None:
+                    command_logger.info('Login status: OK (session is kept open)')
+                return
+
+            if self._login_info != (address, username, password):
+                self._close_pools()
+            self._login_info = (address, username, password)
+            self._relogin(command_logger)
+
+        self._start_keepalive()
+
+    def _relogin(self, command_logger=None):
+        """Connect and authenticate with the stored credentials, retried 'login_retries' times with backoff"""
+        with self._login_lock, self._using_session():
+            self._session_alive = False
+            self._events_active = False
+            for attempt in xrange(self._login_retries + 1):
+                if attempt > 0:
+                    if command_logger is not None:
+                        command_logger.info('Didn\'t find success message, retrying ...')
+                    if self._closed.wait(min(self._login_backoff * 2 ** (attempt - 1), self._login_backoff_max)):
+                        break
+
+                try:
+                    if self._authenticate(command_logger):
+                        self._session_alive = True
+                        self._last_activity = time.time()
+                        if self._event_tracking:
+                            self._enable_events(command_logger)
+                        return
+                except Exception as error:
+                    if command_logger is not None:
+                        command_logger.info('Login error: {0}'.format(error))
+
+            raise Exception(self.__class__.__name__, "Can't login to '{0}'!".format(self._login_info[0]))
+
+    def _authenticate(self, command_logger=None, session=None):
+        """Connect and log in 'session' (the handler session by default), return False if login was not confirmed"""
+        if session is None:
+            session = self._session
+
+        address, username, password = self._login_info
+        session.connect(address, username, password, port=None)
 
         if self._service_mode.lower() == "scpi":
             pass
         elif self._service_mode.lower() == "tl1":
-            command = 'ACT-USER::{0}:{1}::{2};'.format(username, self._ctag, password)
-            command_result = self._session.send_command(command, re_string=self._prompt)
-            command_logger.info(command_result)
+            command = 'ACT-USER::{0}:{1}::{2};'.format(username, self._incr_ctag(), password)
+            command_result = session.send_command(command, re_string=self._prompt)
+            if command_logger is not None:
+                command_logger.info(command_result)
 
             if not re.search (r'COMPLD', command_result):
-                command_logger.info('Didn\'t find success message, retrying ...')
-                command_result = self._session.send_command(command, re_string=self._prompt)
-                command_logger.info(command_result)
-            else:
+                return False
+
+            if command_logger is not None:
                 command_logger.info('Login status: OK')
 
             match_result = re.search(r"<\s+(?P<host>\S+)\s+\d+", command_result, re.DOTALL)
@@ -51,38 +211,486 @@ class GlimmerglassDriverHandler(DriverHandlerBase):
             raise Exception(self.__class__.__name__, "From service mode type (current mode: '" +
                             self._service_mode + "'!")
 
-    def _get_device_data(self):
+        return True
+
+    def _authenticate_pool_session(self, session):
+        if self._login_info is None:
+            return False
+
+        return self._authenticate(session=session)
+
+    def _enable_events(self, command_logger=None):
+        """Ask the switch for autonomous messages, snapshots retrieved from now on are kept current by them"""
+        events_start_time = time.time()
+        try:
+            command_result = self._session.send_command(self._event_command.format(self._incr_ctag()),
+                                                        re_string=self._prompt)
+        except Exception as error:
+            command_result = str(error)
+
+        if command_logger is not None:
+            command_logger.info(command_result)
+
+        if tl1_parser.get_response_status(command_result)[1] == "COMPLD":
+            self._events_start_time = events_start_time
+            self._events_active = True
+
+    def _handle_autonomous_message(self, message):
+        """Apply cross-connect and port health changes reported by the switch to the topology snapshot"""
+        change_list = tl1_parser.parse_autonomous_message(message)
+        if not change_list:
+            return
+
+        with self._state_lock:
+            self._topology_generation += 1
+            topology = self._topology
+            if topology is None:
+                return
+
+            for change in change_list:
+                if change[0] == 'connect':
+                    topology.connect(change[1], change[2])
+                elif change[0] == 'disconnect':
+                    topology.disconnect(change[1])
+                else:
+                    topology.set_port_health(change[1], change[2])
+
+    def _is_tracked(self, topology):
+        """Whether the snapshot is kept current by autonomous messages, so it never expires"""
+        return self._events_active and self._session_alive and self._session.is_listening() \
+            and topology.fetch_time >= self._events_start_time
+
+    def _start_keepalive(self):
+        if self._keepalive_interval <= 0 or self._keepalive_thread is not None:
+            return
+
+        self._keepalive_thread = threading.Thread(target=self._keepalive_loop)
+        self._keepalive_thread.daemon = True
+        self._keepalive_thread.start()
+
+    def _keepalive_loop(self):
+        """Send heartbeat when the session was idle for 'keepalive_interval', log in again if it is dead"""
+        backoff = self._login_backoff
+        while not self._closed.wait(self._keepalive_interval if self._session_alive else backoff):
+            if not self._session_alive:
+                try:
+                    self._relogin()
+                    backoff = self._login_backoff
+                except Exception:
+                    backoff = min(backoff * 2, self._login_backoff_max)
+                continue
+
+            if time.time() - self._last_activity < self._keepalive_interval:
+                continue
+
+            # session is busy (and so alive) if the lock is taken
+            if not self._concurrent and not self._session_lock.acquire(False):
+                continue
+            try:
+                response = self._session.send_command(self._keepalive_command.format(self._incr_ctag()),
+                                                      re_string=self._prompt)
+                if tl1_parser.get_response_status(response)[1] is None:
+                    self._session_alive = False
+                self._last_activity = time.time()
+            except Exception:
+                self._session_alive = False
+            finally:
+                if not self._concurrent:
+                    self._session_lock.release()
+
+    def close(self):
+        """Stop keepalive and close the session"""
+        self._closed.set()
+        with self._login_lock:
+            self._session_alive = False
+            if hasattr(self._session, 'disconnect'):
+                self._session.disconnect()
+
+        self._close_pools()
+
+    def _close_pools(self):
+        for session_pool in (self._session_pool, self._retrieval_pool):
+            if session_pool is not None:
+                session_pool.close()
+
+    def _send_commands(self, command_list, record_parsers=None):
+        """Send commands over an alive session, log in again first if the session was found dead
+
+        Retrievals (rtrv-*) which fail because of the session (e.g. it was closed by the switch or the network) are
+        sent once more over a new session, so the request does not see the dead session. Cross-connect commands
+        are not sent again, the switch could have applied them already.
+        """
+        try:
+            return self._send_commands_once(command_list, record_parsers)
+        except Exception:
+            if self._login_info is None or self._closed.is_set() or not all(
+                    self._get_command_type(command).startswith('rtrv') for command in command_list):
+                raise
+
+        self._command_stats.add(self._get_command_type(command_list[0]), 'retry', 0)
+        self._reset_parsers(record_parsers)
+
+        return self._send_commands_once(command_list, record_parsers)
+
+    @staticmethod
+    def _reset_parsers(record_parsers):
+        for record_parser in record_parsers or list():
+            if record_parser is not None:
+                record_parser.reset()
+
+    def _send_commands_once(self, command_list, record_parsers=None):
+        if not self._session_alive and self._login_info is not None and not self._closed.is_set():
+            with self._login_lock:
+                if not self._session_alive:
+                    self._relogin()
+
+        with self._using_session():
+            try:
+                response_list = self._exchange_commands(command_list, record_parsers)
+            except Exception:
+                self._session_alive = False
+                self._events_active = False
+                raise
+
+        self._last_activity = time.time()
+        return response_list
+
+    @contextmanager
+    def _using_session(self):
+        """Exclusive use of the session, a concurrent session is shared"""
+        if self._concurrent:
+            yield
+        else:
+            with self._session_lock:
+                yield
+
+    def _exchange_commands(self, command_list, record_parsers=None, session=None):
+        """Send TL1 commands, back to back if pipelining is enabled, return responses in command order
+
+        Quoted records of every response are passed to the matching record parser of 'record_parsers' (optional
+        list in command order), while the response is being received if the session supports streaming (parsing
+        time is then part of the round trip). Round trip and response size are recorded per command type. Commands
+        are sent over the handler session unless 'session' (of the session pool) is given.
+        """
+        if session is None:
+            session = self._session
+        if record_parsers is None:
+            record_parsers = [None] * len(command_list)
+
+        if self._pipelining and len(command_list) > 1:
+            start_time = time.time()
+            response_list = session.send_commands(command_list, re_string=self._prompt,
+                                                  record_parsers=record_parsers)
+            # commands were sent at once, every one of them waited for the whole pipeline
+            round_trip = time.time() - start_time
+            for command, response in zip(command_list, response_list):
+                self._command_stats.add(self._get_command_type(command), 'round_trip', round_trip, len(response))
+
+            return response_list
+
+        response_list = list()
+        for command, record_parser in zip(command_list, record_parsers):
+            command_type = self._get_command_type(command)
+            start_time = time.time()
+            if self._streaming:
+                response = session.send_command(command, re_string=self._prompt, record_parser=record_parser)
+            else:
+                response = session.send_command(command, re_string=self._prompt)
+            self._command_stats.add(command_type, 'round_trip', time.time() - start_time, len(response))
+
+            if not self._streaming and record_parser is not None:
+                with self._command_stats.measure(command_type, 'parse'):
+                    record_parser.feed_response(response)
+
+            response_list.append(response)
+
+        return response_list
+
+    @staticmethod
+    def _get_command_type(command):
+        return command.split(':', 1)[0].strip().lower()
+
+    def _retrieve(self, command_template_list, record_parsers=None):
+        """Send retrieval commands, raise an exception unless the switch completed every one of them
+
+        A denied or partial response would be parsed as an empty (or incomplete) port or cross-connect list.
+        With a concurrent session the commands are sent over the retrieval session, the handler session is used if
+        it fails.
+        """
+        command_list = [command_template.format(self._incr_ctag()) for command_template in command_template_list]
+        response_list = None
+        if self._retrieval_pool is not None and self._login_info is not None:
+            try:
+                response_list = self._retrieval_pool.map(self._exchange_retrieval, [(command_list, record_parsers)])[0]
+            except Exception:
+                self._command_stats.add(self._get_command_type(command_list[0]), 'fallback', 0)
+                self._reset_parsers(record_parsers)
+        if response_list is None:
+            response_list = self._send_commands(command_list, record_parsers)
+        self._check_responses(command_list, response_list)
+
+        return response_list
+
+    def _exchange_retrieval(self, session, retrieval):
+        command_list, record_parsers = retrieval
+        # parsers could have been fed by a failed attempt of the session pool
+        self._reset_parsers(record_parsers)
+        return self._exchange_commands(command_list, record_parsers, session)
+
+    def _check_responses(self, command_list, response_list):
+        for command, response in zip(command_list, response_list):
+            ctag, status = tl1_parser.get_response_status(response)
+            if status != "COMPLD":
+                raise Exception(self.__class__.__name__, "Can't retrieve '{0}' (status: {1})!".format(
+                    self._get_command_type(command), status))
+
+    def _get_device_data(self, previous_topology=None):
+        """Retrieve system info, port list and cross-connects
+
+        Parsed port list of 'previous_topology' is reused when its fingerprint matches, in incremental autoload mode
+        RTRV-CFG-FIBER is skipped while system info is unchanged and the port list is not older than
+        'incremental_autoload_max_age'.
+        """
         device_data = dict()
 
         if self._service_mode.lower() == "scpi":
             pass
         elif self._service_mode.lower() == "tl1":
-            command = "rtrv-system-info:::{0};".format(self._incr_ctag())
-            device_data["system_info"] = self._session.send_command(command, re_string=self._prompt)
+            reuse_port_list = self._incremental_autoload and previous_topology is not None \
+                and not previous_topology.is_port_list_expired(self._incremental_autoload_max_age)
 
-            size_match = re.search(r"LicensedPortMatrix=(?P<src>\d+)x(?P<dst>\d+)", device_data["system_info"],
-                                   re.DOTALL)
+            system_info_parser = tl1_parser.SystemInfoParser()
+            port_list_parser = tl1_parser.PortListParser()
+            connection_parser = tl1_parser.ConnectionParser()
 
-            if size_match is not None:
-                size_dict = size_match.groupdict()
+            if self._session_pool is not None:
+                self._retrieve(["rtrv-system-info:::{0};"], [system_info_parser])
+                if reuse_port_list and previous_topology.system_fingerprint != system_info_parser.fingerprint:
+                    reuse_port_list = False
+                port_list_parser, connection_parser = self._retrieve_shards(system_info_parser.result,
+                                                                            reuse_port_list)
+            elif reuse_port_list:
+                self._retrieve(["rtrv-system-info:::{0};", "rtrv-crs-fiber::all:{0};"],
+                               [system_info_parser, connection_parser])
+            else:
+                self._retrieve(["rtrv-system-info:::{0};", "RTRV-CFG-FIBER::all:{0};", "rtrv-crs-fiber::all:{0};"],
+                               [system_info_parser, port_list_parser, connection_parser])
+
+            device_data["system_fingerprint"] = system_info_parser.fingerprint
+            device_data["system_info"] = system_info_parser.result
 
-                self._switch_size = int(size_dict["src"]) + int(size_dict["dst"])
+            matrix_size = tl1_parser.parse_matrix_size(device_data["system_info"])
+            if matrix_size is not None:
+                self._switch_size = matrix_size[0] + matrix_size[1]
             else:
                 raise Exception(self.__class__.__name__, "Can't find 'size' parameter!")
 
-            command = "RTRV-CFG-FIBER::all:{0};".format(self._incr_ctag())
-            device_data["port_list"] = self._session.send_command(command, re_string=self._prompt)
+            if reuse_port_list and previous_topology.system_fingerprint != device_data["system_fingerprint"]:
+                reuse_port_list = False
+                self._retrieve(["RTRV-CFG-FIBER::all:{0};"], [port_list_parser])
+
+            if reuse_port_list:
+                device_data["port_fingerprint"] = previous_topology.port_fingerprint
+                device_data["port_list"] = previous_topology.port_list
+                device_data["port_fetch_time"] = previous_topology.port_fetch_time
+            else:
+                device_data["port_fingerprint"] = port_list_parser.fingerprint
+                if previous_topology is not None \
+                        and previous_topology.port_fingerprint == device_data["port_fingerprint"]:
+                    device_data["port_list"] = previous_topology.port_list
+                else:
+                    device_data["port_list"] = port_list_parser.result
+                device_data["port_fetch_time"] = None
 
-            command = "rtrv-crs-fiber::all:{0};".format(self._incr_ctag())
-            device_data["connections_map"] = self._session.send_command(command, re_string=self._prompt)
+            device_data["connections_map"] = connection_parser.result
         else:
             raise Exception(self.__class__.__name__, "From service mode type (current mode: '" +
                             self._service_mode + "'!")
 
         return device_data
 
-    def get_resource_description(self, address, command_logger=None):
-        device_data = self._get_device_data()
+    def _get_shard_list(self, matrix_size):
+        """Return list of (port AID, cross-connect AID) of port ranges of 'shard_port_count' IN and OUT ports"""
+        in_count, out_count = matrix_size
+        shard_list = list()
+        for first in xrange(1, max(in_count, out_count) + 1, self._shard_port_count):
+            last = first + self._shard_port_count - 1
+            in_aid = None
+            aid_list = list()
+            if first <= in_count:
+                in_aid = tl1_parser.format_aid_range(IN_PORT_BASE + first, IN_PORT_BASE + min(last, in_count))
+                aid_list.append(in_aid)
+            if first <= out_count:
+                aid_list.append(tl1_parser.format_aid_range(OUT_PORT_BASE + first, OUT_PORT_BASE + min(last,
+                                                                                                       out_count)))
+            shard_list.append(('&'.join(aid_list), in_aid))
+
+        return shard_list
+
+    def _retrieve_shard(self, session, shard, reuse_port_list=False):
+        """Retrieve port list (unless reused) and cross-connects of one port range over a pool session
+
+        Raises an exception unless the switch completed both commands, a shard is never merged incomplete.
+        """
+        port_aid, connection_aid = shard
+        port_list_parser = tl1_parser.PortListParser()
+        connection_parser = tl1_parser.ConnectionParser()
+        command_list = list()
+        parser_list = list()
+        if not reuse_port_list:
+            command_list.append("RTRV-CFG-FIBER::{0}:{1};".format(port_aid, self._incr_ctag()))
+            parser_list.append(port_list_parser)
+        if connection_aid is not None:
+            command_list.append("rtrv-crs-fiber::{0}:{1};".format(connection_aid, self._incr_ctag()))
+            parser_list.append(connection_parser)
+
+        if command_list:
+            self._check_responses(command_list, self._exchange_commands(command_list, parser_list, session))
+
+        return port_list_parser, connection_parser
+
+    def _retrieve_shards(self, system_info, reuse_port_list=False):
+        """Retrieve port list (unless reused) and cross-connects in port range shards, in parallel over the pool
+
+        Return merged parsers. A chassis of one shard, or a failed pool or shard (e.g. DENY), is retrieved with 'all'
+        over the handler session.
+        """
+        matrix_size = tl1_parser.parse_matrix_size(system_info)
+        if matrix_size is not None:
+            shard_list = self._get_shard_list(matrix_size)
+            if len(shard_list) > 1:
+                try:
+                    with self._command_stats.measure('sharded_retrieval', 'round_trip'):
+                        parser_pairs = self._session_pool.map(
+                            lambda session, shard: self._retrieve_shard(session, shard, reuse_port_list), shard_list)
+                except Exception:
+                    self._command_stats.add('sharded_retrieval', 'fallback', 0)
+                else:
+                    port_list_parser = tl1_parser.MergedParser([pair[0] for pair in parser_pairs])
+                    # shards hold IN and OUT ports of a range, the port list is ordered like the 'all' one
+                    port_list_parser.result.sort(key=lambda port_record: port_record.port_id)
+                    return port_list_parser, tl1_parser.MergedParser([pair[1] for pair in parser_pairs])
+
+        port_list_parser = tl1_parser.PortListParser()
+        connection_parser = tl1_parser.ConnectionParser()
+        if reuse_port_list:
+            self._retrieve(["rtrv-crs-fiber::all:{0};"], [connection_parser])
+        else:
+            self._retrieve(["RTRV-CFG-FIBER::all:{0};", "rtrv-crs-fiber::all:{0};"],
+                           [port_list_parser, connection_parser])
+
+        return port_list_parser, connection_parser
+
+    def _get_topology(self, address=None, command_logger=None):
+        """Return topology snapshot, retrieve it from the device if there is no snapshot or it is expired
+
+        With a topology store the first request after start is served from the stored snapshot (revalidated in the
+        background) and a newer snapshot stored by another driver process replaces an unchanged local one.
+        """
+        topology = self._topology
+        if self._topology_store is not None and address is not None:
+            topology, warm_start = self._get_stored_topology(address, topology, command_logger)
+            if warm_start:
+                return topology
+
+        if topology is None or (topology.is_expired(self._topology_cache_ttl) and not self._is_tracked(topology)):
+            topology = self._retrieve_topology(address, topology, command_logger)
+
+        return topology
+
+    def _retrieve_topology(self, address=None, previous_topology=None, command_logger=None):
+        generation = self._topology_generation
+        device_data = self._get_device_data(previous_topology)
+        topology = TopologySnapshot(device_data["system_info"], device_data["port_list"],
+                                    device_data["connections_map"],
+                                    system_fingerprint=device_data["system_fingerprint"],
+                                    port_fingerprint=device_data["port_fingerprint"],
+                                    port_fetch_time=device_data["port_fetch_time"])
+
+        with self._state_lock:
+            # cross-connects were changed while retrieving, snapshot is used only for this description
+            changed = generation != self._topology_generation
+            if changed:
+                topology.fetch_time = 0
+            self._topology = topology
+            topology_copy = None
+            if self._topology_store is not None and address is not None and not changed:
+                # mapping commands and autonomous messages could change the snapshot while it is being stored
+                topology_copy = topology.copy()
+
+        if topology_copy is not None:
+            try:
+                self._store_generation = self._topology_store.save(address, topology_copy)
+            except Exception as error:
+                if command_logger is not None:
+                    command_logger.info("Can't store topology of '{0}': {1}".format(address, error))
+
+        return topology
+
+    def _get_stored_topology(self, address, topology, command_logger=None):
+        """Return (snapshot, whether it is a warm start snapshot), 'topology' if the store has nothing newer"""
+        try:
+            generation = self._topology_store.get_generation(address)
+            if generation is None or generation == self._store_generation:
+                return topology, False
+
+            generation, stored_topology = self._topology_store.load(address)
+        except Exception as error:
+            if command_logger is not None:
+                command_logger.info("Can't load stored topology of '{0}': {1}".format(address, error))
+            return topology, False
+
+        warm_start = topology is None
+        if warm_start and time.time() - stored_topology.fetch_time > self._topology_store_max_age:
+            return topology, False
+        # local snapshot is kept if it is newer or changed by mapping commands
+        if not warm_start and (stored_topology.fetch_time <= topology.fetch_time or topology.version > 1):
+            return topology, False
+
+        matrix_size = tl1_parser.parse_matrix_size(stored_topology.system_info)
+        if matrix_size is None:
+            return topology, False
+
+        with self._state_lock:
+            if self._topology is not topology:
+                return self._topology or topology, False
+            self._topology = stored_topology
+            self._store_generation = generation
+            self._switch_size = matrix_size[0] + matrix_size[1]
+
+        if warm_start:
+            revalidation_thread = threading.Thread(target=self._revalidate_topology, args=(address, command_logger))
+            revalidation_thread.daemon = True
+            revalidation_thread.start()
+
+        return stored_topology, warm_start
+
+    def _revalidate_topology(self, address, command_logger=None):
+        """Replace the warm start snapshot with a retrieval from the device"""
+        try:
+            self._retrieve_topology(address, self._topology, command_logger)
+        except Exception as error:
+            if command_logger is not None:
+                command_logger.info("Can't revalidate stored topology of '{0}': {1}".format(address, error))
+
+    def _get_port_mappings(self, topology):
+        """Return port index -> mapped port index"""
+        self._port_table.set_connections(topology.connections)
+
+        if self._port_logical_mode.lower() == "logical":
+            return self._port_table.get_logical_mappings()
+
+        return self._port_table.get_physical_mappings()
+
+    def _iter_ports(self):
+        """Yield (port index, state) of the port resources for the current port_mode"""
+        if self._port_logical_mode.lower() == "logical":
+            return self._port_table.iter_logical_ports()
+
+        return self._port_table.iter_physical_ports()
+
+    def _build_chassis_resource(self, address, topology):
+        system_info = topology.system_info
 
         self._resource_info = ResourceInfo()
         self._resource_info.set_depth(0)
@@ -90,205 +698,640 @@ class GlimmerglassDriverHandler(DriverHandlerBase):
 
         self._resource_info.set_address(address)
 
-        if self._service_mode.lower() == "scpi":
-            pass
-        elif self._service_mode.lower() == "tl1":
-            model_info_match = re.search('SerialNumber=(?P<serial>\S+)".*SystemType=(?P<type>\S+)".*"(?P<vendor>\S+):' +
-                                         'ChassisType=(?P<model>\S+)".*SoftwareActiveVersion=(?P<version>\S+)"',
-                                         device_data["system_info"], re.DOTALL)
+        # add chassis info
+        if all(key in system_info for key in self.MODEL_INFO_KEYS):
+            self._resource_info.add_attribute("Vendor", system_info["Vendor"])
+            self._resource_info.add_attribute("Type", system_info["SystemType"])
+            self._resource_info.add_attribute("Version", system_info["SoftwareActiveVersion"])
+            self._resource_info.add_attribute("Model", system_info["ChassisType"])
+
+            self._resource_info.set_model_name(system_info["ChassisType"])
+            self._resource_info.set_serial_number(system_info["SerialNumber"])
+        else:
+            raise Exception(self.__class__.__name__, "Can't parse model info!")
 
-            # add chassis info
-            if model_info_match is not None:
-                model_info_dict = model_info_match.groupdict()
+        if self._xml_writer is not None:
+            self._xml_writer.set_chassis(address, system_info["ChassisType"], system_info["SerialNumber"],
+                                         [("Vendor", system_info["Vendor"]), ("Type", system_info["SystemType"]),
+                                          ("Version", system_info["SoftwareActiveVersion"]),
+                                          ("Model", system_info["ChassisType"])])
 
-                self._resource_info.add_attribute("Vendor", model_info_dict["vendor"])
-                self._resource_info.add_attribute("Type", model_info_dict["type"])
-                self._resource_info.add_attribute("Version", model_info_dict["version"])
-                self._resource_info.add_attribute("Model", model_info_dict["model"])
+        self._port_table = PortTable.from_port_list(topology.port_list, self._custom_port_pairing)
+        self._port_resources = dict()
 
-                model_name = model_info_dict["model"]
+    def _run_request(self, request_name, function, *args):
+        """Run driver request, record its total time and profile it if 'profile_request' asks for it
 
-                self._resource_info.set_model_name(model_info_dict["model"])
-                self._resource_info.set_serial_number(model_info_dict["serial"])
-            else:
-                raise Exception(self.__class__.__name__, "Can't parse model info!")
+        The last argument of every request is its command_logger, it is wrapped by _get_command_logger.
+        """
+        args = args[:-1] + (self._get_command_logger(args[-1]),)
+        with self._command_stats.measure(request_name, 'total'):
+            return self._request_profiler.run(request_name, function, *args)
+
+    def get_stats(self):
+        """Return latency summary of TL1 commands and driver requests, see CommandStats.get_summary"""
+        return self._command_stats.get_summary()
+
+    def get_resource_description(self, address, command_logger=None):
+        """Requests for an address arriving while one is in progress wait for it and share its result"""
+        start_time = time.time()
+        resource_description, shared = self._autoload_flight.do(address, self._run_request,
+                                                                 'get_resource_description',
+                                                                 self._get_resource_description, address,
+                                                                 command_logger)
+        if shared:
+            self._command_stats.add('get_resource_description', 'coalesced', time.time() - start_time)
+            if command_logger is not None:
+                command_logger.info('Resource description is shared with a request in progress')
+
+        return resource_description
+
+    def _get_resource_description(self, address, command_logger=None):
+        if self._service_mode.lower() == "scpi":
+            self._resource_info = ResourceInfo()
+            self._resource_info.set_depth(0)
+            self._resource_info.set_index(1)
+
+            self._resource_info.set_address(address)
+        elif self._service_mode.lower() == "tl1":
+            topology = self._get_topology(address, command_logger)
+
+            # chassis and port resources are rebuilt only if system info or port list have changed
+            resource_key = (address, topology.system_fingerprint, topology.port_fingerprint)
+            if self._resource_info is None or self._resource_key != resource_key:
+                self._build_chassis_resource(address, topology)
+                self._resource_key = resource_key
 
             # get port mappings and port info
             address_prefix = address + "/"
-            port_map_list = device_data["connections_map"].split("\n")
-            port_list = device_data['port_list'].split("\n")
-
-            if self._port_logical_mode.lower() == "logical":
-                logical_port_map = dict()
-                for port_data in port_list:
-                    port_info_match = re.search(r"PORTID=(?P<id>\d+).*PORTNAME=(?P<name>(IN|OUT)\d+)" +
-                                                ".*PORTHEALTH=(?P<state>good|bad)", port_data, re.DOTALL)
-                    if port_info_match is not None:
-                        port_info_dict = port_info_match.groupdict()
-                        logical_port_id = re.sub('(IN|OUT)', '', port_info_dict["name"])
-                        if logical_port_id not in logical_port_map.keys():
-                            logical_port_map[logical_port_id] = {}
-                        if port_info_dict["state"].lower() == "good":
-                            port_state = "Enable"
-                        else:
-                            port_state = "Disable"
-
-                        logical_port_map[logical_port_id]['state'] = port_state
-
-                        if 'in' in port_info_dict["name"].lower():
-                            logical_port_map[logical_port_id]['in'] = logical_port_id
-                        else:
-                            if logical_port_id in self._custom_port_pairing.values():
-                                for key, value in self._custom_port_pairing.iteritems():
-                                    if value == logical_port_id and key in logical_port_map:
-                                        logical_port_map[key]['out'] = logical_port_id
-                            else:
-                                logical_port_map[logical_port_id]['out'] = logical_port_id
-
-                for port_id, port_data in logical_port_map.iteritems():
-                    if 'in' in port_data and 'out' in port_data:
-                        logical_port_map[port_id]['port_address'] = '{0}-{1}'.format(
-                            logical_port_map[port_id]['in'],
-                            logical_port_map[port_id]['out'])
-
-                for port_data in port_map_list:
-                    port_map_match = re.search(r"IPORTID=(?P<src_port>\d+).*IPORTNAME=(?P<src_port_name>\S+),IP.*" +
-                                               "OPORTID=(?P<dst_port>\d+).*OPORTNAME=(?P<dst_port_name>\S+),OP.*",
-                                               port_data, re.DOTALL)
-                    if port_map_match is not None:
-                        port_map_dict = port_map_match.groupdict()
-                        src_logical_port_id = re.sub('(IN|OUT)', '', port_map_dict["src_port_name"])
-                        dst_logical_port_id = re.sub('(IN|OUT)', '', port_map_dict["dst_port_name"])
-                        if src_logical_port_id in logical_port_map.keys() \
-                                and dst_logical_port_id in logical_port_map.keys():
-                            self._mapping_info[dst_logical_port_id] = src_logical_port_id
-
-                for logical_port_index, logical_port_data in logical_port_map.iteritems():
-                    port_resource_info = ResourceInfo()
-                    port_resource_info.set_depth(1)
-                    if 'port_address' not in logical_port_data:
-                        continue
-                    port_resource_info.set_index(logical_port_data['port_address'])
-                    port_resource_info.set_model_name(model_name)
-                    if logical_port_index in self._mapping_info:
-                        port_resource_info.set_mapping(address_prefix +
-                                                       logical_port_map[self._mapping_info[logical_port_index]][
-                                                           'port_address'])
-                    port_resource_info.add_attribute("State", logical_port_data['state'])
-                    port_resource_info.add_attribute("Protocol Type", 0)
-                    self._resource_info.add_child(logical_port_data['port_address'], port_resource_info)
-            else:
-                for port_data in port_map_list:
-                    port_map_match = re.search(r"IPORTID=(?P<src_port>\d+).*IPORTNAME=(?P<src_port_name>\S+),IP.*" +
-                                               "OPORTID=(?P<dst_port>\d+).*OPORTNAME=(?P<dst_port_name>\S+),OP.*",
-                                               port_data, re.DOTALL)
-
-                    if port_map_match is not None:
-                        port_map_dict = port_map_match.groupdict()
-                        if int(port_map_dict['src_port']) > 0 and \
-                                        int(port_map_dict['dst_port']) > 0:
-                            src_port = port_map_dict["src_port"]
-                            dst_port = port_map_dict["dst_port"]
-                            # self._mapping_info[dst_port] = src_port
-                            self._mapping_info[src_port] = dst_port
-
-                for port_data in port_list:
-                    port_info_match = re.search(r"PORTID=(?P<id>\d+).*PORTNAME=(?P<name>(IN|OUT)\d+)" +
-                                                ".*PORTHEALTH=(?P<state>good|bad)", port_data, re.DOTALL)
-
-                    if port_info_match is not None:
-                        port_info_dict = port_info_match.groupdict()
-
-                        port_resource_info = ResourceInfo()
-                        port_resource_info.set_depth(1)
-
-                        port_id = port_info_dict["id"]
-                        port_resource_info.set_index(port_id)
-                        port_resource_info.set_model_name(model_name)
-                        #port_resource_info.set_name(port_info_dict["name"])
-
-                        if port_id in self._mapping_info:
-                            port_resource_info.set_mapping(address_prefix + self._mapping_info[port_id])
-
-                        if port_info_dict["state"].lower() == "good":
-                            port_resource_info.add_attribute("State", "Enable")
-                        else:
-                            port_resource_info.add_attribute("State", "Disable")
-
-                        port_resource_info.add_attribute("Protocol Type", 0)
-
-                        self._resource_info.add_child(port_info_dict["id"], port_resource_info)
+            model_name = topology.system_info["ChassisType"]
+            with self._state_lock:
+                self._mapping_info = self._get_port_mappings(topology)
+
+            # port elements are rendered from templates (reused while unchanged) instead of ResourceInfo objects
+            if self._xml_writer is not None:
+                with self._command_stats.measure('get_resource_description', 'xml'):
+                    return self._xml_writer.to_xml(self._iter_ports(), self._mapping_info, address_prefix)
+
+            for port_index, port_state in self._iter_ports():
+                port_mapping = self._mapping_info.get(port_index)
+                if port_index in self._port_resources and self._port_resources[port_index][0] == port_mapping:
+                    continue
+
+                port_resource_info = ResourceInfo()
+                port_resource_info.set_depth(1)
+                port_resource_info.set_index(port_index)
+                port_resource_info.set_model_name(model_name)
+
+                if port_mapping is not None:
+                    port_resource_info.set_mapping(address_prefix + port_mapping)
+
+                port_resource_info.add_attribute("State", port_state)
+                port_resource_info.add_attribute("Protocol Type", 0)
+
+                self._resource_info.add_child(port_index, port_resource_info)
+                self._port_resources[port_index] = (port_mapping, port_resource_info)
         else:
             raise Exception(self.__class__.__name__, "From service mode type (current mode: '" +
                             self._service_mode + "'!")
 
-        return self._resource_info.convert_to_xml()
+        with self._command_stats.measure('get_resource_description', 'xml'):
+            return self._resource_info.convert_to_xml()
+
+    def _drop_topology(self):
+        with self._state_lock:
+            self._topology_generation += 1
+            self._topology = None
+
+    def _send_map_commands(self, command_list, command_logger=None):
+        """Send cross-connect commands, return list of response statuses (None if there is no response status)
+
+        Topology snapshot is dropped if the switch state after a command is unknown: there is no response status or
+        the command failed (e.g. a timeout, the switch could have applied it).
+        """
+        try:
+            response_list = self._send_commands(command_list)
+        except Exception:
+            self._drop_topology()
+            raise
+
+        status_list = list()
+        for command_result in response_list:
+            if command_logger is not None:
+                command_logger.info(command_result)
+
+            ctag, status = tl1_parser.get_response_status(command_result)
+            if status is None:
+                self._drop_topology()
+
+            status_list.append(status)
+
+        return status_list
+
+    def _get_connect_command(self, connection_list):
+        """Return one ent-crs-fiber command for list of (IN port, OUT port)"""
+        return "ent-crs-fiber::{0},{1}:{2};".format('&'.join(str(src) for src, dst in connection_list),
+                                                   '&'.join(str(dst) for src, dst in connection_list),
+                                                   self._incr_ctag())
+
+    def _apply_connect(self, connection_list):
+        with self._state_lock:
+            self._topology_generation += 1
+            if self._topology is not None:
+                for src_in_port, dst_out_port in connection_list:
+                    self._topology.connect(src_in_port, dst_out_port)
+
+    def _get_disconnect_command(self, port_list):
+        """Return one dlt-crs-fiber command for list of IN ports"""
+        return "dlt-crs-fiber::{0}:{1};".format('&'.join(str(port) for port in port_list), self._incr_ctag())
+
+    def _apply_disconnect(self, port_list):
+        with self._state_lock:
+            self._topology_generation += 1
+            if self._topology is not None:
+                for src_in_port in port_list:
+                    self._topology.disconnect(src_in_port)
+
+    def _retrieve_port_connections(self, port_list, command_logger=None):
+        """Retrieve cross-connects of the IN ports of 'port_list' only, topology snapshot is updated with them
+
+        Returns (response status, dict IN port -> OUT port of the connected ports).
+        """
+        connection_parser = tl1_parser.ConnectionParser()
+        command_result = self._send_commands(["rtrv-crs-fiber::{0}:{1};".format('&'.join(port_list),
+                                                                                self._incr_ctag())],
+                                             [connection_parser])[0]
+        if command_logger is not None:
+            command_logger.info(command_result)
+
+        ctag, status = tl1_parser.get_response_status(command_result)
+        if status != "COMPLD":
+            return status, dict()
+
+        actual_connections = dict((str(connection.src_port), str(connection.dst_port))
+                                  for connection in connection_parser.result)
+        with self._state_lock:
+            if self._topology is not None:
+                for port in port_list:
+                    if port in actual_connections:
+                        self._topology.connect(port, actual_connections[port])
+                    else:
+                        self._topology.disconnect(port)
+
+        return status, actual_connections
+
+    def _verify_connections(self, expected_connections, command_logger=None):
+        """Retrieve cross-connects of the IN ports of 'expected_connections' only and compare them
+
+        'expected_connections' is IN port -> OUT port (None for a disconnected port). Topology snapshot is updated
+        with the retrieved state. Returns dict IN port -> (success, error message).
+        """
+        port_list = sorted(expected_connections, key=int)
+        status, actual_connections = self._retrieve_port_connections(port_list, command_logger)
+        if status != "COMPLD":
+            return dict((port, (False, "Can't verify cross-connect of port '{0}' (status: {1})".format(port, status)))
+                        for port in port_list)
+
+        verification = dict()
+        for port in port_list:
+            expected_port = expected_connections[port]
+            actual_port = actual_connections.get(port)
+            if expected_port == actual_port:
+                verification[port] = (True, '')
+            elif expected_port is None:
+                verification[port] = (False, "Port '{0}' is still connected to '{1}'".format(port, actual_port))
+            else:
+                verification[port] = (False, "Port '{0}' is connected to '{1}' instead of '{2}'".format(
+                    port, actual_port or 'nothing', expected_port))
+
+        return verification
+
+    def _check_connections(self, expected_connections, command_logger=None):
+        """Raise an exception with the errors of all ports which are not in the expected state"""
+        verification = self._verify_connections(expected_connections, command_logger)
+        error_list = [error for port, (success, error) in sorted(verification.iteritems()) if not success]
+        if error_list:
+            raise Exception(self.__class__.__name__, '; '.join(error_list))
+
+    def _prevalidate_connections(self, connection_list, command_logger=None):
+        """Raise an exception if the topology snapshot shows that the switch would deny the cross-connects
+
+        A port is missing from the port list or has PORTHEALTH=bad, or an OUT port is connected to another IN port.
+        Nothing is checked before the first autoload or against an expired snapshot (unless it is kept current by
+        autonomous messages), the switch then decides.
+        """
+        error_list = list()
+        with self._state_lock:
+            topology = self._topology
+            if topology is None or (topology.is_expired(self._topology_cache_ttl) and not self._is_tracked(topology)):
+                return
+
+            for src_port, dst_port in connection_list:
+                for port in (src_port, dst_port):
+                    port_record = topology.ports.get(int(port))
+                    if port_record is None:
+                        error_list.append("Port '{0}' is not in the port list".format(port))
+                    elif port_record.health == 'bad':
+                        error_list.append("Port '{0}' has PORTHEALTH=bad".format(port))
+
+                connected_port = topology.get_source(dst_port)
+                if connected_port is not None and connected_port != int(src_port):
+                    error_list.append("Port '{0}' is already connected to '{1}'".format(dst_port, connected_port))
+
+        if error_list:
+            if command_logger is not None:
+                command_logger.info('Mapping is rejected without sending it: {0}'.format('; '.join(error_list)))
+            raise Exception(self.__class__.__name__, '; '.join(error_list))
+
+    def _connect(self, connection_list, command_logger=None, force=False):
+        """Send cross-connects, with 'mapping_prevalidation' they are checked against the topology snapshot first
+
+        'force' (or forced_mappings()) skips the check, e.g. when the snapshot is known to be outdated.
+        """
+        if self._mapping_prevalidation and not force and not getattr(_request_options, 'force', False):
+            self._prevalidate_connections(connection_list, command_logger)
+
+        completed = self._send_map_commands([self._get_connect_command(connection_list)], command_logger)[0] == "COMPLD"
+        if completed:
+            self._apply_connect(connection_list)
+
+        if self._verify_mappings:
+            self._check_connections(dict(connection_list), command_logger)
+
+        return completed
+
+    def _disconnect(self, port_list, command_logger=None):
+        completed = self._send_map_commands([self._get_disconnect_command(port_list)], command_logger)[0] == "COMPLD"
+        if completed:
+            self._apply_disconnect(port_list)
+
+        if self._verify_mappings:
+            self._check_connections(dict((port, None) for port in port_list), command_logger)
+
+        return completed
+
+    def _get_port_table(self):
+        """Return port table of the last autoload, retrieve the port list if there was no autoload yet"""
+        port_table = self._port_table
+        if port_table is not None:
+            return port_table
+
+        port_list_parser = tl1_parser.PortListParser()
+        self._retrieve(["RTRV-CFG-FIBER::all:{0};"], [port_list_parser])
+
+        port_table = PortTable.from_port_list(port_list_parser.result, self._custom_port_pairing)
+        with self._state_lock:
+            if self._port_table is None:
+                self._port_table = port_table
+
+        return self._port_table
+
+    def _translate_port(self, port):
+        """Return (IN port id, OUT port id) of a logical port, (port id, port id) of a physical port"""
+        port_table = self._get_port_table()
+        port_index = str(port[1])
+
+        if self._port_logical_mode.lower() == "logical":
+            port_ids = port_table.logical_ports.get(port_index)
+        elif port_index in port_table.physical_ports:
+            port_ids = (port_index, port_index)
+        else:
+            port_ids = None
+
+        if port_ids is None:
+            raise Exception(self.__class__.__name__, "Unknown port '{0}'!".format(port_index))
+
+        return port_ids
+
+    def _get_in_port(self, port):
+        return self._translate_port(port)[0]
+
+    def _get_out_port(self, port):
+        return self._translate_port(port)[1]
+
+    def _get_uni_connections(self, src_port, dst_port):
+        if self._port_logical_mode.lower() == "logical":
+            return [(self._get_in_port(src_port), self._get_out_port(dst_port))]
+
+        port_list = sorted([self._get_in_port(src_port), self._get_in_port(dst_port)], key=int)
+        return [(port_list[0], port_list[1])]
+
+    def _get_bidi_connections(self, src_port, dst_port):
+        if self._port_logical_mode.lower() != "logical":
+            raise Exception(self.__class__.__name__, "Bidirectional port mapping could be done only in logical port_mode " +
+                            "(current mode: '" + self._port_logical_mode + "'")
+
+        return [(self._get_in_port(src_port), self._get_out_port(dst_port)),
+                (self._get_in_port(dst_port), self._get_out_port(src_port))]
+
+    def _get_clear_ports(self, src_port, dst_port):
+        if self._port_logical_mode.lower() == "logical":
+            return [self._get_in_port(src_port), self._get_in_port(dst_port)]
 
-    def map_uni(self, src_port, dst_port, command_logger=None):
+        return [self._get_in_port(src_port)]
+
+    def map_uni(self, src_port, dst_port, command_logger=None, force=False):
+        return self._run_request('map_uni', self._map_uni, src_port, dst_port, force, command_logger)
+
+    def _map_uni(self, src_port, dst_port, force=False, command_logger=None):
         if self._service_mode.lower() == "scpi":
             pass
         elif self._service_mode.lower() == "tl1":
+            self._connect(self._get_uni_connections(src_port, dst_port), command_logger, force)
 
-            src_in_port = min(int(src_port[1]), int(dst_port[1]))
+    def map_bidi(self, src_port, dst_port, command_logger=None, force=False):
+        return self._run_request('map_bidi', self._map_bidi, src_port, dst_port, force, command_logger)
 
-            dst_out_port = max(int(src_port[1]), int(dst_port[1]))
+    def _map_bidi(self, src_port, dst_port, force=False, command_logger=None):
+        if self._service_mode.lower() == "scpi":
+            pass
+        elif self._service_mode.lower() == "tl1":
+            self._connect(self._get_bidi_connections(src_port, dst_port), command_logger, force)
 
-            if self._port_logical_mode.lower() == "logical":
-                src_in_port = str(10000 + int(src_in_port.split('-')[0]))
-                dst_out_port = str(20000 + int(dst_out_port.split('-')[1]))
+    def map_clear_to(self, src_port, dst_port, command_logger=None):
+        return self._run_request('map_clear_to', self._map_clear_to, src_port, dst_port, command_logger)
 
-            command = "ent-crs-fiber::{0},{1}:{2};".format(src_in_port, dst_out_port, self._incr_ctag())
-            command_result = self._session.send_command(command, re_string=self._prompt)
-            command_logger.info(command_result)
+    def _map_clear_to(self, src_port, dst_port, command_logger=None):
+        if self._service_mode.lower() == "scpi":
+            pass
+        elif self._service_mode.lower() == "tl1":
+            self._disconnect([self._get_in_port(src_port)], command_logger)
+
+    def map_clear(self, src_port, dst_port, command_logger=None):
+        return self._run_request('map_clear', self._map_clear, src_port, dst_port, command_logger)
 
-    def map_bidi(self, src_port, dst_port, command_logger=None):
+    def _map_clear(self, src_port, dst_port, command_logger=None):
         if self._service_mode.lower() == "scpi":
             pass
         elif self._service_mode.lower() == "tl1":
-            if self._port_logical_mode.lower() == "logical":
-                source_port = str(src_port[1]).split('-')
-                destination_port = str(dst_port[1]).split('-')
-                src_in_port = str(10000 + int(source_port[0]))
-                dst_in_port = str(10000 + int(destination_port[0]))
-                src_out_port = str(20000 + int(source_port[1]))
-                dst_out_port = str(20000 + int(destination_port[1]))
-
-                command = "ent-crs-fiber::{0}&{1},{2}&{3}:{4};".format(src_in_port, dst_in_port, dst_out_port,
-                                                                       src_out_port, self._incr_ctag())
-                command_result = self._session.send_command(command, re_string=self._prompt)
-                command_logger.info(command_result)
+            self._disconnect(self._get_clear_ports(src_port, dst_port), command_logger)
+
+    @staticmethod
+    def _get_change_port(argument):
+        """IN port of a batch item argument: (IN port, OUT port) of a connection or IN port of a disconnection"""
+        return argument[0] if isinstance(argument, tuple) else argument
+
+    def _get_chunks(self, item_list):
+        """Split items (mapping index, argument) into commands of at most 'batch_max_size' items
+
+        An IN port is changed once per command, a later change of it starts the next command.
+        """
+        chunk_list = list()
+        chunk_ports = set()
+        for item in item_list:
+            port = self._get_change_port(item[1])
+            if not chunk_list or len(chunk_list[-1]) >= self._batch_max_size or port in chunk_ports:
+                chunk_list.append(list())
+                chunk_ports = set()
+            chunk_list[-1].append(item)
+            chunk_ports.add(port)
+
+        return chunk_list
+
+    def _get_missing_items(self, item_list, mapping_results, command_logger=None):
+        """Return items of a command not known to be completed which are not in place on the switch
+
+        Cross-connects of their IN ports are retrieved, items which could not be checked fail their mappings.
+        """
+        status, actual_connections = self._retrieve_port_connections(
+            sorted(set(self._get_change_port(argument) for mapping_index, argument in item_list), key=int),
+            command_logger)
+
+        missing_item_list = list()
+        for mapping_index, argument in item_list:
+            port = self._get_change_port(argument)
+            expected_port = argument[1] if isinstance(argument, tuple) else None
+            if status != "COMPLD":
+                mapping_results[mapping_index] = (False, "Can't verify cross-connect of port '{0}' (status: {1})"
+                                                         .format(port, status))
+            elif actual_connections.get(port) != expected_port:
+                missing_item_list.append((mapping_index, argument))
+
+        return missing_item_list
+
+    def _send_batch(self, get_command, apply_change, item_list, mapping_results, command_logger=None):
+        """Send items (mapping index, argument) of one batch with as few commands as possible, in item order
+
+        Every command is finished before the next one is sent: items of a denied command are re-sent one by one to
+        find out which mappings failed, the switch could have applied some items of a partially completed command
+        (or of one without response status), only the items which are not in place are re-sent. If a command could
+        not be sent, its items and all later ones fail their mappings and False is returned.
+        """
+        chunk_list = self._get_chunks(item_list)
+        for chunk_index, chunk in enumerate(chunk_list):
+            pending_item_list = chunk
+            try:
+                status = self._send_map_commands([get_command([argument for mapping_index, argument in chunk])],
+                                                 command_logger)[0]
+                if status == "COMPLD":
+                    apply_change([argument for mapping_index, argument in chunk])
+                    continue
+
+                if status == "DENY":
+                    failed_item_list = chunk
+                else:
+                    failed_item_list = self._get_missing_items(chunk, mapping_results, command_logger)
+
+                for item_index, (mapping_index, argument) in enumerate(failed_item_list):
+                    pending_item_list = failed_item_list[item_index:]
+                    if self._send_map_commands([get_command([argument])], command_logger)[0] == "COMPLD":
+                        apply_change([argument])
+                    else:
+                        mapping_results[mapping_index] = (False, "Mapping command for '{0}' is not completed".format(
+                            ','.join(argument) if isinstance(argument, tuple) else argument))
+            except Exception as error:
+                error_message = str(error.args[-1] if error.args else error)
+                self._fail_items(pending_item_list, "Mapping command failed: {0}".format(error_message),
+                                 mapping_results)
+                self._fail_items(itertools.chain.from_iterable(chunk_list[chunk_index + 1:]),
+                                 "Mapping is not sent after a failed command: {0}".format(error_message),
+                                 mapping_results)
+                return False
+
+        return True
+
+    @staticmethod
+    def _fail_items(item_list, error_message, mapping_results):
+        for mapping_index, argument in item_list:
+            mapping_results[mapping_index] = (False, error_message)
+
+    def _send_changes(self, change_list, mapping_results, command_logger=None):
+        """Send items (mapping index, argument) in list order, consecutive connections (or disconnections) are
+        sent together. Items after a command which could not be sent are not sent, they fail their mappings."""
+        run_list = [list(item_list) for is_connection, item_list
+                    in itertools.groupby(change_list, lambda item: isinstance(item[1], tuple))]
+        for run_index, item_list in enumerate(run_list):
+            if isinstance(item_list[0][1], tuple):
+                sent = self._send_batch(self._get_connect_command, self._apply_connect, item_list, mapping_results,
+                                        command_logger)
             else:
-                raise Exception(self.__class__.__name__, "Bidirectional port mapping could be done only in logical port_mode " +
-                                "(current mode: '" + self._port_logical_mode + "'")
+                sent = self._send_batch(self._get_disconnect_command, self._apply_disconnect, item_list,
+                                        mapping_results, command_logger)
+            if not sent:
+                self._fail_items(itertools.chain.from_iterable(run_list[run_index + 1:]),
+                                 "Mapping is not sent after a failed command", mapping_results)
+                return
+
+    def _verify_batch(self, change_list, mapping_results, command_logger=None):
+        """Verify IN ports of the successful mappings of a batch, failed ports fail their mappings"""
+        item_list = [(mapping_index, self._get_change_port(argument), argument[1] if isinstance(argument, tuple)
+                      else None) for mapping_index, argument in change_list if mapping_results[mapping_index][0]]
+
+        # changes are sent in list order, so the last item of a port is its expected state
+        expected_connections = dict((port, expected_port) for mapping_index, port, expected_port in item_list)
+        port_list = sorted(expected_connections, key=int)
+        verification = dict()
+        for chunk_start in xrange(0, len(port_list), self._batch_max_size):
+            chunk = port_list[chunk_start:chunk_start + self._batch_max_size]
+            verification.update(self._verify_connections(dict((port, expected_connections[port]) for port in chunk),
+                                                          command_logger))
+
+        for mapping_index, port, expected_port in item_list:
+            success, error = verification[port]
+            if not success and mapping_results[mapping_index][0]:
+                mapping_results[mapping_index] = (False, error)
+
+    def map_batch(self, mapping_list, command_logger=None):
+        return self._run_request('map_batch', self._map_batch, mapping_list, command_logger)
+
+    def _map_batch(self, mapping_list, command_logger=None):
+        """Apply list of (action, src_port, dst_port) with the fewest dlt-crs-fiber/ent-crs-fiber commands
+
+        Action is one of 'uni', 'bidi', 'clearto', 'clear'. Mappings are applied in list order, commands of
+        consecutive connections (or disconnections) are coalesced. Returns list of (success, error message), one per
+        mapping.
+        """
+        mapping_results = [(True, '')] * len(mapping_list)
 
-    def map_clear_to(self, src_port, dst_port, command_logger=None):
         if self._service_mode.lower() == "scpi":
             pass
         elif self._service_mode.lower() == "tl1":
-            src_in_port = src_port[1]
-            if self._port_logical_mode.lower() == "logical":
-                source_port = src_port[1].split('-')
-                src_in_port = str(10000 + int(source_port[0]))
+            # (mapping index, (IN port, OUT port)) of a connection or (mapping index, IN port) of a disconnection
+            change_list = list()
+            for mapping_index, (action, src_port, dst_port) in enumerate(mapping_list):
+                try:
+                    if action == 'uni':
+                        mapping_changes = self._get_uni_connections(src_port, dst_port)
+                    elif action == 'bidi':
+                        mapping_changes = self._get_bidi_connections(src_port, dst_port)
+                    elif action == 'clearto':
+                        mapping_changes = [self._get_in_port(src_port)]
+                    elif action == 'clear':
+                        mapping_changes = self._get_clear_ports(src_port, dst_port)
+                    else:
+                        raise Exception(self.__class__.__name__, "Unknown mapping action '{0}'!".format(action))
+                except Exception as error:
+                    mapping_results[mapping_index] = (False, str(error.args[-1] if error.args else error))
+                    continue
 
-            command = "dlt-crs-fiber::{0}:{1};".format(src_in_port, self._incr_ctag())
+                change_list.extend((mapping_index, change) for change in mapping_changes)
 
-            self._session.send_command(command, re_string=self._prompt)
+            self._send_changes(change_list, mapping_results, command_logger)
+
+            if self._verify_mappings:
+                self._verify_batch(change_list, mapping_results, command_logger)
+        else:
+            raise Exception(self.__class__.__name__, "From service mode type (current mode: '" +
+                            self._service_mode + "'!")
+
+        return mapping_results
+
+    def _get_current_connections(self, command_logger=None):
+        """Return IN port -> OUT port of the switch, taken from the topology snapshot while it is not expired"""
+        with self._state_lock:
+            topology = self._topology
+            if topology is not None and not topology.is_expired(self._topology_cache_ttl):
+                return dict((str(src), str(dst)) for src, dst in topology.connections.iteritems())
+
+        connection_parser = tl1_parser.ConnectionParser()
+        command_result = self._retrieve(["rtrv-crs-fiber::all:{0};"], [connection_parser])[0]
+        if command_logger is not None:
+            command_logger.info(command_result)
+
+        with self._state_lock:
+            self._topology_generation += 1
+            if self._topology is not None:
+                self._topology.set_connections(connection_parser.result)
+
+        return dict((str(connection.src_port), str(connection.dst_port)) for connection in connection_parser.result)
+
+    def reconcile(self, address, mapping_list, command_logger=None):
+        return self._run_request('reconcile', self._reconcile, address, mapping_list, command_logger)
+
+    def _reconcile(self, address, mapping_list, command_logger=None):
+        """Bring the cross-connects of the chassis to the desired state with the fewest commands
+
+        'mapping_list' is the complete desired state, list of (action, src_port, dst_port) with action 'uni' or
+        'bidi'. Cross-connects which are not desired are removed, missing or different ones are entered (an IN port
+        feeding an OUT port desired by another IN port is disconnected first), the ones already in place are left
+        untouched. Returns (mapping results, removal results): (success, error message)
+        per mapping and (IN port, success, error message) per removed cross-connect.
+        """
+        mapping_results = [(True, '')] * len(mapping_list)
+        removal_results = list()
 
-    def map_clear(self, src_port, dst_port, command_logger=None):
         if self._service_mode.lower() == "scpi":
             pass
         elif self._service_mode.lower() == "tl1":
-            if self._port_logical_mode.lower() == "logical":
-                source_port = src_port[1].split('-')
-                destination_port = dst_port[1].split('-')
-                src_in_port = str(10000 + int(source_port[0]))
-                dst_in_port = str(10000 + int(destination_port[0]))
+            desired_connections = dict()
+            desired_out_ports = dict()
+            connect_list = list()
+            for mapping_index, (action, src_port, dst_port) in enumerate(mapping_list):
+                try:
+                    if src_port[0] != address or dst_port[0] != address:
+                        raise Exception(self.__class__.__name__, "Mapping is not on chassis '{0}'!".format(address))
+                    if action == 'uni':
+                        connection_list = self._get_uni_connections(src_port, dst_port)
+                    elif action == 'bidi':
+                        connection_list = self._get_bidi_connections(src_port, dst_port)
+                    else:
+                        raise Exception(self.__class__.__name__, "Unknown mapping action '{0}'!".format(action))
 
-                command = "dlt-crs-fiber::{0}&{1}:{2};".format(src_in_port, dst_in_port, self._incr_ctag())
+                    for src, dst in connection_list:
+                        if desired_connections.get(src, dst) != dst or desired_out_ports.get(dst, src) != src:
+                            raise Exception(self.__class__.__name__, "Mapping conflicts with another mapping "
+                                                                     "on port '{0}' or '{1}'!".format(src, dst))
+                except Exception as error:
+                    mapping_results[mapping_index] = (False, str(error.args[-1] if error.args else error))
+                    continue
 
-                self._session.send_command(command, re_string=self._prompt)
-            else:
-                self.map_clear_to(src_port, dst_port, command_logger)
+                for src, dst in connection_list:
+                    desired_connections[src] = dst
+                    desired_out_ports[dst] = src
+                    connect_list.append((mapping_index, (src, dst)))
+
+            current_connections = self._get_current_connections(command_logger)
+
+            removed_port_list = sorted((port for port in current_connections if port not in desired_connections),
+                                       key=int)
+            out_port_mappings = dict((dst, mapping_index) for mapping_index, (src, dst) in connect_list)
+            connect_list = [(mapping_index, (src, dst)) for mapping_index, (src, dst) in connect_list
+                            if current_connections.get(src) != dst]
+
+            # a connected IN port which is desired elsewhere is moved by ent-crs-fiber without dlt-crs-fiber, unless
+            # its OUT port is desired by another IN port: the switch denies a cross-connect to an OUT port which is
+            # still fed, so it is disconnected first (for the mapping which desires the OUT port)
+            moved_port_list = sorted((port for port in current_connections if port in desired_connections
+                                      and desired_out_ports.get(current_connections[port], port) != port), key=int)
+
+            # removals get result indexes after the mappings
+            batch_results = mapping_results + [(True, '')] * len(removed_port_list)
+            disconnect_list = [(len(mapping_list) + removal_index, port)
+                               for removal_index, port in enumerate(removed_port_list)] + \
+                              [(out_port_mappings[current_connections[port]], port) for port in moved_port_list]
+            self._send_changes(disconnect_list + connect_list, batch_results, command_logger)
+
+            if self._verify_mappings:
+                self._verify_batch(disconnect_list + connect_list, batch_results, command_logger)
+
+            mapping_results = batch_results[:len(mapping_list)]
+            removal_results = [(port, success, error) for port, (success, error)
+                               in zip(removed_port_list, batch_results[len(mapping_list):])]
+        else:
+            raise Exception(self.__class__.__name__, "From service mode type (current mode: '" +
+                            self._service_mode + "'!")
+
+        return mapping_results, removal_results
 
     def  set_speed_manual(selfself,  command_logger=None):
         pass
@@ -0,0 +1,230 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from glimmerglass.command_stats import CommandStats, RequestProfiler
+from glimmerglass.driver_settings import DriverSettings
+from glimmerglass.glimmerglass_driver_handler import GlimmerglassDriverHandler
+from glimmerglass.single_flight import SingleFlight
+
+
+class DeviceLocks(object):
+    """Command lanes of one chassis: retrievals and mappings are serialized within their own lane
+
+    With a concurrent session (ConcurrentTL1Session) a long autoload does not block mapping commands (retrievals
+    are sent over another connection by the driver handler), otherwise both lanes share one lock.
+    Login and disconnection take both lanes.
+    """
+
+    def __init__(self, concurrent=False):
+        self.mapping = threading.RLock()
+        self.retrieval = threading.RLock() if concurrent else self.mapping
+
+    def acquire(self):
+        self.mapping.acquire()
+        self.retrieval.acquire()
+
+    def release(self):
+        self.retrieval.release()
+        self.mapping.release()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class GlimmerglassMultiChassisHandler(object):
+    """Driver handler which serves several Glimmerglass chassis from one driver process
+
+    Every chassis address gets its own GlimmerglassDriverHandler (session, ctag, topology). At most 'max_sessions'
+    authenticated handlers are kept, the least recently used one is disconnected when the limit is reached and
+    transparently logged in again with the stored credentials on its next request. Requests for one chassis are
+    serialized (retrievals could run at the same time as mappings with a concurrent session, see DeviceLocks),
+    requests for different chassis could run concurrently.
+    """
+
+    def __init__(self):
+        self._handlers = OrderedDict()
+        self._handler_locks = dict()
+        self._credentials = dict()
+        self._lock = threading.Lock()
+        # statistics and profiling switch are shared by handlers of all chassis
+        self._command_stats = CommandStats()
+        self._request_profiler = RequestProfiler()
+        self._autoload_flight = SingleFlight()
+
+        settings = DriverSettings.get()
+        self._max_sessions = settings.max_sessions
+        self._worker_count = settings.worker_count
+        self._worker_pool = None
+
+    def _get_worker_pool(self):
+        """Worker threads are started by the first batch, not at driver startup"""
+        with self._lock:
+            if self._worker_pool is None:
+                from multiprocessing.pool import ThreadPool
+
+                self._worker_pool = ThreadPool(self._worker_count)
+
+            return self._worker_pool
+
+    def _create_handler(self, address):
+        return GlimmerglassDriverHandler(self._command_stats, self._request_profiler)
+
+    def _close_handler(self, handler, handler_lock):
+        with handler_lock:
+            handler.close()
+
+    def _get_handler(self, address, command_logger=None):
+        """Return (handler, DeviceLocks) for address, log in again if its session was closed by the pool"""
+        evicted_list = list()
+        with self._lock:
+            if address in self._handlers:
+                handler = self._handlers.pop(address)
+                self._handlers[address] = handler
+                return handler, self._handler_locks[address]
+
+            if address not in self._credentials:
+                raise Exception(self.__class__.__name__, "There is no login for '{0}'!".format(address))
+
+            handler = self._create_handler(address)
+            # new handler is locked till its login is done, so other requests could not use it before
+            handler_lock = DeviceLocks(handler.is_concurrent())
+            handler_lock.acquire()
+            self._handlers[address] = handler
+            self._handler_locks[address] = handler_lock
+
+            while len(self._handlers) > self._max_sessions:
+                evicted_address, evicted_handler = self._handlers.popitem(last=False)
+                evicted_list.append((evicted_handler, self._handler_locks.pop(evicted_address)))
+
+        for evicted_handler, evicted_lock in evicted_list:
+            self._close_handler(evicted_handler, evicted_lock)
+
+        username, password = self._credentials[address]
+        try:
+            handler.login(address, username, password, command_logger)
+        except Exception:
+            handler_lock.release()
+            self._remove_handler(address, handler)
+            raise
+
+        handler_lock.release()
+
+        return handler, handler_lock
+
+    @contextmanager
+    def _locked_handler(self, address, lane, command_logger=None):
+        """Yield handler of address with its 'mapping' or 'retrieval' lane taken
+
+        A handler evicted (and closed) by another request before its lane was taken is not used, the address is
+        logged in again. An evicted handler is closed with both lanes taken, so it stays open while a request
+        holds its lane.
+        """
+        while True:
+            handler, handler_lock = self._get_handler(address, command_logger)
+            with getattr(handler_lock, lane):
+                with self._lock:
+                    pooled = self._handlers.get(address) is handler
+                if pooled:
+                    yield handler
+                    return
+
+    def _remove_handler(self, address, handler=None):
+        with self._lock:
+            if address not in self._handlers or handler not in (None, self._handlers[address]):
+                return
+
+            handler = self._handlers.pop(address)
+            handler_lock = self._handler_locks.pop(address)
+
+        self._close_handler(handler, handler_lock)
+
+    def login(self, address, username, password, command_logger=None):
+        with self._lock:
+            logged_in = address in self._handlers and self._credentials.get(address) == (username, password)
+            self._credentials[address] = (username, password)
+
+        if logged_in:
+            if command_logger is not None:
+                command_logger.info('Login status: OK (session from pool)')
+            return
+
+        # credentials were changed, session of the previous login is closed
+        self._remove_handler(address)
+        self._get_handler(address, command_logger)
+
+    def _get_resource_description(self, address, command_logger=None):
+        with self._locked_handler(address, 'retrieval', command_logger) as handler:
+            return handler.get_resource_description(address, command_logger)
+
+    def get_resource_description(self, address, command_logger=None):
+        """Requests for a chassis arriving while one is in progress (or waits for its lock) share its result"""
+        start_time = time.time()
+        resource_description, shared = self._autoload_flight.do(address, self._get_resource_description, address,
+                                                                 command_logger)
+        if shared:
+            self._command_stats.add('get_resource_description', 'coalesced', time.time() - start_time)
+            if command_logger is not None:
+                command_logger.info('Resource description is shared with a request in progress')
+
+        return resource_description
+
+    def _call(self, method_name, src_port, dst_port, command_logger=None, **kwargs):
+        with self._locked_handler(src_port[0], 'mapping', command_logger) as handler:
+            return getattr(handler, method_name)(src_port, dst_port, command_logger, **kwargs)
+
+    def map_uni(self, src_port, dst_port, command_logger=None, force=False):
+        return self._call('map_uni', src_port, dst_port, command_logger, force=force)
+
+    def map_bidi(self, src_port, dst_port, command_logger=None, force=False):
+        return self._call('map_bidi', src_port, dst_port, command_logger, force=force)
+
+    def map_clear_to(self, src_port, dst_port, command_logger=None):
+        return self._call('map_clear_to', src_port, dst_port, command_logger)
+
+    def map_clear(self, src_port, dst_port, command_logger=None):
+        return self._call('map_clear', src_port, dst_port, command_logger)
+
+    def _map_chassis_batch(self, address, mapping_list, command_logger=None):
+        with self._locked_handler(address, 'mapping', command_logger) as handler:
+            return handler.map_batch(mapping_list, command_logger)
+
+    def map_batch(self, mapping_list, command_logger=None):
+        """Split mappings by chassis address and apply every chassis batch on the worker pool"""
+        address_index = OrderedDict()
+        for mapping_index, (action, src_port, dst_port) in enumerate(mapping_list):
+            address_index.setdefault(src_port[0], list()).append(mapping_index)
+
+        worker_pool = self._get_worker_pool()
+        async_result_list = [(index_list, worker_pool.apply_async(
+            self._map_chassis_batch, (address, [mapping_list[index] for index in index_list], command_logger)))
+            for address, index_list in address_index.iteritems()]
+
+        mapping_results = [None] * len(mapping_list)
+        for index_list, async_result in async_result_list:
+            try:
+                chassis_results = async_result.get()
+            except Exception as error:
+                chassis_results = [(False, str(error.args[-1] if error.args else error))] * len(index_list)
+
+            for mapping_index, mapping_result in zip(index_list, chassis_results):
+                mapping_results[mapping_index] = mapping_result
+
+        return mapping_results
+
+    def reconcile(self, address, mapping_list, command_logger=None):
+        with self._locked_handler(address, 'mapping', command_logger) as handler:
+            return handler.reconcile(address, mapping_list, command_logger)
+
+    def get_stats(self):
+        return self._command_stats.get_summary()
+
+    def set_speed_manual(self, *args, **kwargs):
+        pass
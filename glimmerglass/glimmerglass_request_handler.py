@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from xml.sax.saxutils import escape
+
+from common.request_handler import RequestHandler
+from common.xml_wrapper import XMLWrapper
+from glimmerglass.glimmerglass_driver_handler import forced_mappings
+
+RESPONSE_INFO_TEMPLATE = '<ResponseInfo xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ' \
+                         'xsi:type="{0}" ' \
+                         'xmlns="http://schemas.qualisystems.com/ResourceManagement/DriverCommandResult.xsd">' \
+                         '{1}</ResponseInfo>'
+
+
+class GlimmerglassRequestHandler(RequestHandler):
+    """RequestHandler with Glimmerglass specific commands"""
+
+    @staticmethod
+    def _is_forced(command_node, xs_prefix=''):
+        """Whether Parameters of the command have <Force>true</Force>"""
+        parameters_node = XMLWrapper.get_child_node(command_node, 'Parameters', xs_prefix)
+        if parameters_node is None:
+            return False
+
+        force_node = XMLWrapper.get_child_node(parameters_node, 'Force', xs_prefix)
+        return force_node is not None and (XMLWrapper.get_node_text(force_node) or '').strip().lower() == 'true'
+
+    def map_uni(self, command_node, xs_prefix='', command_logger=None):
+        """RequestHandler.map_uni, <Force>true</Force> in Parameters skips 'mapping_prevalidation'"""
+        if not self._is_forced(command_node, xs_prefix):
+            return RequestHandler.map_uni(self, command_node, xs_prefix, command_logger)
+
+        with forced_mappings():
+            return RequestHandler.map_uni(self, command_node, xs_prefix, command_logger)
+
+    def map_bidi(self, command_node, xs_prefix='', command_logger=None):
+        """RequestHandler.map_bidi, <Force>true</Force> in Parameters skips 'mapping_prevalidation'"""
+        if not self._is_forced(command_node, xs_prefix):
+            return RequestHandler.map_bidi(self, command_node, xs_prefix, command_logger)
+
+        with forced_mappings():
+            return RequestHandler.map_bidi(self, command_node, xs_prefix, command_logger)
+
+    @staticmethod
+    def _get_mapping_list(parameters_node, xs_prefix=''):
+        """Return list of (action, src_port, dst_port) of the Mapping nodes, ports split into [address, port]"""
+        mapping_list = list()
+        for mapping_node in XMLWrapper.get_all_child_node(parameters_node, 'Mapping', xs_prefix):
+            action = XMLWrapper.get_node_text(XMLWrapper.get_child_node(mapping_node, 'Action', xs_prefix))
+            src_port = XMLWrapper.get_node_text(XMLWrapper.get_child_node(mapping_node, 'MapPort_A', xs_prefix))
+            dst_port = XMLWrapper.get_node_text(XMLWrapper.get_child_node(mapping_node, 'MapPort_B', xs_prefix))
+
+            mapping_list.append((action.strip().lower(), src_port.split('/'), dst_port.split('/')))
+
+        return mapping_list
+
+    @staticmethod
+    def _render_mapping_results(mapping_list, mapping_results):
+        """Return Mapping result nodes, one per mapping with its (success, error message)"""
+        mapping_nodes = ''
+        for (action, src_port, dst_port), (success, error) in zip(mapping_list, mapping_results):
+            mapping_nodes += '<Mapping><Action>{0}</Action><MapPort_A>{1}</MapPort_A><MapPort_B>{2}</MapPort_B>' \
+                             '<Success>{3}</Success><ErrorMessage>{4}</ErrorMessage></Mapping>'.format(
+                escape(action), escape('/'.join(src_port)), escape('/'.join(dst_port)), str(success).lower(),
+                escape(error))
+
+        return mapping_nodes
+
+    def map_batch(self, command_node, xs_prefix='', command_logger=None):
+        """Apply many mappings at once
+
+        <Parameters>
+            <Mapping>
+                <Action>uni|bidi|clearto|clear</Action>
+                <MapPort_A>192.168.1.1/1-1</MapPort_A>
+                <MapPort_B>192.168.1.1/2-2</MapPort_B>
+            </Mapping>
+            ...
+        </Parameters>
+        """
+        command_logger.info(XMLWrapper.get_string_from_xml(command_node))
+
+        parameters_node = XMLWrapper.get_child_node(command_node, 'Parameters', xs_prefix)
+
+        mapping_list = self._get_mapping_list(parameters_node, xs_prefix)
+        mapping_results = self._driver_handler.map_batch(mapping_list, command_logger)
+
+        return XMLWrapper.parse_xml(RESPONSE_INFO_TEMPLATE.format(
+            'MapBatchResponseInfo', self._render_mapping_results(mapping_list, mapping_results)))
+
+    def reconcile(self, command_node, xs_prefix='', command_logger=None):
+        """Bring cross-connects of one chassis to the desired state, only the differences are sent to the switch
+
+        <Parameters>
+            <Address>192.168.1.1</Address>
+            <Mapping>
+                <Action>uni|bidi</Action>
+                <MapPort_A>192.168.1.1/1-1</MapPort_A>
+                <MapPort_B>192.168.1.1/2-2</MapPort_B>
+            </Mapping>
+            ...
+        </Parameters>
+
+        Mappings are the complete desired state, cross-connects of other ports are removed.
+        """
+        command_logger.info(XMLWrapper.get_string_from_xml(command_node))
+
+        parameters_node = XMLWrapper.get_child_node(command_node, 'Parameters', xs_prefix)
+        address = XMLWrapper.get_node_text(XMLWrapper.get_child_node(parameters_node, 'Address', xs_prefix)).strip()
+
+        mapping_list = self._get_mapping_list(parameters_node, xs_prefix)
+        mapping_results, removal_results = self._driver_handler.reconcile(address, mapping_list, command_logger)
+
+        result_nodes = self._render_mapping_results(mapping_list, mapping_results)
+        for port, success, error in removal_results:
+            result_nodes += '<Removal><Port>{0}</Port><Success>{1}</Success><ErrorMessage>{2}</ErrorMessage>' \
+                            '</Removal>'.format(escape(port), str(success).lower(), escape(error))
+
+        return XMLWrapper.parse_xml(RESPONSE_INFO_TEMPLATE.format('ReconcileResponseInfo', result_nodes))
+
+    def get_stats(self, command_node, xs_prefix='', command_logger=None):
+        """Return latency percentiles (ms) and response sizes per TL1 command type / driver request and phase"""
+        command_logger.info(XMLWrapper.get_string_from_xml(command_node))
+
+        stat_nodes = ''
+        for stat in self._driver_handler.get_stats():
+            stat_nodes += '<Stat Command="{command}" Phase="{phase}" Count="{count}" Bytes="{bytes}" ' \
+                          'Total="{total:.3f}" Min="{min:.3f}" P50="{p50:.3f}" P90="{p90:.3f}" P99="{p99:.3f}" ' \
+                          'Max="{max:.3f}"/>'.format(**stat)
+
+        return XMLWrapper.parse_xml(RESPONSE_INFO_TEMPLATE.format('StatsResponseInfo', stat_nodes))
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from array import array
+
+HEALTH_NONE = 0
+HEALTH_GOOD = 1
+HEALTH_BAD = 2
+
+# usual physical port id of IN<n> / OUT<n>, the id of a port is always taken from its PORTID
+IN_PORT_BASE = 10000
+OUT_PORT_BASE = 20000
+
+
+class PortTable(object):
+    """Compact port table of a switch: parallel integer arrays indexed by port number n (IN<n>/OUT<n>)
+
+    Port number n is taken from PORTNAME and is used only for logical ports, physical ports and cross-connects are
+    always identified by PORTID (a user could rename a port).
+
+    in_health/out_health - HEALTH_NONE (no such port), HEALTH_GOOD or HEALTH_BAD
+    in_ids/out_ids - PORTID of IN<n>/OUT<n>
+    pairing - OUT port number of logical port n (IN<n> + OUT<pairing[n]>), 0 if the logical port is incomplete
+    out_owner - logical port which owns OUT<n>, 0 if none
+    connections - OUT port number fed by IN<n>, 0 if IN<n> is not connected
+    port_numbers - PORTID -> port number n
+    physical_port_list - (PORTID, health) in port list order
+    physical_connections - IN PORTID -> OUT PORTID, as strings
+
+    Port indexes and states of the resources are generated from the arrays only when the resource tree is serialized.
+    Translation of the port indexes reported by autoload to physical port ids is precomputed: logical_ports is
+    logical index 'in-out' -> (IN port id, OUT port id), physical_ports is port id -> direction ('IN'/'OUT').
+    """
+
+    __slots__ = ('size', 'in_health', 'out_health', 'in_ids', 'out_ids', 'pairing', 'out_owner', 'connections',
+                 'port_numbers', 'physical_port_list', 'physical_connections', 'logical_ports', 'physical_ports')
+
+    def __init__(self, size):
+        self.size = size
+        self.in_health = array('b', [HEALTH_NONE]) * (size + 1)
+        self.out_health = array('b', [HEALTH_NONE]) * (size + 1)
+        self.in_ids = array('i', [0]) * (size + 1)
+        self.out_ids = array('i', [0]) * (size + 1)
+        self.pairing = array('i', [0]) * (size + 1)
+        self.out_owner = array('i', [0]) * (size + 1)
+        self.connections = array('i', [0]) * (size + 1)
+        self.port_numbers = dict()
+        self.physical_port_list = list()
+        self.physical_connections = dict()
+        self.logical_ports = dict()
+        self.physical_ports = dict()
+
+    @classmethod
+    def from_port_list(cls, port_list, custom_port_pairing=None):
+        """Build table from list of tl1_parser.PortRecord, 'custom_port_pairing' is IN logical id: OUT logical id"""
+        table = cls(max([int(port_record.logical_id) for port_record in port_list] or [0]))
+
+        for port_record in port_list:
+            health = HEALTH_GOOD if port_record.health == "good" else HEALTH_BAD
+            port = int(port_record.logical_id)
+            if port_record.direction == 'IN':
+                table.in_health[port] = health
+                table.in_ids[port] = port_record.port_id
+            else:
+                table.out_health[port] = health
+                table.out_ids[port] = port_record.port_id
+
+            table.port_numbers[port_record.port_id] = port
+            table.physical_port_list.append((str(port_record.port_id), health))
+            table.physical_ports[str(port_record.port_id)] = port_record.direction
+
+        table.set_pairing(custom_port_pairing or dict())
+        return table
+
+    def set_pairing(self, custom_port_pairing):
+        """Pair IN<n> with OUT<n> unless 'custom_port_pairing' pairs it (or gives OUT<n> to another IN port)"""
+        custom_pairing = dict((int(in_port), int(out_port)) for in_port, out_port in custom_port_pairing.iteritems())
+        claimed_out_ports = set(custom_pairing.itervalues())
+
+        for port in xrange(1, self.size + 1):
+            self.pairing[port] = 0
+            self.out_owner[port] = 0
+        self.logical_ports = dict()
+
+        for port in xrange(1, self.size + 1):
+            if port in custom_pairing:
+                out_port = custom_pairing[port]
+            elif port in claimed_out_ports:
+                continue
+            else:
+                out_port = port
+
+            if self.in_health[port] == HEALTH_NONE or out_port > self.size \
+                    or self.out_health[out_port] == HEALTH_NONE:
+                continue
+
+            self.pairing[port] = out_port
+            self.out_owner[out_port] = port
+            self.logical_ports[self.get_logical_index(port)] = (str(self.in_ids[port]), str(self.out_ids[out_port]))
+
+    def set_connections(self, connections):
+        """Load cross-connects, 'connections' is IN port id -> OUT port id (physical ids)"""
+        for port in xrange(self.size + 1):
+            self.connections[port] = 0
+
+        for src_port, dst_port in connections.iteritems():
+            in_port = self.port_numbers.get(src_port, 0)
+            out_port = self.port_numbers.get(dst_port, 0)
+            if in_port and out_port and self.in_ids[in_port] == src_port and self.out_ids[out_port] == dst_port:
+                self.connections[in_port] = out_port
+
+        self.physical_connections = dict((str(src_port), str(dst_port))
+                                         for src_port, dst_port in connections.iteritems())
+
+    def get_logical_index(self, port):
+        return '{0}-{1}'.format(port, self.pairing[port])
+
+    def iter_logical_ports(self):
+        """Yield (port index, state) of every complete logical port, a port is disabled if IN or OUT is bad"""
+        for port in xrange(1, self.size + 1):
+            if self.pairing[port]:
+                if self.in_health[port] == HEALTH_GOOD and self.out_health[self.pairing[port]] == HEALTH_GOOD:
+                    yield self.get_logical_index(port), "Enable"
+                else:
+                    yield self.get_logical_index(port), "Disable"
+
+    def iter_physical_ports(self):
+        """Yield (port index, state) of every port in port list order, the index is its PORTID"""
+        for port_id, health in self.physical_port_list:
+            yield port_id, "Enable" if health == HEALTH_GOOD else "Disable"
+
+    def get_logical_mappings(self):
+        """Return logical port index -> logical port index feeding it"""
+        port_mappings = dict()
+        for port in xrange(1, self.size + 1):
+            out_port = self.connections[port]
+            if out_port and self.pairing[port] and self.out_owner[out_port]:
+                port_mappings[self.get_logical_index(self.out_owner[out_port])] = self.get_logical_index(port)
+
+        return port_mappings
+
+    def get_physical_mappings(self):
+        """Return IN port index -> OUT port index it feeds"""
+        return self.physical_connections
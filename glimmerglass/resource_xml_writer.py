@@ -0,0 +1,84 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from xml.sax.saxutils import escape, quoteattr
+
+from common.configuration_parser import ConfigurationParser
+from common.xml_wrapper import XMLWrapper
+
+RESOURCE_HEAD_TEMPLATE = '<ResourceInfo Name={0} Address={1} ResourceFamilyName={2} ResourceModelName={3} ' \
+                         'SerialNumber={4}>'
+ATTRIBUTE_TEMPLATE = '<Attribute Name={0} Type="String" Value={1}/>'
+MAPPING_TEMPLATE = '<ResourceMapping><IncomingMapping>{0}</IncomingMapping></ResourceMapping>'
+
+
+def _attr(value):
+    return quoteattr(str(value))
+
+
+class ResourceXMLWriter(object):
+    """Template based writer of the chassis resource description, the XML of ResourceInfo.convert_to_xml
+
+    The XML is rendered as a sequence of fragments: chassis head, one fragment per port and chassis tail. Rendered
+    port fragments are kept and reused while the port state and mapping stay the same, set_chassis drops them.
+    to_xml joins and parses the whole document, the request manager expects a node.
+    """
+
+    def __init__(self):
+        self._resource_name = ConfigurationParser.get("driver_variable", "resource_name")
+        self._resource_family_name = ConfigurationParser.get("driver_variable", "resource_family_name")
+        self._resource_model_name = ConfigurationParser.get("driver_variable", "resource_model_name")
+
+        self._chassis_head = ''
+        self._chassis_tail = ''
+        self._port_model_name = ''
+        self._port_fragments = dict()
+
+    def _render_head(self, depth, index, address, model_name, serial_number):
+        return RESOURCE_HEAD_TEMPLATE.format(_attr(self._resource_name[depth].format(index)), _attr(address),
+                                             _attr(self._resource_family_name[depth]),
+                                             _attr(self._resource_model_name[depth].format(model_name)),
+                                             _attr(serial_number))
+
+    def _render_attributes(self, attribute_list):
+        return '<ResourceAttributes>{0}</ResourceAttributes>'.format(
+            ''.join(ATTRIBUTE_TEMPLATE.format(_attr(name), _attr(value)) for name, value in attribute_list))
+
+    def set_chassis(self, address, model_name, serial_number, attribute_list):
+        """Render chassis fragments, 'attribute_list' is a list of (name, value)"""
+        self._chassis_head = self._render_head(0, 1, address, model_name, serial_number) + '<ChildResources>'
+        self._chassis_tail = '</ChildResources>' + self._render_attributes(attribute_list) + '</ResourceInfo>'
+        self._port_model_name = model_name
+        self._port_fragments = dict()
+
+    def get_port_fragment(self, port_index, port_state, port_mapping=None):
+        """Return rendered port element, 'port_mapping' is the full address of the mapped port or None"""
+        port_fragment = self._port_fragments.get(port_index)
+        if port_fragment is not None and port_fragment[0] == (port_state, port_mapping):
+            return port_fragment[1]
+
+        fragment = self._render_head(1, port_index, port_index, self._port_model_name, '') + '<ChildResources/>' + \
+            self._render_attributes([("State", port_state), ("Protocol Type", 0)])
+        if port_mapping is not None:
+            fragment += MAPPING_TEMPLATE.format(escape(port_mapping))
+        fragment += '</ResourceInfo>'
+
+        self._port_fragments[port_index] = ((port_state, port_mapping), fragment)
+        return fragment
+
+    def iter_fragments(self, port_layout, port_mappings, address_prefix=''):
+        """Yield XML of the chassis fragment by fragment
+
+        'port_layout' is a list of (port index, state), 'port_mappings' is port index -> mapped port index.
+        """
+        yield self._chassis_head
+        for port_index, port_state in port_layout:
+            port_mapping = port_mappings.get(port_index)
+            if port_mapping is not None:
+                port_mapping = address_prefix + port_mapping
+            yield self.get_port_fragment(port_index, port_state, port_mapping)
+        yield self._chassis_tail
+
+    def to_xml(self, port_layout, port_mappings, address_prefix=''):
+        """Return parsed XML of the chassis"""
+        return XMLWrapper.parse_xml(''.join(self.iter_fragments(port_layout, port_mappings, address_prefix)))
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import Queue
+import threading
+
+
+class SessionPool(object):
+    """Additional authenticated sessions of one chassis, used to run the parts of a retrieval in parallel
+
+    Sessions are created by 'create_session' and logged in by 'authenticate(session)' (returns False on failure)
+    on first use, they are kept open for the next retrievals. A session which fails is reconnected and its work
+    item is tried once more.
+    """
+
+    def __init__(self, create_session, authenticate, size):
+        self._create_session = create_session
+        self._authenticate = authenticate
+        self._sessions = [None] * size
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self._sessions)
+
+    def _get_session(self, index):
+        session = self._sessions[index]
+        if session is None:
+            session = self._create_session()
+            if not self._authenticate(session):
+                self._close_session(session)
+                raise Exception(self.__class__.__name__, "Can't login with a pool session!")
+            self._sessions[index] = session
+
+        return session
+
+    def _drop_session(self, index):
+        session, self._sessions[index] = self._sessions[index], None
+        if session is not None:
+            self._close_session(session)
+
+    @staticmethod
+    def _close_session(session):
+        if hasattr(session, 'disconnect'):
+            try:
+                session.disconnect()
+            except Exception:
+                pass
+
+    def _work(self, index, function, item_queue, result_list, error_list):
+        while not error_list:
+            try:
+                item_index, item = item_queue.get_nowait()
+            except Queue.Empty:
+                return
+
+            for attempt in (0, 1):
+                try:
+                    result_list[item_index] = function(self._get_session(index), item)
+                    break
+                except Exception as error:
+                    self._drop_session(index)
+                    if attempt > 0:
+                        error_list.append(error)
+                        return
+
+    def map(self, function, item_list):
+        """Return [function(session, item) for item in item_list], items are spread over the pool sessions
+
+        The first error is raised after all workers have stopped.
+        """
+        item_queue = Queue.Queue()
+        for item_index, item in enumerate(item_list):
+            item_queue.put((item_index, item))
+
+        result_list = [None] * len(item_list)
+        error_list = list()
+        # one retrieval at a time uses the pool
+        with self._lock:
+            thread_list = [threading.Thread(target=self._work, args=(index, function, item_queue, result_list,
+                                                                     error_list))
+                           for index in xrange(min(self.size, len(item_list)))]
+            for thread in thread_list:
+                thread.daemon = True
+                thread.start()
+            for thread in thread_list:
+                thread.join()
+
+        if error_list:
+            raise error_list[0]
+
+        return result_list
+
+    def close(self):
+        with self._lock:
+            for index in xrange(self.size):
+                self._drop_session(index)
@@ -0,0 +1,267 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import re
+from collections import namedtuple
+
+# quoted TL1 response record, e.g. "GGN:PORTID=10001,PORTNAME=IN1,PORTHEALTH=good", quotes inside a record (e.g. in
+# a port comment) are escaped with a backslash
+RECORD_PATTERN = re.compile(r'"((?:[^"\\\r\n]|\\.)*)"')
+PORT_NAME_PATTERN = re.compile(r'^(IN|OUT)(\d+)$')
+# response header line, e.g. "M  12 COMPLD"
+STATUS_PATTERN = re.compile(r'^M\s+(\d+)\s+(COMPLD|DENY|PRTL)', re.MULTILINE)
+# autonomous message header line, e.g. "A  12 REPT DBCHG" or "*C 3 REPT ALM FIBER"
+AUTONOMOUS_PATTERN = re.compile(r'^(?:\*C|\*\*|\*|A)\s+\d+\s+REPT\b', re.MULTILINE)
+
+PortRecord = namedtuple('PortRecord', ['port_id', 'name', 'direction', 'logical_id', 'health'])
+ConnectionRecord = namedtuple('ConnectionRecord', ['src_port', 'dst_port'])
+
+
+def split_record(record):
+    """Tokenize one record (without quotes) into (vendor, fields), fields is None if it is not a KEY=VALUE record
+
+    The text before the first ':' is the vendor tag, the rest is split into KEY=VALUE pairs.
+    """
+    vendor, separator, body = record.partition(':')
+    if not separator:
+        return vendor, None
+
+    fields = dict()
+    for token in body.split(','):
+        key, separator, value = token.partition('=')
+        if separator:
+            fields[key] = value
+
+    return vendor, fields
+
+
+def iter_records(response):
+    """Yield (vendor, fields) for every quoted KEY=VALUE record of a TL1 response"""
+    for record in RECORD_PATTERN.findall(response):
+        vendor, fields = split_record(record)
+        if fields is not None:
+            yield vendor, fields
+
+
+def get_command_ctag(command):
+    """Return ctag of a TL1 command 'VERB:TID:AID:CTAG:...;' as int, None if it has no numeric ctag"""
+    fields = command.strip().rstrip(';').split(':')
+    if len(fields) < 4 or not fields[3].isdigit():
+        return None
+
+    return int(fields[3])
+
+
+def expand_aid_list(aid):
+    """Return list of port ids of an AID like '10001&&10048&20001', None for 'all' or an empty AID
+
+    'a&&b' is the range a..b, ranges and single ports are joined with '&'.
+    """
+    if aid.strip().lower() in ('', 'all'):
+        return None
+
+    port_list = list()
+    for token in aid.replace('&&', '-').split('&'):
+        first, separator, last = token.partition('-')
+        if separator:
+            port_list.extend(xrange(int(first), int(last) + 1))
+        else:
+            port_list.append(int(first))
+
+    return port_list
+
+
+def format_aid_range(first, last):
+    """Return AID of the port ids first..last, 'first&&last' or 'first' for a single port"""
+    if first == last:
+        return str(first)
+
+    return '{0}&&{1}'.format(first, last)
+
+
+def get_response_status(response):
+    """Return (ctag, status) of the first response block, (None, None) if there is no response header"""
+    match = STATUS_PATTERN.search(response)
+    if match is None:
+        return None, None
+
+    return int(match.group(1)), match.group(2)
+
+
+def is_autonomous_message(response):
+    """Whether a message received from the device is an autonomous report and not a command response"""
+    return AUTONOMOUS_PATTERN.search(response) is not None and STATUS_PATTERN.search(response) is None
+
+
+def split_port_name(port_name):
+    """Split 'IN12'/'OUT12' into ('IN', '12'), returns (None, None) for other names (e.g. 'MC-1-1')"""
+    match = PORT_NAME_PATTERN.match(port_name)
+    if match is None:
+        return None, None
+
+    return match.group(1), match.group(2)
+
+
+def _to_int(value):
+    if value is not None and value.isdigit():
+        return int(value)
+
+    return 0
+
+
+class RecordParser(object):
+    """Incremental parser of the quoted records of one TL1 response
+
+    Records could be added one by one while the response is still being received (add_record) or taken from
+    a complete response (feed_response). Parsed data is kept in 'result', digest of all records in 'fingerprint':
+    headers (timestamp, ctag) are left out, so equal device state gives equal fingerprint.
+    """
+
+    def __init__(self):
+        self.result = None
+        self._digest = hashlib.md5()
+
+    def reset(self):
+        """Drop the parsed records, e.g. before the response is received once more"""
+        self.__init__()
+
+    def add_record(self, record):
+        self._digest.update(record)
+        self._digest.update('\n')
+
+        vendor, fields = split_record(record)
+        if fields is not None:
+            self._add_fields(vendor, fields)
+
+    def feed_response(self, response):
+        for record in RECORD_PATTERN.findall(response):
+            self.add_record(record)
+
+        return self
+
+    @property
+    def fingerprint(self):
+        return self._digest.hexdigest()
+
+    def _add_fields(self, vendor, fields):
+        pass
+
+
+class SystemInfoParser(RecordParser):
+    """rtrv-system-info: flat dict of KEY: VALUE, vendor tag of the 'ChassisType' record is stored as 'Vendor'"""
+
+    def __init__(self):
+        RecordParser.__init__(self)
+        self.result = dict()
+
+    def _add_fields(self, vendor, fields):
+        if 'ChassisType' in fields:
+            self.result['Vendor'] = vendor
+        self.result.update(fields)
+
+
+class PortListParser(RecordParser):
+    """RTRV-CFG-FIBER: list of PortRecord, only IN<n>/OUT<n> ports with a known health"""
+
+    def __init__(self):
+        RecordParser.__init__(self)
+        self.result = list()
+
+    def _add_fields(self, vendor, fields):
+        port_id = _to_int(fields.get('PORTID'))
+        health = fields.get('PORTHEALTH', '').lower()
+        if port_id == 0 or health not in ('good', 'bad'):
+            return
+
+        name = fields.get('PORTNAME', '')
+        direction, logical_id = split_port_name(name)
+        if direction is None:
+            return
+
+        self.result.append(PortRecord(port_id, name, direction, logical_id, health))
+
+
+class ConnectionParser(RecordParser):
+    """rtrv-crs-fiber: list of ConnectionRecord, records with IPORTID=0 or OPORTID=0 are skipped"""
+
+    def __init__(self):
+        RecordParser.__init__(self)
+        self.result = list()
+
+    def _add_fields(self, vendor, fields):
+        src_port = _to_int(fields.get('IPORTID'))
+        dst_port = _to_int(fields.get('OPORTID'))
+        if src_port == 0 or dst_port == 0:
+            return
+
+        self.result.append(ConnectionRecord(src_port, dst_port))
+
+
+class MergedParser(object):
+    """'result' and 'fingerprint' of list parsers of the parts of one retrieval (e.g. port range shards)
+
+    Results are concatenated in part order, the fingerprint is a digest of the part fingerprints, so it is equal
+    for equal device state retrieved in equal parts.
+    """
+
+    def __init__(self, parser_list):
+        self.result = list()
+        digest = hashlib.md5()
+        for parser in parser_list:
+            self.result.extend(parser.result)
+            digest.update(parser.fingerprint)
+            digest.update('\n')
+
+        self.fingerprint = digest.hexdigest()
+
+
+def get_fingerprint(response):
+    """Return digest of the quoted records of a TL1 response"""
+    return RecordParser().feed_response(response).fingerprint
+
+
+def parse_port_list(response):
+    """Parse RTRV-CFG-FIBER response into a list of PortRecord"""
+    return PortListParser().feed_response(response).result
+
+
+def parse_connections(response):
+    """Parse rtrv-crs-fiber response into a list of ConnectionRecord"""
+    return ConnectionParser().feed_response(response).result
+
+
+def parse_autonomous_message(message):
+    """Return list of changes reported by an autonomous message
+
+    Records with IPORTID are cross-connect changes: ('connect', IN port id, OUT port id), or ('disconnect', IN port
+    id) for OPORTID=0. Records with PORTID and PORTHEALTH are health changes: ('health', port id, 'good'|'bad').
+    """
+    change_list = list()
+    for vendor, fields in iter_records(message):
+        if 'IPORTID' in fields:
+            src_port = _to_int(fields.get('IPORTID'))
+            dst_port = _to_int(fields.get('OPORTID'))
+            if src_port == 0:
+                continue
+
+            if dst_port == 0:
+                change_list.append(('disconnect', src_port))
+            else:
+                change_list.append(('connect', src_port, dst_port))
+        elif 'PORTID' in fields:
+            port_id = _to_int(fields.get('PORTID'))
+            health = fields.get('PORTHEALTH', '').lower()
+            if port_id != 0 and health in ('good', 'bad'):
+                change_list.append(('health', port_id, health))
+
+    return change_list
+
+
+def parse_matrix_size(system_info):
+    """Return (src, dst) port counts from 'LicensedPortMatrix=NxM' or None"""
+    src, separator, dst = system_info.get('LicensedPortMatrix', '').partition('x')
+    if not separator or not src.isdigit() or not dst.isdigit():
+        return None
+
+    return int(src), int(dst)
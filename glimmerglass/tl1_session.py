@@ -0,0 +1,284 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import socket
+import threading
+import time
+
+from common.configuration_parser import ConfigurationParser
+from glimmerglass import tl1_parser
+from glimmerglass.driver_settings import DriverSettings
+
+
+class TL1Session(object):
+    """Raw TCP session which matches TL1 responses to commands by ctag
+
+    Could be selected with "connection_type": "tl1" in configuration.json. Besides the common session interface
+    (connect, send_command, disconnect) it provides send_commands, which writes several commands back to back
+    and returns their responses in command order, and streams quoted records to record parsers while reading.
+    """
+
+    def __init__(self):
+        self._socket = None
+        self._buffer = ''
+        self._lines = list()
+        self._line_index = 0
+        self._buffer_size = 65536
+
+        self._terminator = ConfigurationParser.get("common_variable", "device_prompt")
+        self._timeout = DriverSettings.get().session_timeout
+        self._autonomous_handler = None
+
+    def connect(self, host, username, password, port=None):
+        self.disconnect()
+
+        host, _, host_port = host.partition(':')
+        if host_port:
+            port = int(host_port)
+        elif port is None:
+            port = ConfigurationParser.get("common_variable", "connection_port")
+
+        self._socket = socket.create_connection((host, int(port)), self._timeout)
+        self._buffer = ''
+        self._lines = list()
+        self._line_index = 0
+
+    def disconnect(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except socket.error:
+                pass
+
+        self._socket = None
+
+    def set_autonomous_handler(self, autonomous_handler):
+        """Pass autonomous messages (REPT) to 'autonomous_handler' instead of dropping them
+
+        TL1Session receives them only while it waits for a response, ConcurrentTL1Session as soon as they arrive.
+        """
+        self._autonomous_handler = autonomous_handler
+
+    def _dispatch_autonomous_message(self, message):
+        if self._autonomous_handler is not None:
+            try:
+                self._autonomous_handler(message)
+            except Exception:
+                pass
+
+    def _read_line(self, timeout):
+        """Return next complete line (with its line break) received from the device"""
+        while self._line_index >= len(self._lines):
+            if self._socket is None:
+                raise Exception(self.__class__.__name__, "Session is not connected!")
+
+            self._socket.settimeout(timeout)
+            try:
+                data = self._socket.recv(self._buffer_size)
+            except socket.timeout:
+                raise Exception(self.__class__.__name__, "Timeout waiting for TL1 response!")
+
+            if not data:
+                self.disconnect()
+                raise Exception(self.__class__.__name__, "Connection closed by the device!")
+
+            # only the unfinished last line is kept between reads
+            line_list = (self._buffer + data).split('\n')
+            self._buffer = line_list.pop()
+            self._lines = [line + '\n' for line in line_list]
+            self._line_index = 0
+
+        line = self._lines[self._line_index]
+        self._line_index += 1
+        return line
+
+    def _read_response(self, terminator, timeout, record_parsers=None):
+        """Read one response till the terminator
+
+        Only the tail of the received data is checked for the terminator. If there is a record parser for the ctag
+        of the response, its quoted records are passed to the parser as soon as their line is received and are
+        left out of the returned text.
+        """
+        response_lines = list()
+        tail = ''
+        ctag = None
+        while True:
+            line = self._read_line(timeout)
+            tail = (tail + line)[-len(terminator):]
+
+            status_match = tl1_parser.STATUS_PATTERN.match(line)
+            if status_match is not None:
+                ctag = int(status_match.group(1))
+
+            if record_parsers and ctag in record_parsers and '"' in line:
+                record_parser = record_parsers[ctag]
+                for record in tl1_parser.RECORD_PATTERN.findall(line):
+                    record_parser.add_record(record)
+            else:
+                response_lines.append(line)
+
+            if tail == terminator:
+                return ''.join(response_lines)
+
+    def send_commands(self, command_list, re_string=None, timeout=None, record_parsers=None):
+        """Write all commands at once and return list of responses matched by ctag
+
+        'record_parsers' is an optional list of tl1_parser.RecordParser (or None) in command order, records of a
+        response are streamed to its parser. Responses with an unknown ctag (e.g. late responses of timed out
+        commands) are dropped.
+        """
+        terminator = re_string or self._terminator
+        timeout = timeout or self._timeout
+
+        ctag_list = [tl1_parser.get_command_ctag(command) for command in command_list]
+        record_parser_map = dict()
+        if record_parsers is not None:
+            record_parser_map = dict((ctag, record_parser) for ctag, record_parser in zip(ctag_list, record_parsers)
+                                     if ctag is not None and record_parser is not None)
+
+        self._socket.sendall(''.join(command + '\r\n' for command in command_list))
+
+        responses = dict()
+        while len(responses) < len(set(ctag_list)):
+            response = self._read_response(terminator, timeout, record_parser_map)
+            if tl1_parser.is_autonomous_message(response):
+                self._dispatch_autonomous_message(response)
+                continue
+
+            ctag, status = tl1_parser.get_response_status(response)
+            if ctag in ctag_list and ctag not in responses:
+                responses[ctag] = response
+            elif None in ctag_list and None not in responses:
+                responses[None] = response
+
+        return [responses[ctag] for ctag in ctag_list]
+
+    def send_command(self, data_str=None, re_string=None, timeout=None, record_parser=None, **kwargs):
+        return self.send_commands([data_str], re_string, timeout, [record_parser])[0]
+
+
+class _PendingCommand(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class ConcurrentTL1Session(TL1Session):
+    """TL1Session which could be used by several threads at once
+
+    Could be selected with "connection_type": "tl1_concurrent". Commands of all threads are written to the same
+    connection, a reader thread receives responses and hands them over to the waiting threads by ctag. Responses
+    still come in the order the switch sends them, so a short cross-connect command waits for a long retrieval
+    sent before it; the driver handler sends retrievals over a session of their own. Commands sent at the same
+    time must have different ctags. The reader waits for the terminator of 'device_prompt', 're_string' of a call
+    is ignored.
+    """
+
+    concurrent = True
+
+    def __init__(self):
+        TL1Session.__init__(self)
+
+        self._write_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = dict()
+        self._record_parsers = dict()
+        self._reader = None
+
+    def connect(self, host, username, password, port=None):
+        self.disconnect()
+        if self._reader is not None:
+            self._reader.join()
+
+        TL1Session.connect(self, host, username, password, port)
+
+        self._reader = threading.Thread(target=self._read_loop, args=(self._socket,))
+        self._reader.daemon = True
+        self._reader.start()
+
+    def disconnect(self):
+        if self._socket is not None:
+            try:
+                # wakes up the reader thread blocked in recv
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+        TL1Session.disconnect(self)
+
+    def is_listening(self):
+        """Whether the reader thread still receives messages from the device"""
+        return self._reader is not None and self._reader.is_alive()
+
+    def _read_loop(self, connection):
+        try:
+            while self._socket is connection:
+                response = self._read_response(self._terminator, None, self._record_parsers)
+                if tl1_parser.is_autonomous_message(response):
+                    self._dispatch_autonomous_message(response)
+                    continue
+
+                ctag, status = tl1_parser.get_response_status(response)
+                with self._pending_lock:
+                    if ctag not in self._pending:
+                        ctag = None
+                    pending = self._pending.pop(ctag, None)
+                    self._record_parsers.pop(ctag, None)
+
+                # responses of timed out commands are dropped
+                if pending is not None:
+                    pending.response = response
+                    pending.event.set()
+        except Exception as error:
+            with self._pending_lock:
+                pending_list = self._pending.values()
+                self._pending = dict()
+                self._record_parsers = dict()
+
+            for pending in pending_list:
+                pending.error = error
+                pending.event.set()
+
+    def _remove_pending(self, ctag_list):
+        with self._pending_lock:
+            for ctag in ctag_list:
+                self._pending.pop(ctag, None)
+                self._record_parsers.pop(ctag, None)
+
+    def send_commands(self, command_list, re_string=None, timeout=None, record_parsers=None):
+        timeout = timeout or self._timeout
+        if record_parsers is None:
+            record_parsers = [None] * len(command_list)
+
+        ctag_list = [tl1_parser.get_command_ctag(command) for command in command_list]
+        pending_list = list()
+        with self._pending_lock:
+            if self._socket is None:
+                raise Exception(self.__class__.__name__, "Session is not connected!")
+            if len(set(ctag_list)) != len(ctag_list) or any(ctag in self._pending for ctag in ctag_list):
+                raise Exception(self.__class__.__name__, "Commands with the same ctag are already sent!")
+
+            for ctag, record_parser in zip(ctag_list, record_parsers):
+                pending = _PendingCommand()
+                self._pending[ctag] = pending
+                if record_parser is not None:
+                    self._record_parsers[ctag] = record_parser
+                pending_list.append(pending)
+
+        try:
+            with self._write_lock:
+                self._socket.sendall(''.join(command + '\r\n' for command in command_list))
+        except (socket.error, AttributeError):
+            self._remove_pending(ctag_list)
+            raise Exception(self.__class__.__name__, "Session is not connected!")
+
+        deadline = time.time() + timeout
+        for pending in pending_list:
+            if not pending.event.wait(max(deadline - time.time(), 0)):
+                self._remove_pending(ctag_list)
+                raise Exception(self.__class__.__name__, "Timeout waiting for TL1 response!")
+            if pending.error is not None:
+                raise pending.error
+
+        return [pending.response for pending in pending_list]
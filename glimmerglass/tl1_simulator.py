@@ -0,0 +1,275 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Local TCP simulator of Glimmerglass switches for load testing without real hardware
+
+    python -m glimmerglass.tl1_simulator --chassis 8 --base-port 10034 --size 192 --latency 5
+    python -m glimmerglass.tl1_simulator --base-port 10034 --record session.json --upstream 192.168.2.41:10033
+    python -m glimmerglass.tl1_simulator --base-port 10034 --replay session.json
+
+Every simulated chassis listens on its own port and keeps its cross-connects (glimmerglass.chassis_generator).
+In record mode (one chassis) commands are passed to a real switch and command/response pairs are written to a json
+lines file, ACT-USER passwords masked. In replay mode responses are taken from such a file (ctag of the response is
+replaced with the ctag of the command).
+"""
+
+import argparse
+import json
+import random
+import re
+import socket
+import SocketServer
+import threading
+import time
+
+from glimmerglass import tl1_parser
+from glimmerglass.chassis_generator import ChassisGenerator
+
+TERMINATOR = '\r\n;\r\n'
+CTAG_PATTERN = re.compile(r'^(M\s+)\d+', re.MULTILINE)
+# ACT-USER:[tid]:uid:ctag::pid
+PASSWORD_PATTERN = re.compile(r'^(\s*act-user(?::[^:;]*){4}:)[^;]*', re.IGNORECASE)
+PASSWORD_MASK = '********'
+
+
+def render_deny(ctag, error_code):
+    return '\r\n   SIMULATOR {0}\r\nM  {1} DENY\r\n   {2}{3}'.format(time.strftime('%y-%m-%d %H:%M:%S'),
+                                                                  ctag if ctag is not None else 0, error_code,
+                                                                  TERMINATOR)
+
+
+def redact_command(command):
+    """Command with the password of ACT-USER masked, commands are recorded this way"""
+    return PASSWORD_PATTERN.sub(r'\g<1>{0}'.format(PASSWORD_MASK), command)
+
+
+def normalize_command(command):
+    """Command without ctag, password and letter case, key of recorded responses"""
+    fields = redact_command(command).strip().rstrip(';').split(':')
+    if len(fields) > 3:
+        fields[3] = ''
+
+    return ':'.join(fields).lower()
+
+
+class RecordedResponder(object):
+    """Answers commands with responses of a recorded session, responses of a repeated command are used in turn"""
+
+    def __init__(self, record_file_name):
+        self._responses = dict()
+        self._positions = dict()
+        self._lock = threading.Lock()
+
+        with open(record_file_name) as record_file:
+            for line in record_file:
+                if line.strip():
+                    record = json.loads(line)
+                    self._responses.setdefault(normalize_command(record['command']), list()).append(
+                        record['response'])
+
+    def handle_command(self, command):
+        key = normalize_command(command)
+        with self._lock:
+            response_list = self._responses.get(key)
+            if not response_list:
+                return None
+
+            position = self._positions.get(key, 0)
+            self._positions[key] = (position + 1) % len(response_list)
+
+        ctag = tl1_parser.get_command_ctag(command)
+        return CTAG_PATTERN.sub(r'\g<1>{0}'.format(ctag if ctag is not None else 0), response_list[position])
+
+
+class RecordingResponder(object):
+    """Passes commands to a real switch and appends command/response pairs to a json lines file"""
+
+    def __init__(self, upstream_address, record_file_name, timeout=60):
+        self._upstream_address = upstream_address
+        self._record_file = open(record_file_name, 'a')
+        self._timeout = timeout
+        self._lock = threading.Lock()
+
+    def create_connection(self):
+        host, _, port = self._upstream_address.partition(':')
+        return socket.create_connection((host, int(port)), self._timeout)
+
+    def handle_command(self, command, upstream):
+        upstream.sendall(command + '\r\n')
+
+        response = ''
+        while not response.endswith(TERMINATOR):
+            data = upstream.recv(65536)
+            if not data:
+                break
+            response += data
+
+        with self._lock:
+            self._record_file.write(json.dumps({'command': redact_command(command), 'response': response}) + '\n')
+            self._record_file.flush()
+
+        return response
+
+
+class SimulatorHandler(SocketServer.BaseRequestHandler):
+    """One client connection, commands are split by ';' and answered in order"""
+
+    def setup(self):
+        self._upstream = None
+        self._write_lock = threading.Lock()
+        self._listening = False
+        if isinstance(self.server.responder, RecordingResponder):
+            self._upstream = self.server.responder.create_connection()
+
+    def finish(self):
+        if self._listening:
+            with self.server.lock:
+                self.server.responder.event_listeners.remove(self._send_event)
+        if self._upstream is not None:
+            self._upstream.close()
+
+    def _send(self, data):
+        with self._write_lock:
+            self.request.sendall(data)
+
+    def _send_event(self, message):
+        # called from the connection which changed the chassis, a closed connection must not fail its command
+        try:
+            self._send(message)
+        except socket.error:
+            pass
+
+    def _listen(self, command):
+        """Autonomous messages of a chassis are sent to the connections which allowed them with ALW-MSG-ALL"""
+        if self._listening or not hasattr(self.server.responder, 'event_listeners') \
+                or not command.lower().startswith('alw-msg-all'):
+            return
+
+        with self.server.lock:
+            self.server.responder.event_listeners.append(self._send_event)
+        self._listening = True
+
+    def _get_response(self, command):
+        if self._upstream is not None:
+            return self.server.responder.handle_command(command, self._upstream)
+
+        with self.server.lock:
+            return self.server.responder.handle_command(command)
+
+    def handle(self):
+        server = self.server
+        buffer_data = ''
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+
+            buffer_data += data
+            while ';' in buffer_data:
+                command, _, buffer_data = buffer_data.partition(';')
+                command = command.strip() + ';'
+
+                if server.latency or server.jitter:
+                    time.sleep((server.latency + random.uniform(0, server.jitter)) / 1000.0)
+
+                injection = random.random()
+                if injection < server.disconnect_rate:
+                    return
+                if injection < server.disconnect_rate + server.drop_rate:
+                    continue
+
+                if injection < server.disconnect_rate + server.drop_rate + server.error_rate:
+                    response = render_deny(tl1_parser.get_command_ctag(command), 'SROF')
+                else:
+                    response = self._get_response(command)
+
+                if response is None:
+                    response = render_deny(tl1_parser.get_command_ctag(command), 'ICNV')
+                else:
+                    self._listen(command)
+
+                if server.record_delay:
+                    # transfer time of a real switch grows with the response
+                    time.sleep(response.count('"') // 2 * server.record_delay / 1000.0)
+
+                self._send(response)
+
+
+class SimulatorServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, responder, latency=0, jitter=0, error_rate=0.0, drop_rate=0.0, disconnect_rate=0.0,
+                 record_delay=0):
+        SocketServer.TCPServer.__init__(self, address, SimulatorHandler)
+
+        self.responder = responder
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.disconnect_rate = disconnect_rate
+        self.record_delay = record_delay
+
+
+def start_simulator(host, port, responder, **kwargs):
+    """Start simulator server in a daemon thread and return it, shutdown() stops it"""
+    server = SimulatorServer((host, port), responder, **kwargs)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Glimmerglass TL1 simulator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=10034, help='port of the first chassis')
+    parser.add_argument('--chassis', type=int, default=1, help='number of chassis on consecutive ports')
+    parser.add_argument('--size', type=int, default=96, help='IN (and OUT) port count')
+    parser.add_argument('--density', type=float, default=0.5, help='ratio of connected IN ports')
+    parser.add_argument('--bad-ratio', type=float, default=0.0, help='ratio of ports with PORTHEALTH=bad')
+    parser.add_argument('--latency', type=float, default=0, help='delay of every response, ms')
+    parser.add_argument('--jitter', type=float, default=0, help='random extra delay up to, ms')
+    parser.add_argument('--record-delay', type=float, default=0, help='extra delay per response record, ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='ratio of commands answered with DENY')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='ratio of commands left without response')
+    parser.add_argument('--disconnect-rate', type=float, default=0.0, help='ratio of commands closing connection')
+    parser.add_argument('--record', help='json lines file to record a session with --upstream to')
+    parser.add_argument('--upstream', help='host:port of a real switch for --record')
+    parser.add_argument('--replay', help='json lines file written by --record')
+    args = parser.parse_args(argv)
+
+    if args.record and not args.upstream:
+        parser.error('--record requires --upstream')
+    if args.record and args.chassis > 1:
+        parser.error('--record could be used with one chassis only')
+
+    server_list = list()
+    for chassis_index in xrange(args.chassis):
+        if args.record:
+            responder = RecordingResponder(args.upstream, args.record)
+        elif args.replay:
+            responder = RecordedResponder(args.replay)
+        else:
+            responder = ChassisGenerator(args.size, args.density, args.bad_ratio, seed=chassis_index,
+                                         serial_number='SIM{0:04d}'.format(chassis_index))
+
+        server_list.append(start_simulator(args.host, args.base_port + chassis_index, responder,
+                                           latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                           drop_rate=args.drop_rate, disconnect_rate=args.disconnect_rate,
+                                           record_delay=args.record_delay))
+        print 'Chassis {0} listening on {1}:{2}'.format(chassis_index, args.host, args.base_port + chassis_index)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in server_list:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
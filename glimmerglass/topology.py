@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import copy
+import time
+
+
+class TopologySnapshot(object):
+    """In-memory copy of the switch topology: system info, ports with health and fiber cross-connects
+
+    Cross-connects are kept as IN port id -> OUT port id (physical ids, int) in 'connections' and indexed the other
+    way round, OUT port id -> IN port id, in 'sources'. Every change increments 'version',
+    'fetch_time' is the time of the last retrieval from the switch and is used for TTL checks, 'port_fetch_time'
+    is the time the port list was retrieved (it could be reused from the previous snapshot).
+    """
+
+    def __init__(self, system_info, port_list, connection_list, system_fingerprint=None, port_fingerprint=None,
+                 port_fetch_time=None):
+        self.version = 1
+        self.fetch_time = time.time()
+        self.port_fetch_time = port_fetch_time or self.fetch_time
+
+        self.system_fingerprint = system_fingerprint
+        self.port_fingerprint = port_fingerprint
+
+        self.system_info = system_info
+        self.port_list = port_list
+        self.ports = dict((port_record.port_id, port_record) for port_record in port_list)
+
+        self.connections = dict()
+        self.sources = dict()
+        self.set_connections(connection_list)
+        self.version = 1
+
+    def copy(self):
+        """Return a copy which is not changed with this snapshot, port records are shared (they are immutable)"""
+        topology = copy.copy(self)
+        topology.system_info = dict(self.system_info)
+        topology.port_list = list(self.port_list)
+        topology.ports = dict(self.ports)
+        topology.connections = dict(self.connections)
+        topology.sources = dict(self.sources)
+        return topology
+
+    def is_expired(self, ttl):
+        return ttl <= 0 or time.time() - self.fetch_time > ttl
+
+    def is_port_list_expired(self, max_age):
+        return max_age > 0 and time.time() - self.port_fetch_time > max_age
+
+    def set_connections(self, connection_list):
+        """Replace all cross-connects with a freshly retrieved list of ConnectionRecord"""
+        self.connections = dict()
+        self.sources = dict()
+        for connection in connection_list:
+            self.connections[connection.src_port] = connection.dst_port
+            self.sources[connection.dst_port] = connection.src_port
+        self.version += 1
+
+    def _disconnect_out_port(self, dst_port):
+        src_port = self.sources.pop(dst_port, None)
+        if src_port is not None and self.connections.get(src_port) == dst_port:
+            del self.connections[src_port]
+
+    def connect(self, src_port, dst_port):
+        src_port = int(src_port)
+        dst_port = int(dst_port)
+
+        # the switch denies a cross-connect to an OUT port fed by another IN port, so a reported one means that
+        # the previous cross-connect is gone (its removal could have been missed)
+        self._disconnect_out_port(dst_port)
+        self.disconnect(src_port)
+
+        self.connections[src_port] = dst_port
+        self.sources[dst_port] = src_port
+
+    def disconnect(self, src_port):
+        dst_port = self.connections.pop(int(src_port), None)
+        if dst_port is not None and self.sources.get(dst_port) == int(src_port):
+            del self.sources[dst_port]
+        self.version += 1
+
+    def get_source(self, dst_port):
+        """Return IN port id connected to OUT port id 'dst_port', None if it is not connected"""
+        return self.sources.get(int(dst_port))
+
+    def set_port_health(self, port_id, health):
+        port_record = self.ports.get(port_id)
+        if port_record is None or port_record.health == health:
+            return
+
+        port_record = port_record._replace(health=health)
+        self.ports[port_id] = port_record
+        self.port_list = [port_record if record.port_id == port_id else record for record in self.port_list]
+        # changed fingerprint makes the handler rebuild its port resources
+        self.port_fingerprint = '{0}:{1}'.format(self.port_fingerprint, self.version)
+        self.version += 1
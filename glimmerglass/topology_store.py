@@ -0,0 +1,113 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+
+from glimmerglass import tl1_parser
+from glimmerglass.topology import TopologySnapshot
+
+SCHEMA = 'CREATE TABLE IF NOT EXISTS topology (' \
+         'serial_number TEXT PRIMARY KEY, address TEXT, generation INTEGER, fetch_time REAL, port_fetch_time REAL, ' \
+         'system_fingerprint TEXT, port_fingerprint TEXT, system_info TEXT, port_list TEXT, connections TEXT)'
+ADDRESS_INDEX = 'CREATE INDEX IF NOT EXISTS topology_address ON topology (address)'
+
+
+def _str(value):
+    return value.encode('utf-8') if isinstance(value, unicode) else value
+
+
+class TopologyStore(object):
+    """Topology snapshots of all chassis in a local sqlite file, shared by the driver processes of the host
+
+    One row per chassis serial number (from rtrv-system-info) holds system info, parsed port list and cross-connects
+    of the last retrieval. 'generation' is incremented by every save, so a reader finds out with one cheap query
+    whether another process has stored a newer retrieval. A connection is opened per call, the store could be
+    used from any thread.
+    """
+
+    def __init__(self, path, timeout=5):
+        self._path = path
+        self._timeout = timeout
+
+        connection = self._connect()
+        try:
+            connection.execute(SCHEMA)
+            connection.execute(ADDRESS_INDEX)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self._path, timeout=self._timeout)
+        # readers are not blocked by a writing process
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def get_generation(self, address):
+        """Return generation of the newest snapshot stored for 'address', None if there is none"""
+        connection = self._connect()
+        try:
+            row = connection.execute('SELECT generation FROM topology WHERE address = ? '
+                                     'ORDER BY fetch_time DESC LIMIT 1', (address,)).fetchone()
+        finally:
+            connection.close()
+
+        return row[0] if row is not None else None
+
+    def load(self, address):
+        """Return (generation, TopologySnapshot) of the newest snapshot stored for 'address', None if there is none
+
+        'fetch_time' of the snapshot is the time of its retrieval from the switch.
+        """
+        connection = self._connect()
+        try:
+            row = connection.execute('SELECT generation, fetch_time, port_fetch_time, system_fingerprint, '
+                                     'port_fingerprint, system_info, port_list, connections FROM topology '
+                                     'WHERE address = ? ORDER BY fetch_time DESC LIMIT 1', (address,)).fetchone()
+        finally:
+            connection.close()
+
+        if row is None:
+            return None
+
+        generation, fetch_time, port_fetch_time, system_fingerprint, port_fingerprint = row[:5]
+        system_info = dict((_str(key), _str(value)) for key, value in json.loads(row[5]).iteritems())
+        port_list = [tl1_parser.PortRecord(port_id, _str(name), _str(direction), _str(logical_id), _str(health))
+                     for port_id, name, direction, logical_id, health in json.loads(row[6])]
+        connection_list = [tl1_parser.ConnectionRecord(src_port, dst_port)
+                           for src_port, dst_port in json.loads(row[7])]
+
+        topology = TopologySnapshot(system_info, port_list, connection_list,
+                                    system_fingerprint=_str(system_fingerprint),
+                                    port_fingerprint=_str(port_fingerprint), port_fetch_time=port_fetch_time)
+        topology.fetch_time = fetch_time
+        return generation, topology
+
+    def save(self, address, topology):
+        """Store snapshot under the serial number of its system info, return the new generation"""
+        serial_number = topology.system_info.get("SerialNumber") or address
+        values = (address, topology.fetch_time, topology.port_fetch_time, topology.system_fingerprint,
+                  topology.port_fingerprint, json.dumps(topology.system_info),
+                  json.dumps([list(port_record) for port_record in topology.port_list]),
+                  json.dumps(sorted(topology.connections.iteritems())), serial_number)
+
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute('UPDATE topology SET generation = generation + 1, address = ?, '
+                                            'fetch_time = ?, port_fetch_time = ?, system_fingerprint = ?, '
+                                            'port_fingerprint = ?, system_info = ?, port_list = ?, connections = ? '
+                                            'WHERE serial_number = ?', values)
+                if cursor.rowcount == 0:
+                    connection.execute('INSERT INTO topology (address, fetch_time, port_fetch_time, '
+                                       'system_fingerprint, port_fingerprint, system_info, port_list, connections, '
+                                       'serial_number, generation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)', values)
+
+                generation = connection.execute('SELECT generation FROM topology WHERE serial_number = ?',
+                                                (serial_number,)).fetchone()[0]
+        finally:
+            connection.close()
+
+        return generation
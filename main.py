@@ -2,16 +2,24 @@
 # -*- coding: utf-8 -*-
 
 import sys, os
+import time
+
+startup_time = time.time()
 
 from common.configuration_parser import ConfigurationParser
 from common.helper.system_helper import get_file_folder
 from common.server_connection import ServerConnection
 from common.request_manager import RequestManager
 from common.request_handler import RequestHandler
+from glimmerglass.driver_settings import DriverSettings
+from glimmerglass.glimmerglass_request_handler import GlimmerglassRequestHandler
 
 from cloudshell.core.logger.qs_logger import get_qs_logger
 
 if __name__ == '__main__':
+    # time of every startup phase, printed before the driver starts listening
+    startup_timing = [('imports', time.time() - startup_time)]
+
     print 'Argument List: ', str(sys.argv)
 
     host = '0.0.0.0'
@@ -22,22 +30,34 @@ if __name__ == '__main__':
     exe_folder_str = get_file_folder(sys.argv[0])
     os.environ['LOG_PATH'] = os.path.join(exe_folder_str, '..', 'Logs')
 
+    phase_time = time.time()
     ConfigurationParser.set_root_folder(exe_folder_str)
     ConfigurationParser.init()
+    # wrong driver_variable values stop the driver here
+    DriverSettings.load()
+    startup_timing.append(('configuration', time.time() - phase_time))
 
-    request_handler = RequestHandler()
+    phase_time = time.time()
+    request_handler = GlimmerglassRequestHandler()
+    startup_timing.append(('request handler', time.time() - phase_time))
 
     request_manager = RequestManager()
     request_manager.bind_command('login', (RequestHandler.login, request_handler))
     request_manager.bind_command('getresourcedescription', (RequestHandler.get_resource_description, request_handler))
     request_manager.bind_command('setstateid', (RequestHandler.set_state_id, request_handler))
     request_manager.bind_command('getstateid', (RequestHandler.get_state_id, request_handler))
-    request_manager.bind_command('mapuni', (RequestHandler.map_uni, request_handler))
-    request_manager.bind_command('mapbidi', (RequestHandler.map_bidi, request_handler))
+    request_manager.bind_command('mapuni', (GlimmerglassRequestHandler.map_uni, request_handler))
+    request_manager.bind_command('mapbidi', (GlimmerglassRequestHandler.map_bidi, request_handler))
     request_manager.bind_command('mapclearto', (RequestHandler.map_clear_to, request_handler))
     request_manager.bind_command('mapclear', (RequestHandler.map_clear, request_handler))
     request_manager.bind_command('setspeedmanual', (RequestHandler.set_speed_manual, request_handler))
+    request_manager.bind_command('mapbatch', (GlimmerglassRequestHandler.map_batch, request_handler))
+    request_manager.bind_command('reconcile', (GlimmerglassRequestHandler.reconcile, request_handler))
+    request_manager.bind_command('getstats', (GlimmerglassRequestHandler.get_stats, request_handler))
 
     server_connection = ServerConnection(host, port, request_manager, exe_folder_str)
 
+    startup_timing.append(('total', time.time() - startup_time))
+    print 'Startup time: ' + ', '.join('{0} {1:.3f} s'.format(phase, duration) for phase, duration in startup_timing)
+
     server_connection.start_listeninig()
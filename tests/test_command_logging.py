@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+
+from glimmerglass.command_logging import CommandLogger, CommandLogWriter
+from tests.test_tl1_parser import render
+
+
+class ListLogger(object):
+    """command_logger which keeps its messages, the first one waits till 'release' is set"""
+
+    def __init__(self):
+        self.messages = list()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def info(self, message):
+        self.writing.set()
+        self.release.wait(5)
+        self.messages.append(message)
+
+
+class TestCommandLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.logger = ListLogger()
+        self.writer = CommandLogWriter(2)
+
+    def test_records_are_written_in_order(self):
+        self.logger.release.set()
+        for index in range(5):
+            self.writer.put(self.logger, 'record {0}'.format(index))
+            self.writer._queue.join()
+
+        self.assertEqual(self.logger.messages, ['record {0}'.format(index) for index in range(5)])
+
+    def test_full_queue_drops_records(self):
+        """Records put while the queue is full are dropped, their number is logged with the next written one"""
+        self.writer.put(self.logger, 'record 0')
+        self.logger.writing.wait(5)
+        for index in range(1, 5):
+            self.writer.put(self.logger, 'record {0}'.format(index))
+
+        self.logger.release.set()
+        self.writer._queue.join()
+
+        self.assertEqual(self.logger.messages, ['record 0', '2 log records were dropped, log queue is full',
+                                                'record 1', 'record 2'])
+        self.assertEqual(self.writer._dropped_count, 0)
+
+
+class TestCommandLogger(unittest.TestCase):
+    def setUp(self):
+        self.logger = ListLogger()
+        self.logger.release.set()
+
+    def test_summary(self):
+        response = render(['GGN:IPORTID={0}'.format(port) for port in range(10001, 10009)], 12)
+        CommandLogger(self.logger, 20).info(response)
+        CommandLogger(self.logger, 20).info('rtrv-hdr:::1;')
+
+        self.assertEqual(self.logger.messages, [
+            response[:20] + '... [{0} bytes, 8 records, ctag 12 COMPLD]'.format(len(response)), 'rtrv-hdr:::1;'])
+
+    def test_writer(self):
+        writer = CommandLogWriter(2)
+        CommandLogger(self.logger, writer=writer).info('rtrv-hdr:::1;')
+        writer._queue.join()
+
+        self.assertEqual(self.logger.messages, ['rtrv-hdr:::1;'])
+
+
+if __name__ == '__main__':
+    unittest.main()
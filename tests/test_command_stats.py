@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from common.configuration_parser import ConfigurationParser
+from common.xml_wrapper import XMLWrapper
+from glimmerglass.command_stats import BUCKET_COUNT, CommandStats, LatencyHistogram
+from glimmerglass.glimmerglass_request_handler import GlimmerglassRequestHandler
+
+RESULT_NAMESPACE = '{http://schemas.qualisystems.com/ResourceManagement/DriverCommandResult.xsd}'
+
+
+def setUpModule():
+    ConfigurationParser.set_root_folder(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ConfigurationParser.init()
+
+
+class NullLogger(object):
+    def info(self, message):
+        pass
+
+
+class StatsDriverHandler(object):
+    def __init__(self, command_stats):
+        self._command_stats = command_stats
+
+    def get_stats(self):
+        return self._command_stats.get_summary()
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets(self):
+        """Bucket upper bounds grow by 2 ** (1/4) from 1 us, longer durations are in the last bucket"""
+        for seconds, index in ((0.0000005, 0), (0.000001, 0), (0.000003, 7), (0.001, 40), (0.05, 63),
+                               (4000.0, BUCKET_COUNT - 1)):
+            histogram = LatencyHistogram()
+            histogram.add(seconds)
+            self.assertEqual(histogram.buckets.index(1), index)
+
+    def test_percentile(self):
+        histogram = LatencyHistogram()
+        for seconds in [0.001] * 9 + [0.05]:
+            histogram.add(seconds)
+
+        self.assertAlmostEqual(histogram.percentile(50), 0.001024)
+        self.assertAlmostEqual(histogram.percentile(90), 0.001024)
+        # upper bound of the last bucket is cut to the longest duration
+        self.assertAlmostEqual(histogram.percentile(99), 0.05)
+        self.assertEqual(LatencyHistogram().percentile(50), 0.0)
+
+
+class TestCommandStats(unittest.TestCase):
+    def setUp(self):
+        self.command_stats = CommandStats()
+        for seconds in [0.001] * 9 + [0.05]:
+            self.command_stats.add('rtrv-crs-fiber', 'round_trip', seconds, 100)
+        self.command_stats.add('get_resource_description', 'total', 0.003)
+
+    def test_summary(self):
+        summary = self.command_stats.get_summary()
+
+        self.assertEqual([(item['command'], item['phase'], item['count']) for item in summary],
+                         [('get_resource_description', 'total', 1), ('rtrv-crs-fiber', 'round_trip', 10)])
+        self.assertEqual(summary[1]['bytes'], 1000)
+        for key, value in (('total', 59.0), ('min', 1.0), ('p50', 1.024), ('p90', 1.024), ('p99', 50.0),
+                           ('max', 50.0)):
+            self.assertAlmostEqual(summary[1][key], value)
+
+        self.command_stats.reset()
+        self.assertEqual(self.command_stats.get_summary(), list())
+
+    def test_getstats(self):
+        request_handler = GlimmerglassRequestHandler(StatsDriverHandler(self.command_stats))
+        response = request_handler.get_stats(XMLWrapper.parse_xml('<Command CommandName="GetStats"/>'),
+                                             command_logger=NullLogger())
+
+        self.assertEqual(response.get('{http://www.w3.org/2001/XMLSchema-instance}type'), 'StatsResponseInfo')
+        stat_list = response.findall(RESULT_NAMESPACE + 'Stat')
+        self.assertEqual([stat.get('Command') for stat in stat_list], ['get_resource_description', 'rtrv-crs-fiber'])
+        self.assertEqual(dict(stat_list[1].attrib), {
+            'Command': 'rtrv-crs-fiber', 'Phase': 'round_trip', 'Count': '10', 'Bytes': '1000', 'Total': '59.000',
+            'Min': '1.000', 'P50': '1.024', 'P90': '1.024', 'P99': '50.000', 'Max': '50.000'})
+
+
+if __name__ == '__main__':
+    unittest.main()
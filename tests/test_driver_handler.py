@@ -0,0 +1,600 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import unittest
+
+from common.configuration_parser import ConfigurationParser
+from glimmerglass.chassis_generator import ChassisGenerator, GeneratedSession
+from glimmerglass.glimmerglass_driver_handler import GlimmerglassDriverHandler, forced_mappings
+from glimmerglass.session_pool import SessionPool
+
+ADDRESS = '192.168.1.1'
+
+
+def setUpModule():
+    ConfigurationParser.set_root_folder(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ConfigurationParser.init()
+
+
+class DenyingChassisGenerator(ChassisGenerator):
+    """ChassisGenerator which answers the verbs of 'denied_verbs' with DENY"""
+
+    def __init__(self, size, denied_verbs=(), **kwargs):
+        ChassisGenerator.__init__(self, size, **kwargs)
+        self.denied_verbs = set(denied_verbs)
+
+    def handle_command(self, command):
+        if command.split(':', 1)[0].lower() in self.denied_verbs:
+            return self.render_deny(command.strip().rstrip(';').split(':')[3])
+
+        return ChassisGenerator.handle_command(self, command)
+
+
+class RangeDenyingChassisGenerator(ChassisGenerator):
+    """ChassisGenerator which denies RTRV-CFG-FIBER of a port range (AID other than 'all')"""
+
+    def handle_command(self, command):
+        fields = command.strip().rstrip(';').split(':')
+        if fields[0].lower() == 'rtrv-cfg-fiber' and fields[2].lower() != 'all':
+            return self.render_deny(fields[3])
+
+        return ChassisGenerator.handle_command(self, command)
+
+
+class PartialChassisGenerator(ChassisGenerator):
+    """ChassisGenerator which applies only the first cross-connect of a coalesced ent-crs-fiber and answers PRTL"""
+
+    def __init__(self, size, **kwargs):
+        ChassisGenerator.__init__(self, size, **kwargs)
+        self.commands = list()
+
+    def handle_command(self, command):
+        self.commands.append(command.rsplit(':', 1)[0])
+        fields = command.strip().rstrip(';').split(':')
+        if fields[0].lower() == 'ent-crs-fiber' and '&' in fields[2]:
+            src_aid, dst_aid = fields[2].split(',')
+            self.connect([int(src_aid.split('&')[0])], [int(dst_aid.split('&')[0])])
+            return self._render(fields[3], list(), 'PRTL')
+
+        return ChassisGenerator.handle_command(self, command)
+
+
+class BrokenSession(GeneratedSession):
+    """GeneratedSession which fails its next command after break_session() until it is connected again"""
+
+    def __init__(self, chassis_generator):
+        GeneratedSession.__init__(self, chassis_generator)
+        self.broken = False
+        self.connect_count = 0
+
+    def break_session(self):
+        self.broken = True
+
+    def connect(self, host, username, password, port=None):
+        self.broken = False
+        self.connect_count += 1
+
+    def disconnect(self):
+        self.broken = True
+
+    def send_command(self, data_str=None, re_string=None, timeout=None, **kwargs):
+        if self.broken:
+            raise Exception(self.__class__.__name__, "Broken pipe")
+
+        return GeneratedSession.send_command(self, data_str, re_string, timeout)
+
+
+class RecordingSession(GeneratedSession):
+    """GeneratedSession which keeps the verbs of the commands sent over it"""
+
+    def __init__(self, chassis_generator):
+        GeneratedSession.__init__(self, chassis_generator)
+        self.verbs = list()
+
+    def send_command(self, data_str=None, re_string=None, timeout=None, **kwargs):
+        self.verbs.append(data_str.split(':', 1)[0].lower())
+        return GeneratedSession.send_command(self, data_str, re_string, timeout)
+
+
+
+class EventSession(RecordingSession):
+    """RecordingSession which passes autonomous messages of the chassis to the autonomous handler"""
+
+    def __init__(self, chassis_generator):
+        RecordingSession.__init__(self, chassis_generator)
+        self.listening = True
+
+    def set_autonomous_handler(self, autonomous_handler):
+        self._chassis_generator.event_listeners.append(autonomous_handler)
+
+    def is_listening(self):
+        return self.listening
+
+
+class FailingSession(GeneratedSession):
+    """GeneratedSession which raises on the commands starting with 'failing_prefix', like a timeout would
+
+    With 'applied' the chassis gets the command before the timeout.
+    """
+
+    def __init__(self, chassis_generator, failing_prefix, applied=False):
+        GeneratedSession.__init__(self, chassis_generator)
+        self.failing_prefix = failing_prefix
+        self.applied = applied
+
+    def send_command(self, data_str=None, re_string=None, timeout=None, **kwargs):
+        if data_str.startswith(self.failing_prefix):
+            if self.applied:
+                GeneratedSession.send_command(self, data_str, re_string, timeout)
+            raise Exception(self.__class__.__name__, "Timeout")
+
+        return GeneratedSession.send_command(self, data_str, re_string, timeout)
+
+
+class GeneratedDriverHandler(GlimmerglassDriverHandler):
+    """Driver handler over a GeneratedSession, settings which could change the tested behaviour are fixed"""
+
+    def __init__(self, chassis_generator, port_mode='logical', custom_port_pairing=None):
+        GlimmerglassDriverHandler.__init__(self)
+
+        self._session = GeneratedSession(chassis_generator)
+        self._streaming = False
+        self._pipelining = False
+        self._concurrent = False
+        self._event_tracking = False
+        self._service_mode = "tl1"
+        self._port_logical_mode = port_mode
+        self._custom_port_pairing = custom_port_pairing or dict()
+        self._topology_cache_ttl = 0
+        self._topology_store = None
+        self._session_pool = None
+        self._retrieval_pool = None
+        self._incremental_autoload = False
+        self._verify_mappings = False
+        self._mapping_prevalidation = False
+        self._keepalive_interval = 0
+        self._xml_writer = None
+        self.login(ADDRESS, 'admin', 'password')
+
+
+class TestAutoload(unittest.TestCase):
+    def test_logical(self):
+        generator = ChassisGenerator(8, seed=1)
+        handler = GeneratedDriverHandler(generator)
+        handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(handler._mapping_info, dict(('{0}-{0}'.format(dst % 10000), '{0}-{0}'.format(src % 10000))
+                                                     for src, dst in generator.connections.iteritems()))
+
+    def test_physical(self):
+        generator = ChassisGenerator(8, seed=1)
+        handler = GeneratedDriverHandler(generator, 'physical')
+        handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(handler._mapping_info, dict((str(src), str(dst))
+                                                     for src, dst in generator.connections.iteritems()))
+
+    def test_denied_retrieval(self):
+        """A denied retrieval fails the autoload instead of giving (and caching) an empty snapshot"""
+        for verb in ('rtrv-system-info', 'rtrv-cfg-fiber', 'rtrv-crs-fiber'):
+            handler = GeneratedDriverHandler(DenyingChassisGenerator(8, [verb], seed=1))
+            handler._topology_cache_ttl = 60
+
+            self.assertRaises(Exception, handler.get_resource_description, ADDRESS)
+            self.assertIsNone(handler._topology)
+
+
+
+class TestIncrementalAutoload(unittest.TestCase):
+    def setUp(self):
+        self.generator = ChassisGenerator(8, density=0, seed=1)
+        self.handler = GeneratedDriverHandler(self.generator)
+        self.handler._incremental_autoload = True
+        self.handler._session = RecordingSession(self.generator)
+        self.handler.get_resource_description(ADDRESS)
+
+    def test_unchanged_fingerprint(self):
+        """Chassis and port resources are reused, only the resource of a changed mapping is replaced"""
+        resource_info = self.handler._resource_info
+        port_resources = dict(self.handler._port_resources)
+        self.generator.connect([10001], [20002])
+        self.handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(self.handler._session.verbs[3:], ['rtrv-system-info', 'rtrv-crs-fiber'])
+        self.assertIs(self.handler._resource_info, resource_info)
+        self.assertEqual([port_index for port_index in port_resources
+                          if self.handler._port_resources[port_index] is not port_resources[port_index]], ['2-2'])
+        self.assertEqual(self.handler._port_resources['2-2'][0], '1-1')
+
+    def test_changed_fingerprint(self):
+        """A changed port list rebuilds chassis and port resources"""
+        resource_info = self.handler._resource_info
+        port_resources = dict(self.handler._port_resources)
+        self.handler._incremental_autoload = False
+        self.generator.set_port_health(10003, 'bad')
+        self.handler.get_resource_description(ADDRESS)
+
+        self.assertIsNot(self.handler._resource_info, resource_info)
+        self.assertTrue(all(self.handler._port_resources[port_index] is not port_resources[port_index]
+                            for port_index in port_resources))
+        self.assertEqual(dict(self.handler._iter_ports())['3-3'], 'Disable')
+
+
+class TestRelogin(unittest.TestCase):
+    def test_retrieval_after_dead_session(self):
+        """A retrieval over a session closed behind the handler's back logs in again and succeeds"""
+        generator = ChassisGenerator(8, seed=1)
+        handler = GeneratedDriverHandler(generator)
+        handler._session = BrokenSession(generator)
+        handler.get_resource_description(ADDRESS)
+
+        handler._session.break_session()
+        handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(handler._session.connect_count, 1)
+        self.assertEqual(handler._topology.connections, generator.connections)
+
+    def test_mapping_is_not_resent(self):
+        generator = ChassisGenerator(8, seed=1)
+        handler = GeneratedDriverHandler(generator)
+        handler._session = BrokenSession(generator)
+        handler.get_resource_description(ADDRESS)
+
+        handler._session.break_session()
+        self.assertRaises(Exception, handler.map_clear_to, [ADDRESS, '1-1'], [ADDRESS, '1-1'])
+        self.assertEqual(handler._session.connect_count, 0)
+
+        handler.map_clear_to([ADDRESS, '1-1'], [ADDRESS, '1-1'])
+        self.assertEqual(handler._session.connect_count, 1)
+
+
+    def _run_keepalive(self, handler, condition):
+        """Run the keepalive thread of 'handler' till condition() is true"""
+        handler._keepalive_interval = 0.01
+        handler._login_backoff = 0.01
+        handler._last_activity = 0
+        handler._start_keepalive()
+        deadline = time.time() + 5
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+
+        handler.close()
+        handler._keepalive_thread.join(5)
+
+    def test_keepalive(self):
+        """An idle session gets the keepalive command"""
+        generator = ChassisGenerator(8, seed=1)
+        handler = GeneratedDriverHandler(generator)
+        handler._session = RecordingSession(generator)
+        self._run_keepalive(handler, lambda: handler._session.verbs)
+
+        self.assertEqual(handler._session.verbs[0], 'rtrv-hdr')
+
+    def test_keepalive_relogin(self):
+        """A session found dead by the keepalive command is logged in again in the background"""
+        generator = ChassisGenerator(8, seed=1)
+        handler = GeneratedDriverHandler(generator)
+        handler._session = BrokenSession(generator)
+        handler._session.break_session()
+        self._run_keepalive(handler, lambda: handler._session.connect_count)
+
+        self.assertEqual(handler._session.connect_count, 1)
+
+
+class TestEventTracking(unittest.TestCase):
+    def setUp(self):
+        self.generator = ChassisGenerator(8, density=0, seed=1)
+        self.handler = GeneratedDriverHandler(self.generator)
+        self.handler._session = EventSession(self.generator)
+        self.handler._event_tracking = True
+        self.handler._session.set_autonomous_handler(self.handler._handle_autonomous_message)
+        self.handler._relogin()
+        self.handler.get_resource_description(ADDRESS)
+
+    def test_changes_are_applied(self):
+        """Changes reported by the switch keep the snapshot current, it is not retrieved again"""
+        verbs = list(self.handler._session.verbs)
+        self.generator.connect([10001, 10004], [20002, 20005])
+        self.generator.disconnect([10004])
+        self.generator.set_port_health(20003, 'bad')
+        self.handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(self.handler._session.verbs, verbs)
+        self.assertEqual(self.handler._topology.connections, {10001: 20002})
+        self.assertEqual(self.handler._topology.ports[20003].health, 'bad')
+        self.assertEqual(self.handler._mapping_info, {'2-2': '1-1'})
+        self.assertEqual(dict(self.handler._iter_ports())['3-3'], 'Disable')
+
+    def test_not_listening_session(self):
+        """A snapshot is not tracked while the session does not receive autonomous messages"""
+        self.handler._session.listening = False
+        self.handler._session.verbs = list()
+        self.handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(self.handler._session.verbs, ['rtrv-system-info', 'rtrv-cfg-fiber', 'rtrv-crs-fiber'])
+
+
+class TestMappingPrevalidation(unittest.TestCase):
+    def setUp(self):
+        self.generator = ChassisGenerator(8, seed=1)
+        self.generator.connections = {10001: 20002}
+        self.generator.bad_ports = set([10003])
+        self.handler = GeneratedDriverHandler(self.generator)
+        self.handler._mapping_prevalidation = True
+        self.handler._topology_cache_ttl = 60
+        self.handler.get_resource_description(ADDRESS)
+
+    def ent_count(self):
+        return sum(stat['count'] for stat in self.handler.get_stats()
+                   if stat['command'] == 'ent-crs-fiber' and stat['phase'] == 'round_trip')
+
+    def test_rejected_without_sending(self):
+        self.assertRaises(Exception, self.handler.map_uni, [ADDRESS, '4-4'], [ADDRESS, '2-2'])
+        self.assertRaises(Exception, self.handler.map_uni, [ADDRESS, '3-3'], [ADDRESS, '5-5'])
+        self.assertEqual(self.ent_count(), 0)
+
+        self.handler.map_uni([ADDRESS, '4-4'], [ADDRESS, '5-5'])
+        self.assertEqual(self.ent_count(), 1)
+        self.assertEqual(self.generator.connections[10004], 20005)
+        self.assertRaises(Exception, self.handler.map_uni, [ADDRESS, '6-6'], [ADDRESS, '5-5'])
+
+    def test_force(self):
+        self.handler.map_uni([ADDRESS, '3-3'], [ADDRESS, '5-5'], force=True)
+        with forced_mappings():
+            self.handler.map_uni([ADDRESS, '3-3'], [ADDRESS, '6-6'])
+
+        self.assertEqual(self.ent_count(), 2)
+
+    def test_expired_snapshot(self):
+        """An expired snapshot is not trusted, the switch decides"""
+        self.handler._topology_cache_ttl = 0
+        self.generator.connections = dict()
+        self.handler.map_uni([ADDRESS, '4-4'], [ADDRESS, '2-2'])
+
+        self.assertEqual(self.generator.connections, {10004: 20002})
+
+    def test_fed_out_port_is_denied(self):
+        """The switch model agrees with the check: an OUT port fed by another IN port has to be cleared first"""
+        self.assertFalse(self.generator.connect([10004], [20002]))
+        self.assertTrue(self.generator.connect([10001], [20002]))
+
+
+class TestMapping(unittest.TestCase):
+    def setUp(self):
+        self.generator = ChassisGenerator(8, density=0, seed=1)
+        self.handler = GeneratedDriverHandler(self.generator)
+        self.handler._topology_cache_ttl = 60
+        self.handler.get_resource_description(ADDRESS)
+        self.handler._session = RecordingSession(self.generator)
+
+    def test_map_and_clear(self):
+        """Completed mappings change the snapshot without retrieving it again"""
+        self.handler.map_bidi([ADDRESS, '1-1'], [ADDRESS, '2-2'])
+        self.handler.map_uni([ADDRESS, '3-3'], [ADDRESS, '4-4'])
+        self.handler.map_clear_to([ADDRESS, '3-3'], [ADDRESS, '4-4'])
+        self.handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(self.generator.connections, {10001: 20002, 10002: 20001})
+        self.assertEqual(self.handler._topology.connections, self.generator.connections)
+        self.assertEqual(self.handler._mapping_info, {'2-2': '1-1', '1-1': '2-2'})
+        self.assertEqual(self.handler._session.verbs, ['ent-crs-fiber', 'ent-crs-fiber', 'dlt-crs-fiber'])
+
+        self.handler.map_clear([ADDRESS, '1-1'], [ADDRESS, '2-2'])
+        self.assertEqual(self.generator.connections, dict())
+        self.assertEqual(self.handler._topology.connections, dict())
+
+    def test_denied_mapping(self):
+        """A denied mapping does not change the snapshot, with 'verify_mappings' it fails the request"""
+        self.generator.connections = {10005: 20004}
+        self.handler.map_uni([ADDRESS, '3-3'], [ADDRESS, '4-4'])
+        self.assertEqual(self.handler._topology.connections, dict())
+
+        self.handler._verify_mappings = True
+        self.assertRaises(Exception, self.handler.map_uni, [ADDRESS, '3-3'], [ADDRESS, '4-4'])
+        # verification retrieved the actual cross-connects of the port
+        self.assertEqual(self.handler._session.verbs[-1], 'rtrv-crs-fiber')
+
+
+    def test_failed_mapping_drops_snapshot(self):
+        """The switch could have applied a mapping which timed out, the snapshot is not served any more"""
+        self.handler._session = FailingSession(self.generator, 'ent-crs-fiber', applied=True)
+        self.assertRaises(Exception, self.handler.map_uni, [ADDRESS, '1-1'], [ADDRESS, '2-2'])
+        self.assertIsNone(self.handler._topology)
+
+        self.handler._session = GeneratedSession(self.generator)
+        self.handler.get_resource_description(ADDRESS)
+        self.assertEqual(self.handler._mapping_info, {'2-2': '1-1'})
+
+
+class TestReconcile(unittest.TestCase):
+    def setUp(self):
+        self.generator = ChassisGenerator(8, density=0, seed=1)
+        self.generator.connections = {10001: 20002, 10003: 20004, 10005: 20006}
+
+    def reconcile(self, generator, mapping_list):
+        handler = GeneratedDriverHandler(generator)
+        handler._session = RecordingSession(generator)
+        return handler.reconcile(ADDRESS, mapping_list), handler._session.verbs
+
+    def test_reconcile(self):
+        """Mappings in place are left untouched, a moved IN port is not disconnected first"""
+        (mapping_results, removal_results), verbs = self.reconcile(self.generator, [
+            ('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+            ('uni', [ADDRESS, '3-3'], [ADDRESS, '5-5']),
+            ('bidi', [ADDRESS, '7-7'], [ADDRESS, '8-8'])])
+
+        self.assertEqual(mapping_results, [(True, '')] * 3)
+        self.assertEqual(removal_results, [('10005', True, '')])
+        self.assertEqual(self.generator.connections, {10001: 20002, 10003: 20005, 10007: 20008, 10008: 20007})
+        self.assertEqual(verbs, ['rtrv-cfg-fiber', 'rtrv-crs-fiber', 'dlt-crs-fiber', 'ent-crs-fiber'])
+
+    def test_out_port_swap(self):
+        """An IN port feeding an OUT port desired by another IN port is disconnected before the cross-connects"""
+        self.generator.connections = {10001: 20002}
+        (mapping_results, removal_results), verbs = self.reconcile(self.generator, [
+            ('uni', [ADDRESS, '4-4'], [ADDRESS, '2-2']),
+            ('uni', [ADDRESS, '1-1'], [ADDRESS, '3-3'])])
+
+        self.assertEqual(mapping_results, [(True, '')] * 2)
+        self.assertEqual(removal_results, list())
+        self.assertEqual(self.generator.connections, {10001: 20003, 10004: 20002})
+        self.assertEqual(verbs, ['rtrv-cfg-fiber', 'rtrv-crs-fiber', 'dlt-crs-fiber', 'ent-crs-fiber'])
+
+    def test_invalid_mappings(self):
+        (mapping_results, removal_results), verbs = self.reconcile(self.generator, [
+            ('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+            ('uni', [ADDRESS, '3-3'], [ADDRESS, '2-2']),
+            ('uni', ['192.168.1.2', '4-4'], ['192.168.1.2', '6-6'])])
+
+        self.assertEqual(mapping_results[0], (True, ''))
+        self.assertFalse(mapping_results[1][0])
+        self.assertFalse(mapping_results[2][0])
+        self.assertEqual(self.generator.connections, {10001: 20002})
+
+    def test_denied_removal(self):
+        generator = DenyingChassisGenerator(8, ['dlt-crs-fiber'], density=0, seed=1)
+        generator.connections = dict(self.generator.connections)
+        (mapping_results, removal_results), verbs = self.reconcile(generator, [
+            ('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2'])])
+
+        self.assertEqual(mapping_results, [(True, '')])
+        self.assertEqual([(port, success) for port, success, error in removal_results],
+                         [('10003', False), ('10005', False)])
+        # the coalesced command is denied, every port is tried on its own
+        self.assertEqual(verbs, ['rtrv-cfg-fiber', 'rtrv-crs-fiber'] + ['dlt-crs-fiber'] * 3)
+
+
+class TestMapBatch(unittest.TestCase):
+    def setUp(self):
+        self.generator = ChassisGenerator(8, density=0, seed=1)
+        self.handler = GeneratedDriverHandler(self.generator)
+
+    def test_request_order(self):
+        """A mapping and a later clear of its port end with the port cleared, and the other way round"""
+        results = self.handler.map_batch([('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+                                          ('clearto', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+                                          ('clearto', [ADDRESS, '3-3'], [ADDRESS, '4-4']),
+                                          ('uni', [ADDRESS, '3-3'], [ADDRESS, '4-4'])])
+
+        self.assertEqual(results, [(True, '')] * 4)
+        self.assertEqual(self.generator.connections, {10003: 20004})
+
+    def test_same_port_is_not_coalesced(self):
+        self.handler.map_batch([('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+                                ('uni', [ADDRESS, '1-1'], [ADDRESS, '3-3'])])
+
+        self.assertEqual(self.generator.connections, {10001: 20003})
+
+    def test_denied_command(self):
+        """Items of a denied command are sent one by one, only the failing mapping fails"""
+        results = self.handler.map_batch([('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+                                          ('uni', [ADDRESS, '3-3'], [ADDRESS, '9-9'])])
+
+        self.assertEqual(results[0], (True, ''))
+        self.assertFalse(results[1][0])
+        self.assertEqual(self.generator.connections, {10001: 20002})
+
+    def test_denied_item_keeps_order(self):
+        """Items of a denied command are finished before a later mapping of the same port is sent"""
+        self.generator.connections = {10006: 20005}
+        results = self.handler.map_batch([('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+                                          ('uni', [ADDRESS, '4-4'], [ADDRESS, '5-5']),
+                                          ('uni', [ADDRESS, '1-1'], [ADDRESS, '3-3'])])
+
+        self.assertEqual([success for success, error in results], [True, False, True])
+        self.assertEqual(self.generator.connections, {10001: 20003, 10006: 20005})
+
+    def test_send_error(self):
+        """A command which could not be sent fails its mappings and the later ones, not the whole batch"""
+        self.handler._session = FailingSession(self.generator, 'ent-crs-fiber::10004')
+        results = self.handler.map_batch([('uni', [ADDRESS, '1-1'], [ADDRESS, '2-2']),
+                                          ('clearto', [ADDRESS, '3-3'], [ADDRESS, '3-3']),
+                                          ('uni', [ADDRESS, '4-4'], [ADDRESS, '5-5']),
+                                          ('uni', [ADDRESS, '6-6'], [ADDRESS, '7-7'])])
+
+        self.assertEqual([success for success, error in results], [True, True, False, False])
+        self.assertEqual(results[2][1], 'Mapping command failed: Timeout')
+        self.assertEqual(self.generator.connections, {10001: 20002})
+
+    def test_partial_command(self):
+        """Items applied by a partially completed command are not sent again"""
+        generator = PartialChassisGenerator(8, density=0, seed=1)
+        handler = GeneratedDriverHandler(generator)
+        handler._verify_mappings = True
+        results = handler.map_batch([('uni', [ADDRESS, '{0}-{0}'.format(port)], [ADDRESS, '{0}-{0}'.format(port + 1)])
+                                     for port in (1, 3, 5)])
+
+        self.assertEqual(results, [(True, '')] * 3)
+        self.assertEqual(generator.connections, {10001: 20002, 10003: 20004, 10005: 20006})
+        self.assertEqual([command for command in generator.commands if command.startswith('ent-crs-fiber')],
+                         ['ent-crs-fiber::10001&10003&10005,20002&20004&20006',
+                          'ent-crs-fiber::10003,20004', 'ent-crs-fiber::10005,20006'])
+
+
+class TestShardedRetrieval(unittest.TestCase):
+    def create_handler(self, generator):
+        handler = GeneratedDriverHandler(generator, 'physical')
+        handler._shard_port_count = 4
+        handler._session_pool = SessionPool(lambda: GeneratedSession(generator), handler._authenticate_pool_session,
+                                            2)
+        return handler
+
+    def test_shards(self):
+        generator = ChassisGenerator(10, bad_ratio=0.2, seed=2)
+        handler = self.create_handler(generator)
+        handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(sorted(handler._topology.ports), sorted(generator.iter_port_ids()))
+        self.assertEqual(handler._topology.connections, generator.connections)
+        self.assertEqual([stat['count'] for stat in handler.get_stats() if stat['command'] == 'rtrv-cfg-fiber'
+                          and stat['phase'] == 'round_trip'], [3])
+
+    def test_denied_shard(self):
+        """A denied shard is not merged as an empty one, the chassis is retrieved with 'all' instead"""
+        generator = RangeDenyingChassisGenerator(10, seed=2)
+        handler = self.create_handler(generator)
+        handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(sorted(handler._topology.ports), sorted(generator.iter_port_ids()))
+        self.assertEqual(handler._topology.connections, generator.connections)
+        self.assertEqual([stat['count'] for stat in handler.get_stats() if stat['phase'] == 'fallback'], [1])
+
+
+class TestRetrievalSession(unittest.TestCase):
+    """A concurrent handler sends retrievals over a session of their own, mappings are not received after them"""
+
+    def create_handler(self, generator, create_session):
+        handler = GeneratedDriverHandler(generator)
+        handler._session = RecordingSession(generator)
+        handler._concurrent = True
+        handler._retrieval_pool = SessionPool(create_session, handler._authenticate_pool_session, 1)
+        return handler
+
+    def test_retrieval_session(self):
+        generator = ChassisGenerator(8, seed=1)
+        generator.connections = dict()
+        retrieval_session = RecordingSession(generator)
+        handler = self.create_handler(generator, lambda: retrieval_session)
+        handler.get_resource_description(ADDRESS)
+        handler.map_uni([ADDRESS, '1-1'], [ADDRESS, '2-2'])
+
+        self.assertEqual(handler._session.verbs, ['ent-crs-fiber'])
+        self.assertEqual(retrieval_session.verbs, ['act-user', 'rtrv-system-info', 'rtrv-cfg-fiber', 'rtrv-crs-fiber'])
+        self.assertEqual(generator.connections, {10001: 20002})
+
+    def test_fallback(self):
+        """The handler session is used if the retrieval session can't be opened"""
+        generator = ChassisGenerator(8, seed=1)
+        handler = self.create_handler(generator, lambda: GeneratedSession(
+            DenyingChassisGenerator(8, ['act-user'])))
+        handler.get_resource_description(ADDRESS)
+
+        self.assertEqual(handler._topology.connections, generator.connections)
+        self.assertIn('rtrv-cfg-fiber', handler._session.verbs)
+        self.assertEqual([stat['count'] for stat in handler.get_stats() if stat['phase'] == 'fallback'], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
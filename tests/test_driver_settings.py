@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from glimmerglass import driver_settings
+from glimmerglass.driver_settings import DriverSettings
+
+
+class FakeConfigurationParser(object):
+    driver_variable = dict()
+
+    @classmethod
+    def get(cls, section, key):
+        return cls.driver_variable.get(key)
+
+
+class TestDriverSettings(unittest.TestCase):
+    def setUp(self):
+        self._configuration_parser = driver_settings.ConfigurationParser
+        driver_settings.ConfigurationParser = FakeConfigurationParser
+
+    def tearDown(self):
+        driver_settings.ConfigurationParser = self._configuration_parser
+
+    def load(self, **driver_variable):
+        FakeConfigurationParser.driver_variable = driver_variable
+        return DriverSettings()
+
+    def test_defaults(self):
+        settings = self.load(login_retries=None, topology_store='')
+
+        self.assertEqual(settings.login_retries, 1)
+        self.assertEqual(settings.topology_store, '')
+        self.assertEqual(settings.batch_max_size, 64)
+        self.assertEqual(settings.session_timeout, 60)
+
+    def test_explicit_zero_is_kept(self):
+        settings = self.load(login_retries=0, login_backoff=0, topology_store_max_age=0, keepalive_interval=0)
+
+        self.assertEqual((settings.login_retries, settings.login_backoff, settings.topology_store_max_age,
+                          settings.keepalive_interval), (0, 0, 0, 0))
+
+    def test_wrong_values(self):
+        for driver_variable in ({'batch_max_size': 0}, {'session_timeout': 0}, {'login_retries': -1},
+                                {'login_retries': '2'}, {'port_mode': 'virtual'},
+                                {'custom_port_pairing': {'1': 'OUT2'}}):
+            self.assertRaises(Exception, self.load, **driver_variable)
+
+
+if __name__ == '__main__':
+    unittest.main()
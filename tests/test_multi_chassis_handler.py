@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from common.configuration_parser import ConfigurationParser
+from glimmerglass.chassis_generator import ChassisGenerator
+from glimmerglass.glimmerglass_multi_chassis_handler import GlimmerglassMultiChassisHandler
+from tests.test_driver_handler import BrokenSession, GeneratedDriverHandler
+
+ADDRESS_A = '192.168.1.1'
+ADDRESS_B = '192.168.1.2'
+
+
+def setUpModule():
+    ConfigurationParser.set_root_folder(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ConfigurationParser.init()
+
+
+class GeneratedMultiChassisHandler(GlimmerglassMultiChassisHandler):
+    """Multi chassis handler with one session kept, chassis are ChassisGenerators, a closed session is broken"""
+
+    def __init__(self, generators):
+        GlimmerglassMultiChassisHandler.__init__(self)
+        self._generators = generators
+        self._max_sessions = 1
+        self.evict_address = None
+
+    def _create_handler(self, address):
+        handler = GeneratedDriverHandler(self._generators[address])
+        handler._session = BrokenSession(self._generators[address])
+        return handler
+
+    def _get_handler(self, address, command_logger=None):
+        """Once 'evict_address' is set, the returned handler is evicted by a request for it before it is used"""
+        result = GlimmerglassMultiChassisHandler._get_handler(self, address, command_logger)
+        if self.evict_address is not None:
+            evict_address, self.evict_address = self.evict_address, None
+            GlimmerglassMultiChassisHandler._get_handler(self, evict_address, command_logger)
+
+        return result
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.generators = {ADDRESS_A: ChassisGenerator(4, density=0, seed=1),
+                           ADDRESS_B: ChassisGenerator(4, density=0, seed=2)}
+        self.handler = GeneratedMultiChassisHandler(self.generators)
+        self.handler.login(ADDRESS_A, 'admin', 'password')
+        self.handler.login(ADDRESS_B, 'admin', 'password')
+
+    def test_evicted_handler_logs_in_again(self):
+        self.handler.map_uni([ADDRESS_A, '1-1'], [ADDRESS_A, '2-2'])
+        self.handler.map_uni([ADDRESS_B, '1-1'], [ADDRESS_B, '3-3'])
+
+        self.assertEqual(self.generators[ADDRESS_A].connections, {10001: 20002})
+        self.assertEqual(self.generators[ADDRESS_B].connections, {10001: 20003})
+        self.assertEqual(list(self.handler._handlers), [ADDRESS_B])
+
+    def test_eviction_before_the_lane_is_taken(self):
+        """A handler closed between _get_handler and its lane lock is not used, the request logs in again"""
+        self.handler.map_uni([ADDRESS_A, '1-1'], [ADDRESS_A, '2-2'])
+        self.handler.evict_address = ADDRESS_B
+        self.handler.map_uni([ADDRESS_A, '3-3'], [ADDRESS_A, '4-4'])
+        self.handler.evict_address = ADDRESS_A
+        results = self.handler.map_batch([('uni', [ADDRESS_B, '2-2'], [ADDRESS_B, '2-2'])])
+
+        self.assertEqual(self.generators[ADDRESS_A].connections, {10001: 20002, 10003: 20004})
+        self.assertEqual(results, [(True, '')])
+        self.assertEqual(self.generators[ADDRESS_B].connections, {10002: 20002})
+
+
+if __name__ == '__main__':
+    unittest.main()
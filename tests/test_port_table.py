@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from glimmerglass.port_table import PortTable
+from glimmerglass.tl1_parser import PortRecord
+
+
+def port_list(*ports):
+    """PortRecord list of (PORTID, PORTNAME, health)"""
+    return [PortRecord(port_id, name, name.rstrip('0123456789'), name.lstrip('INOUT'), health)
+            for port_id, name, health in ports]
+
+
+class TestPortTable(unittest.TestCase):
+    def setUp(self):
+        self.ports = port_list((10001, 'IN1', 'good'), (10002, 'IN2', 'good'), (10003, 'IN3', 'bad'),
+                               (20001, 'OUT1', 'good'), (20002, 'OUT2', 'good'), (20003, 'OUT3', 'good'))
+
+    def test_logical(self):
+        table = PortTable.from_port_list(self.ports)
+        table.set_connections({10001: 20002})
+
+        self.assertEqual(list(table.iter_logical_ports()), [('1-1', 'Enable'), ('2-2', 'Enable'), ('3-3', 'Disable')])
+        self.assertEqual(table.get_logical_mappings(), {'2-2': '1-1'})
+
+    def test_custom_pairing(self):
+        table = PortTable.from_port_list(self.ports, {'1': '3', '3': '1'})
+        table.set_connections({10002: 20003})
+
+        self.assertEqual([index for index, state in table.iter_logical_ports()], ['1-3', '2-2', '3-1'])
+        self.assertEqual(table.get_logical_mappings(), {'1-3': '2-2'})
+
+    def test_physical(self):
+        table = PortTable.from_port_list(self.ports)
+        table.set_connections({10001: 20002})
+
+        self.assertEqual(list(table.iter_physical_ports())[:3], [('10001', 'Enable'), ('10002', 'Enable'),
+                                                                 ('10003', 'Disable')])
+        self.assertEqual(table.get_physical_mappings(), {'10001': '20002'})
+
+    def test_renamed_port(self):
+        """Physical ports and cross-connects are identified by PORTID, PORTNAME names only the logical port"""
+        table = PortTable.from_port_list(port_list((10001, 'IN7', 'good'), (10002, 'IN2', 'good'),
+                                                   (20002, 'OUT2', 'good'), (20007, 'OUT7', 'good')))
+        table.set_connections({10001: 20002})
+
+        self.assertEqual([index for index, state in table.iter_physical_ports()], ['10001', '10002', '20002', '20007'])
+        self.assertEqual(table.get_physical_mappings(), {'10001': '20002'})
+        self.assertEqual(table.get_logical_mappings(), {'2-2': '7-7'})
+
+    def test_translation(self):
+        """Ports of a mapping request are translated to the PORTID of the named ports"""
+        table = PortTable.from_port_list(port_list((10001, 'IN7', 'good'), (10002, 'IN2', 'good'),
+                                                   (20002, 'OUT2', 'good'), (20007, 'OUT7', 'good')))
+
+        self.assertEqual(table.logical_ports, {'7-7': ('10001', '20007'), '2-2': ('10002', '20002')})
+        self.assertEqual(sorted(table.physical_ports), ['10001', '10002', '20002', '20007'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from xml.etree import ElementTree
+
+from common.configuration_parser import ConfigurationParser
+from common.xml_wrapper import XMLWrapper
+from glimmerglass.chassis_generator import ChassisGenerator
+from glimmerglass.resource_xml_writer import ResourceXMLWriter
+from tests.test_driver_handler import ADDRESS, GeneratedDriverHandler
+
+
+def setUpModule():
+    ConfigurationParser.set_root_folder(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ConfigurationParser.init()
+
+
+def canonical(node):
+    """Comparable form of an XML node: attribute and child order, whitespace and namespaces are not significant"""
+    element = ElementTree.fromstring(XMLWrapper.get_string_from_xml(node))
+    return _canonical(element)
+
+
+def _canonical(element):
+    return (element.tag.split('}')[-1], sorted(element.attrib.items()), (element.text or '').strip(),
+            sorted(_canonical(child) for child in element))
+
+
+class TestResourceXMLWriter(unittest.TestCase):
+    """The writer gives the same description as the ResourceInfo tree, also for a second autoload"""
+
+    def check(self, port_mode, custom_port_pairing=None):
+        generator = ChassisGenerator(8, bad_ratio=0.25, seed=4)
+        tree_handler = GeneratedDriverHandler(generator, port_mode, custom_port_pairing)
+        writer_handler = GeneratedDriverHandler(generator, port_mode, custom_port_pairing)
+        writer_handler._xml_writer = ResourceXMLWriter()
+
+        for connections in (dict(generator.connections), {10001: 20003, 10003: 20001}):
+            generator.connections = connections
+            self.assertEqual(canonical(writer_handler.get_resource_description(ADDRESS)),
+                             canonical(tree_handler.get_resource_description(ADDRESS)))
+
+    def test_logical(self):
+        self.check('logical')
+
+    def test_physical(self):
+        self.check('physical')
+
+    def test_custom_pairing(self):
+        self.check('logical', {'1': '3', '3': '1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
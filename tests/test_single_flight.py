@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+
+from glimmerglass.single_flight import SingleFlight
+
+
+class CountingEvent(threading._Event):
+    """Event which counts the threads waiting for it"""
+
+    def __init__(self):
+        threading._Event.__init__(self)
+        self.waiters = 0
+
+    def wait(self, timeout=None):
+        self.waiters += 1
+        return threading._Event.wait(self, timeout)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def blocking_call(self, result):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _do_in_threads(self, result, follower_count):
+        """Run one call with 'follower_count' callers waiting for it, return the outcome of every caller"""
+        outcome_list = [None] * (follower_count + 1)
+
+        def do(index):
+            try:
+                outcome_list[index] = self.flight.do('192.168.1.1', self.blocking_call, result)
+            except Exception as error:
+                outcome_list[index] = error
+
+        thread_list = [threading.Thread(target=do, args=(0,))]
+        thread_list[0].start()
+        self.started.wait(5)
+        done = CountingEvent()
+        self.flight._calls['192.168.1.1'].done = done
+
+        thread_list += [threading.Thread(target=do, args=(index,)) for index in range(1, follower_count + 1)]
+        for thread in thread_list[1:]:
+            thread.start()
+        deadline = time.time() + 5
+        while done.waiters < follower_count and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.release.set()
+        for thread in thread_list:
+            thread.join(5)
+        return outcome_list
+
+    def test_shared_result(self):
+        result = ['resource']
+        outcome_list = self._do_in_threads(result, 3)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(outcome_list, [(result, False)] + [(result, True)] * 3)
+        # waiting callers get a copy
+        self.assertTrue(all(shared_result is not result for shared_result, shared in outcome_list[1:]))
+
+    def test_shared_error(self):
+        error = Exception('SingleFlightTest', 'Connection refused!')
+        outcome_list = self._do_in_threads(error, 3)
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(outcome is error for outcome in outcome_list))
+
+    def test_key_is_released(self):
+        self._do_in_threads(Exception('SingleFlightTest', 'Connection refused!'), 1)
+        self.assertEqual(self.flight._calls, {})
+
+        self.assertEqual(self.flight.do('192.168.1.1', self.blocking_call, 'resource'), ('resource', False))
+        self.assertEqual(self.flight._calls, {})
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
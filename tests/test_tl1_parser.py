@@ -0,0 +1,104 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from glimmerglass import tl1_parser
+from glimmerglass.chassis_generator import ChassisGenerator
+
+
+def render(records, ctag=5, status='COMPLD'):
+    return '\r\n   BD0472 16-01-01 00:00:00\r\nM  {0} {1}\r\n{2};\r\n'.format(
+        ctag, status, ''.join('   "{0}"\r\n'.format(record) for record in records))
+
+
+CONNECTION_RECORD = 'GGN:IPORTID=10001,IPORTNAME=IN1,IPORTCOMMENT={0},OPORTID=20002,OPORTNAME=OUT2,CONNSTATE=steady'
+
+
+class TestRecords(unittest.TestCase):
+    def test_escaped_quote_in_comment(self):
+        response = render([CONNECTION_RECORD.format(r'\"lab A\"')])
+
+        connection_list = tl1_parser.parse_connections(response)
+
+        self.assertEqual(len(connection_list), 1)
+        self.assertEqual((connection_list[0].src_port, connection_list[0].dst_port), (10001, 20002))
+        self.assertEqual(list(tl1_parser.iter_records(response))[0][1]['IPORTCOMMENT'], r'\"lab A\"')
+
+    def test_continued_blocks(self):
+        """Records of a response split into '>' continued blocks are all parsed, headers are not in the fingerprint"""
+        generator = ChassisGenerator(30, bad_ratio=0.2, seed=1, block_size=7)
+        response = generator.render_port_list(5)
+        self.assertEqual(response.count('>\r\n<'), 8)
+
+        port_list = tl1_parser.parse_port_list(response)
+        self.assertEqual([port_record.port_id for port_record in port_list], list(generator.iter_port_ids()))
+        self.assertEqual(set(port_record.port_id for port_record in port_list if port_record.health == 'bad'),
+                         generator.bad_ports)
+        self.assertEqual(tl1_parser.get_response_status(response), (5, 'COMPLD'))
+
+        generator.block_size = 60
+        self.assertEqual(tl1_parser.get_fingerprint(generator.render_port_list(6)),
+                         tl1_parser.get_fingerprint(response))
+
+    def test_incremental_parser(self):
+        """Records added one by one while receiving give the same result as the complete response"""
+        response = ChassisGenerator(8, seed=1, block_size=3).render_connections(5)
+        parser = tl1_parser.ConnectionParser()
+        for record in tl1_parser.RECORD_PATTERN.findall(response):
+            parser.add_record(record)
+
+        self.assertEqual(parser.result, tl1_parser.parse_connections(response))
+        self.assertEqual(parser.fingerprint, tl1_parser.ConnectionParser().feed_response(response).fingerprint)
+
+
+class TestResponseStatus(unittest.TestCase):
+    def setUp(self):
+        self.messages = list()
+
+    def test_status(self):
+        self.assertEqual(tl1_parser.get_response_status(render([], 12)), (12, 'COMPLD'))
+        self.assertEqual(tl1_parser.get_response_status(render([], 13, 'DENY\r\n   IIAC')), (13, 'DENY'))
+        self.assertEqual(tl1_parser.get_response_status(render([], 14, 'PRTL')), (14, 'PRTL'))
+        self.assertEqual(tl1_parser.get_response_status('Connection closed'), (None, None))
+
+    def test_denied_response_has_no_records(self):
+        response = ChassisGenerator(4).render_deny(7)
+
+        self.assertEqual(tl1_parser.get_response_status(response), (7, 'DENY'))
+        self.assertEqual(tl1_parser.parse_connections(response), list())
+
+    def test_autonomous_message(self):
+        generator = ChassisGenerator(4, density=0)
+        generator.event_listeners.append(self.messages.append)
+        generator.connect([10001], [20002])
+        generator.disconnect([10001])
+        generator.set_port_health(20003, 'bad')
+
+        self.assertTrue(all(tl1_parser.is_autonomous_message(message) for message in self.messages))
+        self.assertFalse(tl1_parser.is_autonomous_message(render([])))
+        self.assertEqual([change for message in self.messages
+                          for change in tl1_parser.parse_autonomous_message(message)],
+                         [('connect', 10001, 20002), ('disconnect', 10001), ('health', 20003, 'bad')])
+
+
+class TestAidList(unittest.TestCase):
+    def test_expand(self):
+        self.assertEqual(tl1_parser.expand_aid_list('10001&&10004&20001'), [10001, 10002, 10003, 10004, 20001])
+        self.assertEqual(tl1_parser.expand_aid_list('10001&10003'), [10001, 10003])
+        self.assertEqual(tl1_parser.expand_aid_list('10002'), [10002])
+        self.assertIsNone(tl1_parser.expand_aid_list('ALL'))
+        self.assertIsNone(tl1_parser.expand_aid_list(''))
+
+    def test_format_range(self):
+        self.assertEqual(tl1_parser.format_aid_range(10001, 10048), '10001&&10048')
+        self.assertEqual(tl1_parser.format_aid_range(10001, 10001), '10001')
+        self.assertEqual(tl1_parser.expand_aid_list(tl1_parser.format_aid_range(20001, 20003)), [20001, 20002, 20003])
+
+    def test_command_ctag(self):
+        self.assertEqual(tl1_parser.get_command_ctag('rtrv-crs-fiber::10001&&10004:17;'), 17)
+        self.assertIsNone(tl1_parser.get_command_ctag('rtrv-hdr:::;'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import threading
+import unittest
+
+from common.configuration_parser import ConfigurationParser
+from glimmerglass.chassis_generator import ChassisGenerator
+from glimmerglass.tl1_parser import ConnectionParser
+from glimmerglass.tl1_session import ConcurrentTL1Session, TL1Session
+from tests.test_tl1_parser import CONNECTION_RECORD, render
+
+
+def setUpModule():
+    ConfigurationParser.set_root_folder(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ConfigurationParser.init()
+
+
+class ScriptedSocket(object):
+    """Socket which returns one of 'chunks' per recv and keeps the data sent to it"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.sent = ''
+
+    def sendall(self, data):
+        self.sent += data
+
+    def recv(self, size):
+        return self.chunks.pop(0) if self.chunks else ''
+
+    def settimeout(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_session(chunks):
+    session = TL1Session()
+    session._socket = ScriptedSocket(chunks)
+    return session
+
+
+class TestSendCommands(unittest.TestCase):
+    def test_responses_out_of_order(self):
+        session = create_session([render([], 2), render([], 1)])
+        response_list = session.send_commands(['rtrv-hdr:::1;', 'rtrv-hdr:::2;'])
+
+        self.assertEqual(response_list, [render([], 1), render([], 2)])
+        self.assertEqual(session._socket.sent, 'rtrv-hdr:::1;\r\nrtrv-hdr:::2;\r\n')
+
+    def test_unknown_ctag_is_dropped(self):
+        """A late response of a timed out command is not taken for the response of the next one"""
+        session = create_session([render(['GGN:late'], 7), render([], 8)])
+
+        self.assertEqual(session.send_command('rtrv-hdr:::8;'), render([], 8))
+
+    def test_autonomous_message(self):
+        message = ChassisGenerator(4).render_event(['GGN:IPORTID=10001,OPORTID=20002'])
+        message_list = list()
+        session = create_session([message, render([], 3)])
+        session.set_autonomous_handler(message_list.append)
+
+        self.assertEqual(session.send_command('rtrv-hdr:::3;'), render([], 3))
+        self.assertEqual(message_list, [message])
+
+    def test_command_without_ctag(self):
+        """A command without numeric ctag takes the first response which does not belong to another command"""
+        session = create_session([render([], 0), render([], 4)])
+        response_list = session.send_commands(['rtrv-hdr:::4;', 'rtrv-hdr:::;'])
+
+        self.assertEqual(response_list, [render([], 4), render([], 0)])
+
+
+
+class TestReadResponse(unittest.TestCase):
+    def test_records_are_passed_to_parser(self):
+        record = CONNECTION_RECORD.format('lab')
+        parser = ConnectionParser()
+        session = create_session([render([record, record.replace('20002', '20003')])])
+
+        response = session.send_command('rtrv-crs-fiber:::5;', record_parser=parser)
+
+        self.assertEqual(response, render([]))
+        self.assertEqual([connection.dst_port for connection in parser.result], [20002, 20003])
+
+    def test_terminator_split_between_reads(self):
+        response = render(['GGN:IPORTID=10001'])
+        session = create_session([response[:-3], response[-3:]])
+
+        self.assertEqual(session.send_command('rtrv-hdr:::5;'), response)
+
+    def test_semicolon_inside_response(self):
+        """Only the end of the received data is checked for the terminator"""
+        response = render(['GGN:IPORTCOMMENT=a;b', 'GGN:IPORTCOMMENT=;'])
+        session = create_session(list(response))
+
+        self.assertEqual(session.send_command('rtrv-hdr:::5;'), response)
+
+    def test_partial_line_is_kept(self):
+        first_response = render([], 1)
+        second_response = render(['GGN:IPORTID=10001'], 2)
+        session = create_session([first_response + second_response[:30], second_response[30:]])
+
+        self.assertEqual(session.send_command('rtrv-hdr:::1;'), first_response)
+        self.assertEqual(session._buffer, second_response[:30].rpartition('\n')[2])
+        self.assertEqual(session.send_command('rtrv-hdr:::2;'), second_response)
+
+
+
+class TestConcurrentSession(unittest.TestCase):
+    """ConcurrentTL1Session connected to a listening socket which plays the device"""
+
+    def setUp(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.session = ConcurrentTL1Session()
+        self.session.connect('127.0.0.1:{0}'.format(server.getsockname()[1]), 'admin', 'password')
+        self.device = server.accept()[0]
+        server.close()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.device.close()
+
+    def _send_in_thread(self, command, **kwargs):
+        """Start send_command in a thread, the thread keeps its response or error in 'result'"""
+        def send():
+            try:
+                thread.result = self.session.send_command(command, **kwargs)
+            except Exception as error:
+                thread.result = error
+
+        thread = threading.Thread(target=send)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _receive_commands(self, count):
+        data = ''
+        while data.count('\r\n') < count:
+            data += self.device.recv(1024)
+        return data.split('\r\n')[:count]
+
+    def test_responses_handed_over_by_ctag(self):
+        first_thread = self._send_in_thread('rtrv-hdr:::1;')
+        second_thread = self._send_in_thread('rtrv-hdr:::2;')
+        self.assertEqual(sorted(self._receive_commands(2)), ['rtrv-hdr:::1;', 'rtrv-hdr:::2;'])
+
+        self.device.sendall(render([], 2) + render([], 1))
+        first_thread.join(5)
+        second_thread.join(5)
+
+        self.assertEqual(first_thread.result, render([], 1))
+        self.assertEqual(second_thread.result, render([], 2))
+        self.assertEqual(self.session._pending, {})
+
+    def test_timeout_removes_pending_command(self):
+        with self.assertRaises(Exception) as context:
+            self.session.send_command('rtrv-crs-fiber:::3;', timeout=0.2, record_parser=ConnectionParser())
+        self.assertEqual(context.exception.args[1], "Timeout waiting for TL1 response!")
+        self.assertEqual((self.session._pending, self.session._record_parsers), ({}, {}))
+
+        # the late response is dropped, the session keeps working
+        thread = self._send_in_thread('rtrv-hdr:::4;')
+        self._receive_commands(2)
+        self.device.sendall(render([], 3) + render([], 4))
+        thread.join(5)
+
+        self.assertEqual(thread.result, render([], 4))
+        self.assertTrue(self.session.is_listening())
+
+    def test_reader_error_reaches_all_callers(self):
+        thread_list = [self._send_in_thread('rtrv-hdr:::{0};'.format(ctag)) for ctag in (5, 6)]
+        self._receive_commands(2)
+
+        self.device.close()
+        for thread in thread_list:
+            thread.join(5)
+
+        for thread in thread_list:
+            self.assertEqual(thread.result.args[1], "Connection closed by the device!")
+        self.assertEqual(self.session._pending, {})
+        self.assertFalse(self.session.is_listening())
+
+    def test_duplicate_ctag(self):
+        with self.assertRaises(Exception) as context:
+            self.session.send_commands(['rtrv-hdr:::7;', 'rtrv-crs-fiber:::7;'])
+        self.assertEqual(context.exception.args[1], "Commands with the same ctag are already sent!")
+
+        thread = self._send_in_thread('rtrv-hdr:::8;')
+        self._receive_commands(1)
+        with self.assertRaises(Exception) as context:
+            self.session.send_command('rtrv-crs-fiber:::8;')
+        self.assertEqual(context.exception.args[1], "Commands with the same ctag are already sent!")
+
+        self.device.sendall(render([], 8))
+        thread.join(5)
+        self.assertEqual(thread.result, render([], 8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from glimmerglass.chassis_generator import ChassisGenerator
+from glimmerglass.tl1_simulator import RecordedResponder, RecordingResponder, main
+
+
+class GeneratedUpstream(object):
+    """Socket of a switch answered by a ChassisGenerator"""
+
+    def __init__(self, chassis_generator):
+        self._chassis_generator = chassis_generator
+        self._response = ''
+
+    def sendall(self, data):
+        self._response += self._chassis_generator.handle_command(data.strip())
+
+    def recv(self, size):
+        data, self._response = self._response[:size], self._response[size:]
+        return data
+
+
+class TestRecording(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.record_file_name = os.path.join(self.folder, 'session.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_password_is_not_recorded(self):
+        responder = RecordingResponder('127.0.0.1:0', self.record_file_name)
+        upstream = GeneratedUpstream(ChassisGenerator(4))
+        responder.handle_command('ACT-USER::admin:1::secret;', upstream)
+        responder.handle_command('RTRV-HDR:::2;', upstream)
+
+        with open(self.record_file_name) as record_file:
+            record_data = record_file.read()
+        self.assertNotIn('secret', record_data)
+        self.assertEqual([json.loads(line)['command'] for line in record_data.splitlines()],
+                         ['ACT-USER::admin:1::********;', 'RTRV-HDR:::2;'])
+
+        # a recorded login is replayed whatever the password is
+        response = RecordedResponder(self.record_file_name).handle_command('ACT-USER::admin:7::other;')
+        self.assertIn('M  7 COMPLD', response)
+
+    def test_record_with_several_chassis(self):
+        """Several chassis would append to one file and send to one switch"""
+        self.assertRaises(SystemExit, main, ['--record', self.record_file_name, '--upstream', '127.0.0.1:10033',
+                                             '--chassis', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
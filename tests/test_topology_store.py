@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from common.configuration_parser import ConfigurationParser
+from glimmerglass.chassis_generator import ChassisGenerator
+from glimmerglass.tl1_parser import ConnectionRecord, PortRecord
+from glimmerglass.topology import TopologySnapshot
+from glimmerglass.topology_store import TopologyStore
+from tests.test_driver_handler import ADDRESS, GeneratedDriverHandler
+
+
+def setUpModule():
+    ConfigurationParser.set_root_folder(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ConfigurationParser.init()
+
+
+class FailingTopologyStore(object):
+    def get_generation(self, address):
+        return None
+
+    def save(self, address, topology):
+        raise IOError('disk I/O error')
+
+
+class ListLogger(object):
+    def __init__(self):
+        self.messages = list()
+
+    def info(self, message):
+        self.messages.append(message)
+
+
+def create_topology():
+    return TopologySnapshot({'SerialNumber': 'BD0472', 'ChassisType': 'GG-4'},
+                            [PortRecord(10001, 'IN1', 'IN', '1', 'good'), PortRecord(20001, 'OUT1', 'OUT', '1', 'bad')],
+                            [ConnectionRecord(10001, 20001)], system_fingerprint='s',
+                            port_fingerprint='p')
+
+
+class TestTopologyStore(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = TopologyStore(os.path.join(self.folder, 'topology.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_save_and_load(self):
+        topology = create_topology()
+        self.assertEqual(self.store.save(ADDRESS, topology), 1)
+        self.assertEqual(self.store.save(ADDRESS, topology), 2)
+
+        generation, stored_topology = self.store.load(ADDRESS)
+        self.assertEqual(generation, 2)
+        self.assertEqual(self.store.get_generation(ADDRESS), 2)
+        self.assertEqual(stored_topology.port_list, topology.port_list)
+        self.assertEqual(stored_topology.connections, {10001: 20001})
+        self.assertEqual(stored_topology.system_info, topology.system_info)
+        self.assertEqual(stored_topology.port_fingerprint, 'p')
+
+    def test_copy(self):
+        """A copy taken for the store is not changed by later mapping commands"""
+        topology = create_topology()
+        topology_copy = topology.copy()
+        topology.disconnect(10001)
+
+        self.assertEqual(topology_copy.connections, {10001: 20001})
+        self.assertEqual(topology_copy.sources, {20001: 10001})
+
+    def test_failure_is_logged(self):
+        handler = GeneratedDriverHandler(ChassisGenerator(4, seed=1))
+        handler._topology_store = FailingTopologyStore()
+        command_logger = ListLogger()
+        handler.get_resource_description(ADDRESS, command_logger)
+
+        self.assertIsNotNone(handler._topology)
+        self.assertIn("Can't store topology of '{0}': disk I/O error".format(ADDRESS), command_logger.messages)
+
+
+if __name__ == '__main__':
+    unittest.main()